@@ -5,59 +5,298 @@ const LOG_FILE_PATH = '.feedbackflow/feedback.log';
 // Store the verbose mode state
 let verboseMode = false;
 
+// Native messaging host name
+const NATIVE_HOST_NAME = 'com.feedbackflow.host';
+
+// How often to ping the native host while the port is open, and how long the
+// port may go without real traffic before we close it and let the host exit
+const KEEPALIVE_INTERVAL_MS = 20000;
+const PORT_IDLE_TIMEOUT_MS = 5 * 60 * 1000;
+
+// Persistent connection to the native host, shared by all requests
+let nativePort = null;
+let nextRequestId = 1;
+const pendingRequests = new Map();
+let keepAliveTimer = null;
+let lastPortActivity = 0;
+
+// Tear down the persistent port and fail any requests still waiting on it
+function closeNativePort() {
+  if (keepAliveTimer) {
+    clearInterval(keepAliveTimer);
+    keepAliveTimer = null;
+  }
+  if (nativePort) {
+    const port = nativePort;
+    nativePort = null;
+    try {
+      port.disconnect();
+    } catch (error) {
+      // Already disconnected
+    }
+  }
+  const callbacks = Array.from(pendingRequests.values());
+  pendingRequests.clear();
+  for (const callback of callbacks) {
+    callback(undefined);
+  }
+}
+
+// Open (or reuse) a long-lived connectNative port so the host process
+// serves many messages instead of being started once per entry
+function getNativePort() {
+  if (nativePort) {
+    return nativePort;
+  }
+
+  const port = chrome.runtime.connectNative(NATIVE_HOST_NAME);
+
+  port.onMessage.addListener(function(response) {
+    if (response && response.id !== undefined && pendingRequests.has(response.id)) {
+      const callback = pendingRequests.get(response.id);
+      pendingRequests.delete(response.id);
+      callback(response);
+    }
+  });
+
+  port.onDisconnect.addListener(function() {
+    if (verboseMode) {
+      const error = chrome.runtime.lastError;
+      console.log('Native host port closed' + (error ? ': ' + error.message : ''));
+    }
+    if (nativePort === port) {
+      closeNativePort();
+    }
+  });
+
+  // Keep the session alive while it is in use, and let it go when it is not
+  keepAliveTimer = setInterval(function() {
+    if (Date.now() - lastPortActivity > PORT_IDLE_TIMEOUT_MS) {
+      if (verboseMode) console.log('Closing idle native host port');
+      closeNativePort();
+      return;
+    }
+    postToNativePort({ action: 'ping' }, function(response) {
+      if (!response && verboseMode) console.warn('Native host did not answer ping');
+    }, false);
+  }, KEEPALIVE_INTERVAL_MS);
+
+  nativePort = port;
+  lastPortActivity = Date.now();
+  return port;
+}
+
+// Post a request on the persistent port; callback gets the matching response
+function postToNativePort(message, callback, countsAsActivity = true) {
+  const port = getNativePort();
+  const id = nextRequestId++;
+  pendingRequests.set(id, callback);
+  if (countsAsActivity) {
+    lastPortActivity = Date.now();
+  }
+  port.postMessage(Object.assign({ id: id }, message));
+}
+
+// How many times to retry a request the host rejected as busy
+const MAX_BUSY_RETRIES = 5;
+
+// Send a message to the native host, preferring the persistent port and
+// falling back to a one-off sendNativeMessage call
+function sendToNativeHost(message, callback, attempt = 0) {
+  // Back off and resend when the host reports its queue is full
+  const handleResponse = function(response) {
+    if (response && response.retryAfterMs !== undefined && attempt < MAX_BUSY_RETRIES) {
+      if (verboseMode) console.log('Native host busy, retrying in ' + response.retryAfterMs + 'ms');
+      setTimeout(function() {
+        sendToNativeHost(message, callback, attempt + 1);
+      }, response.retryAfterMs);
+      return;
+    }
+    callback(response);
+  };
+
+  try {
+    postToNativePort(message, handleResponse);
+  } catch (error) {
+    if (verboseMode) console.warn('Persistent native port unavailable, falling back:', error);
+    closeNativePort();
+    chrome.runtime.sendNativeMessage(NATIVE_HOST_NAME, message, handleResponse);
+  }
+}
+
+// Feedback entries saved within this window are sent to the host as a
+// single writeFeedbackBatch message
+const BATCH_WINDOW_MS = 25;
+let pendingWrites = [];
+let batchTimer = null;
+
+// Send all queued feedback entries to the native host
+function flushPendingWrites() {
+  const writes = pendingWrites;
+  pendingWrites = [];
+  batchTimer = null;
+
+  if (writes.length === 1) {
+    sendToNativeHost({
+      action: 'writeFeedback',
+      path: LOG_FILE_PATH,
+      content: writes[0].content,
+      entry: writes[0].entry
+    }, writes[0].callback);
+    return;
+  }
+
+  sendToNativeHost({
+    action: 'writeFeedbackBatch',
+    path: LOG_FILE_PATH,
+    entries: writes.map(function(write) {
+      return { content: write.content, entry: write.entry };
+    })
+  }, function(response) {
+    // Hand each caller its own per-entry acknowledgement
+    writes.forEach(function(write, index) {
+      write.callback(response && response.results ? response.results[index] : undefined);
+    });
+  });
+}
+
+// Queue a feedback entry to be written with the next batch. `entry` holds
+// the structured fields the host stores alongside the formatted log block.
+function queueFeedbackWrite(content, entry, callback) {
+  pendingWrites.push({ content: content, entry: entry, callback: callback });
+  if (!batchTimer) {
+    batchTimer = setTimeout(flushPendingWrites, BATCH_WINDOW_MS);
+  }
+}
+
+// Attachments are uploaded in chunks of this many base64 characters (a
+// multiple of 4, so every chunk decodes on its own)
+const ATTACHMENT_CHUNK_CHARS = 512 * 1024;
+
+// Hex SHA-256 of base64-encoded data
+async function sha256Hex(base64Data) {
+  const bytes = Uint8Array.from(atob(base64Data), function(c) { return c.charCodeAt(0); });
+  const digest = await crypto.subtle.digest('SHA-256', bytes);
+  return Array.from(new Uint8Array(digest))
+    .map(function(b) { return b.toString(16).padStart(2, '0'); })
+    .join('');
+}
+
+// Upload one attachment (a data: URL, base64 string or {data} object) to the
+// host's content-addressed store; callback gets its hash, or null on failure
+function uploadAttachment(attachment, callback) {
+  const data = String(attachment && attachment.data !== undefined ? attachment.data : attachment)
+    .replace(/^data:[^,]*,/, '');
+
+  sha256Hex(data).then(function(hash) {
+    const uploadId = hash.slice(0, 16) + '-' + Date.now();
+    let index = 0;
+
+    const sendChunk = function() {
+      const start = index * ATTACHMENT_CHUNK_CHARS;
+      const final = start + ATTACHMENT_CHUNK_CHARS >= data.length;
+      sendToNativeHost({
+        action: 'writeAttachment',
+        uploadId: uploadId,
+        chunkIndex: index,
+        data: data.slice(start, start + ATTACHMENT_CHUNK_CHARS),
+        final: final,
+        sha256: hash
+      }, function(response) {
+        if (!response || !response.success) {
+          if (verboseMode) console.warn('Failed to upload attachment', response && response.error);
+          callback(null);
+        } else if (response.skipUpload || final) {
+          // The host already had this blob, or the last chunk is in
+          callback(response.hash);
+        } else {
+          index++;
+          sendChunk();
+        }
+      });
+    };
+    sendChunk();
+  }).catch(function(error) {
+    if (verboseMode) console.warn('Could not read attachment:', error);
+    callback(null);
+  });
+}
+
+// Upload attachments one after another; callback gets the stored hashes
+function uploadAttachments(attachments, callback) {
+  const hashes = [];
+  const next = function(position) {
+    if (position >= attachments.length) {
+      callback(hashes);
+      return;
+    }
+    uploadAttachment(attachments[position], function(hash) {
+      if (hash) hashes.push(hash);
+      next(position + 1);
+    });
+  };
+  next(0);
+}
+
 // Listen for messages from popup or content scripts
 chrome.runtime.onMessage.addListener(function(message, sender, sendResponse) {
   if (message.action === 'saveFeedback') {
-    // Format the feedback entry
-    const feedbackEntry = `
+    // Upload any attachments first; the entry only carries their hashes
+    uploadAttachments(message.attachments || [], function(attachmentHashes) {
+      // Format the feedback entry
+      const attachmentLine = attachmentHashes.length ? `Attachments: ${attachmentHashes.join(', ')}\n` : '';
+      const feedbackEntry = `
 -------------------------------
 Timestamp: ${message.timestamp}
 URL: ${message.url}
 Title: ${message.title}
 Feedback: ${message.feedback}
--------------------------------
+${attachmentLine}-------------------------------
 `;
 
-    // Use Native Messaging to communicate with a native host application
-    // that will write to the log file
-    // Note: This requires setting up a native messaging host
-    // For now, we'll store in local storage as a fallback
-    chrome.storage.local.get(['feedbackLog'], function(result) {
-      let feedbackLog = result.feedbackLog || '';
-      feedbackLog += feedbackEntry;
+      // Use Native Messaging to communicate with a native host application
+      // that will write to the log file
+      // Note: This requires setting up a native messaging host
+      // For now, we'll store in local storage as a fallback
+      chrome.storage.local.get(['feedbackLog'], function(result) {
+        let feedbackLog = result.feedbackLog || '';
+        feedbackLog += feedbackEntry;
       
-      chrome.storage.local.set({ feedbackLog: feedbackLog }, function() {
-        if (verboseMode) console.log('Feedback saved to local storage');
+        chrome.storage.local.set({ feedbackLog: feedbackLog }, function() {
+          if (verboseMode) console.log('Feedback saved to local storage');
         
-        // Also try to send to a native host if available
-        try {
-          chrome.runtime.sendNativeMessage(
-            'com.feedbackflow.host',
-            {
-              action: 'writeFeedback',
-              path: LOG_FILE_PATH,
-              content: feedbackEntry
-            },
-            function(response) {
-              if (response && response.success) {
-                if (verboseMode) console.log('Feedback saved to log file');
-                sendResponse({ success: true });
-              } else {
-                if (verboseMode) console.warn('Failed to save to log file, but saved to local storage');
-                sendResponse({ 
-                  success: true, 
-                  warning: 'Saved to extension storage only. Native messaging not available.'
-                });
+          // Also try to send to a native host if available
+          try {
+            queueFeedbackWrite(
+              feedbackEntry,
+              {
+                timestamp: message.timestamp,
+                url: message.url,
+                title: message.title,
+                feedback: message.feedback,
+                attachments: attachmentHashes
+              },
+              function(response) {
+                if (response && response.success) {
+                  if (verboseMode) console.log('Feedback saved to log file');
+                  sendResponse({ success: true });
+                } else {
+                  if (verboseMode) console.warn('Failed to save to log file, but saved to local storage');
+                  sendResponse({ 
+                    success: true, 
+                    warning: 'Saved to extension storage only. Native messaging not available.'
+                  });
+                }
               }
-            }
-          );
-        } catch (error) {
-          console.error('Native messaging error:', error);
-          sendResponse({ 
-            success: true, 
-            warning: 'Saved to extension storage only. Native messaging error: ' + error.message
-          });
-        }
+            );
+          } catch (error) {
+            console.error('Native messaging error:', error);
+            sendResponse({ 
+              success: true, 
+              warning: 'Saved to extension storage only. Native messaging error: ' + error.message
+            });
+          }
+        });
       });
     });
     
@@ -71,8 +310,7 @@ Feedback: ${message.feedback}
       
       // Also try to send to a native host if available
       try {
-        chrome.runtime.sendNativeMessage(
-          'com.feedbackflow.host',
+        sendToNativeHost(
           {
             action: 'clearFeedback',
             path: LOG_FILE_PATH
@@ -43,6 +43,7 @@ window.addEventListener('message', function(event) {
       chrome.runtime.sendMessage({
         action: 'saveFeedback',
         feedback: event.data.feedback,
+        attachments: event.data.attachments || [],
         url: window.location.href,
         title: document.title,
         timestamp: new Date().toISOString()
@@ -73,6 +74,7 @@ window.addEventListener('feedbackflow-send', function(event) {
       chrome.runtime.sendMessage({
         action: 'saveFeedback',
         feedback: event.detail.feedback,
+        attachments: event.detail.attachments || [],
         url: window.location.href,
         title: document.title,
         timestamp: new Date().toISOString()
@@ -30,12 +30,14 @@ window.FeedbackFlow = {
     return true;
   },
   
-  sendFeedback: function(feedback) {
+  // `attachments` is an optional array of data: URLs or base64 strings
+  // (screenshots, DOM snapshots, console/network captures)
+  sendFeedback: function(feedback, attachments) {
     return new Promise((resolve, reject) => {
       try {
         // Use a custom event to communicate with the content script
         const customEvent = new CustomEvent('feedbackflow-send', { 
-          detail: { feedback: feedback } 
+          detail: { feedback: feedback, attachments: attachments || [] } 
         });
         window.dispatchEvent(customEvent);
         
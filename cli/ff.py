@@ -207,7 +207,7 @@ def extract_feedbackflow_section(content):
         return match.group(0)
     return content  # Return the whole content if no match found
 
-def main():
+def main(argv=None):
     """Main function to parse arguments and run the tool."""
     parser = argparse.ArgumentParser(
         description="Add FeedbackFlow AI assistant integration files to a project"
@@ -219,7 +219,7 @@ def main():
         help="Target directory to add AI assistant files (default: current directory)"
     )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     create_ai_assistant_files(args.directory)
 
 if __name__ == "__main__":
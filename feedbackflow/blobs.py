@@ -0,0 +1,233 @@
+"""
+Content-addressed store for feedback attachments.
+
+Screenshots, DOM snapshots and console/network captures are stored once under
+~/.feedbackflow/blobs/, keyed by the SHA-256 of their bytes
+(blobs/ab/abcdef...). Log entries and metadata only carry the hash. Identical
+uploads are deduplicated, and refs.log counts how many entries point at each
+blob so unreferenced blobs can be garbage collected.
+"""
+
+import os
+import re
+import time
+import hashlib
+from pathlib import Path
+
+from feedbackflow.store import locked
+
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Blobs nobody references are only collected once they are this old, so an
+# upload whose log entry has not been written yet is never removed
+GC_GRACE_SECONDS = 3600
+
+
+def get_blobs_dir():
+    """Get the default directory of the attachment store."""
+    return os.path.join(str(Path.home()), '.feedbackflow', 'blobs')
+
+
+def is_blob_hash(value):
+    """Check that `value` looks like a hex SHA-256 digest."""
+    return isinstance(value, str) and bool(HASH_PATTERN.match(value))
+
+
+class BlobStore:
+    """SHA-256 keyed blob files with chunked uploads and reference counts."""
+
+    def __init__(self, root=None):
+        self.root = root or get_blobs_dir()
+        self.uploads_dir = os.path.join(self.root, '.uploads')
+        self.refs_path = os.path.join(self.root, 'refs.log')
+        self.lock_path = os.path.join(self.root, '.lock')
+        # Running hashes of uploads in progress in this process
+        self._hashers = {}
+
+    def path(self, blob_hash):
+        """Path of the blob file for `blob_hash`."""
+        if not is_blob_hash(blob_hash):
+            raise ValueError(f"Invalid attachment hash: {blob_hash}")
+        return os.path.join(self.root, blob_hash[:2], blob_hash)
+
+    def exists(self, blob_hash):
+        """Check whether the blob is stored."""
+        return is_blob_hash(blob_hash) and os.path.exists(self.path(blob_hash))
+
+    def claim(self, blob_hash):
+        """
+        Check for a stored blob and refresh its age, so a blob about to be
+        referenced again is not garbage collected in the meantime.
+        """
+        if not self.exists(blob_hash):
+            return False
+        os.utime(self.path(blob_hash))
+        return True
+
+    def read(self, blob_hash):
+        """Return the bytes of a stored blob."""
+        with open(self.path(blob_hash), 'rb') as f:
+            return f.read()
+
+    def _upload_path(self, upload_id):
+        safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(upload_id))
+        return os.path.join(self.uploads_dir, safe_id + '.part')
+
+    def write_chunk(self, upload_id, index, data):
+        """
+        Append one chunk to an upload in progress.
+
+        Args:
+            upload_id: Id chosen by the client for this upload.
+            index: Position of the chunk, starting at 0.
+            data: The chunk's bytes.
+
+        Returns:
+            The number of bytes received so far.
+        """
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        part_path = self._upload_path(upload_id)
+
+        if index == 0:
+            mode = 'wb'
+            self._hashers[upload_id] = [hashlib.sha256(), 0]
+        else:
+            state = self._hashers.get(upload_id)
+            if not os.path.exists(part_path) or (state is not None and state[1] != index):
+                raise ValueError(f"Unexpected chunk {index} for upload {upload_id}")
+            mode = 'ab'
+
+        with open(part_path, mode) as f:
+            f.write(data)
+            size = f.tell()
+
+        if upload_id in self._hashers:
+            state = self._hashers[upload_id]
+            state[0].update(data)
+            state[1] = index + 1
+        return size
+
+    def finish(self, upload_id, expected_hash=None):
+        """
+        Complete an upload and move it into place under its hash.
+
+        Args:
+            upload_id: Id of the upload.
+            expected_hash: If given, the upload is rejected when it does not match.
+
+        Returns:
+            A tuple of (hash, size in bytes, whether the blob already existed).
+        """
+        part_path = self._upload_path(upload_id)
+        state = self._hashers.pop(upload_id, None)
+        if state is not None:
+            blob_hash = state[0].hexdigest()
+        else:
+            # The upload started in another host process; hash what is on disk
+            hasher = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    hasher.update(block)
+            blob_hash = hasher.hexdigest()
+        size = os.path.getsize(part_path)
+
+        if expected_hash and expected_hash != blob_hash:
+            os.remove(part_path)
+            raise ValueError(f"Attachment hash mismatch: expected {expected_hash}, got {blob_hash}")
+
+        if self.claim(blob_hash):
+            os.remove(part_path)
+            return blob_hash, size, True
+        target = self.path(blob_hash)
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(part_path, target)
+        return blob_hash, size, False
+
+    def put(self, data):
+        """
+        Store a complete blob in one call.
+
+        Returns:
+            A tuple of (hash, whether the blob already existed).
+        """
+        blob_hash = hashlib.sha256(data).hexdigest()
+        if self.claim(blob_hash):
+            return blob_hash, True
+        target = self.path(blob_hash)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = target + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, target)
+        return blob_hash, False
+
+    def _change_refs(self, hashes, sign):
+        hashes = [h for h in hashes or [] if is_blob_hash(h)]
+        if not hashes:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        with locked(self.lock_path):
+            with open(self.refs_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(f"{sign}{h}\n" for h in hashes))
+
+    def add_refs(self, hashes):
+        """Record one more reference to each blob in `hashes`."""
+        self._change_refs(hashes, '+')
+
+    def release_refs(self, hashes):
+        """Drop one reference to each blob in `hashes`."""
+        self._change_refs(hashes, '-')
+
+    def ref_counts(self):
+        """Replay refs.log into a {hash: count} dict."""
+        counts = {}
+        try:
+            with open(self.refs_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if len(line) == 65:
+                        counts[line[1:]] = counts.get(line[1:], 0) + (1 if line[0] == '+' else -1)
+        except FileNotFoundError:
+            pass
+        return counts
+
+    def collect_garbage(self, grace_seconds=GC_GRACE_SECONDS):
+        """
+        Delete blobs with no references and compact refs.log.
+
+        Returns:
+            The hashes of the deleted blobs.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        removed = []
+        cutoff = time.time() - grace_seconds
+        with locked(self.lock_path):
+            counts = self.ref_counts()
+            for prefix in os.listdir(self.root):
+                prefix_dir = os.path.join(self.root, prefix)
+                if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                    continue
+                for name in os.listdir(prefix_dir):
+                    blob_path = os.path.join(prefix_dir, name)
+                    if (is_blob_hash(name) and counts.get(name, 0) <= 0
+                            and os.path.getmtime(blob_path) < cutoff):
+                        os.remove(blob_path)
+                        removed.append(name)
+
+            # Rewrite the log with one line per live reference
+            temp_path = self.refs_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for blob_hash, count in counts.items():
+                    if count > 0:
+                        f.write(f"+{blob_hash}\n" * count)
+            os.replace(temp_path, self.refs_path)
+
+            # Abandoned uploads are cleaned up the same way
+            if os.path.isdir(self.uploads_dir):
+                for name in os.listdir(self.uploads_dir):
+                    part_path = os.path.join(self.uploads_dir, name)
+                    if os.path.getmtime(part_path) < cutoff:
+                        os.remove(part_path)
+        return removed
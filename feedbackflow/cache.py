@@ -0,0 +1,121 @@
+"""
+Response cache for resources backed by files.
+
+A cached response remembers the identity (inode, size, mtime_ns) of the
+files it was built from. As long as those are unchanged, a repeated read is
+answered from memory with one stat per file, whoever wrote the files. Writes
+made by the same process can also drop the cache outright with invalidate().
+Responses are evicted least recently used first once their total size passes
+a byte limit. Large responses should be cached as the text that is sent, so
+a hit costs nothing beyond the stat calls and the size is known up front.
+
+Configuration (environment variables):
+  FEEDBACKFLOW_RESPONSE_CACHE_BYTES  Size limit of the cache (default 64 MiB,
+                                     enough for the metadata of a few hundred
+                                     thousand entries)
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+
+RESPONSE_CACHE_BYTES = int(os.environ.get('FEEDBACKFLOW_RESPONSE_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+
+def file_identity(paths):
+    """Return (inode, size, mtime_ns) for each path, or None for a missing file."""
+    identity = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            identity.append(None)
+        else:
+            identity.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+    return tuple(identity)
+
+
+def response_size(value):
+    """Approximate size in bytes of a response as it is sent."""
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        # Most responses are ASCII JSON, whose length needs no encoding pass
+        return len(value) if value.isascii() else len(value.encode('utf-8'))
+    return len(json.dumps(value, ensure_ascii=False, default=str))
+
+
+class ResponseCache:
+    """LRU cache of responses, validated against the files they were read from."""
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (identity, value, size)
+        self._lock = threading.Lock()
+
+    def get(self, key, paths, compute):
+        """
+        Return the cached response for `key`, or build and cache it.
+
+        Args:
+            key: Name of the response, e.g. the resource URI.
+            paths: Files the response is read from.
+            compute: Called without arguments to build the response on a miss.
+                     Exceptions are passed on and nothing is cached.
+
+        Returns:
+            The response.
+        """
+        # Taken before computing, so a write during compute() leaves a stale
+        # identity behind and the next read builds the response again
+        identity = file_identity(paths)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == identity:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        value = compute()
+        size = response_size(value)
+        with self._lock:
+            self._discard(key)
+            if size <= self.max_bytes:
+                self._entries[key] = (identity, value, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, (_, _, evicted) = self._entries.popitem(last=False)
+                    self.bytes -= evicted
+        return value
+
+    def _discard(self, key):
+        cached = self._entries.pop(key, None)
+        if cached is not None:
+            self.bytes -= cached[2]
+
+    def invalidate(self, key=None):
+        """Drop the response for `key`, or every response."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self.bytes = 0
+            else:
+                self._discard(key)
+
+    def stats(self):
+        """Return hit and miss counts, the hit rate and the current size."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / requests, 4) if requests else None,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+            }
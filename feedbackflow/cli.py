@@ -2,9 +2,28 @@
 
 import os
 import sys
-import argparse
-import subprocess
-from pathlib import Path
+import runpy
+import importlib.util
+from importlib.machinery import SourceFileLoader
+
+# Subcommands: name -> (script relative to the project directory, entry point,
+# leading arguments). Commands run in this process; a script is only imported
+# when its command runs, so e.g. `feedbackflow read` never loads the MCP SDK.
+# An entry point of None runs the script as __main__.
+COMMANDS = {
+    "add-to-composer": ("scripts/add_feedback_to_composer.py", "main", []),
+    "start-mcp": ("mcp/mcp_server.py", None, []),
+    "setup-cursor-mcp": ("mcp/ff-mcp", "main", ["cursor"]),
+    "install-mcp": ("mcp/install_mcp.py", "main", []),
+    "read": ("scripts/read_feedback.py", "main", []),
+    "clear": ("scripts/clear_feedback.py", "main", []),
+    "check-extension": ("scripts/check_extension.py", "main", []),
+}
+
+# Every other command is handed to ff.py
+FALLBACK_SCRIPT = "cli/ff.py"
+
+MCP_SUBCOMMANDS = ("start", "stop", "install", "cursor")
 
 def get_package_dir():
     """Get the directory where the feedbackflow package is installed."""
@@ -16,23 +35,74 @@ def get_project_dir():
     # The project directory is the parent of the package directory
     return os.path.dirname(package_dir)
 
-def run_script(script_name, args=None):
-    """Run a Python script from the project directory."""
-    if args is None:
-        args = []
-    
-    project_dir = get_project_dir()
-    script_path = os.path.join(project_dir, script_name)
+def load_script(script_name):
+    """
+    Import a script from the project directory as a module.
     
+    Args:
+        script_name: Path of the script relative to the project directory.
+        
+    Returns:
+        The imported module.
+    """
+    script_path = os.path.join(get_project_dir(), script_name)
     if not os.path.exists(script_path):
         print(f"Error: Script {script_name} not found at {script_path}")
         sys.exit(1)
     
+    module_name = "feedbackflow_script_" + os.path.basename(script_path).replace("-", "_").replace(".py", "")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    # Scripts such as ff-mcp have no .py suffix, so name the loader explicitly
+    loader = SourceFileLoader(module_name, script_path)
+    spec = importlib.util.spec_from_file_location(module_name, script_path, loader=loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
+
+def run_script(script_name, args=None, entry_point="main", prog=None):
+    """
+    Run a script from the project directory in this process.
+    
+    Args:
+        script_name: Path of the script relative to the project directory.
+        args: Command-line arguments for the script.
+        entry_point: Function to call with the arguments, or None to run the
+                     script as __main__.
+        prog: Program name shown in the script's usage messages.
+        
+    Returns:
+        The entry point's return value.
+    """
+    if args is None:
+        args = []
+    
+    # Scripts build their usage messages and read options from sys.argv
+    saved_argv = sys.argv
+    sys.argv = [prog or script_name] + list(args)
     try:
-        subprocess.run([sys.executable, script_path] + args, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing {script_name}: {e}")
-        sys.exit(e.returncode)
+        if entry_point is None:
+            script_path = os.path.join(get_project_dir(), script_name)
+            if not os.path.exists(script_path):
+                print(f"Error: Script {script_name} not found at {script_path}")
+                sys.exit(1)
+            runpy.run_path(script_path, run_name="__main__")
+            return None
+        return getattr(load_script(script_name), entry_point)(list(args))
+    finally:
+        sys.argv = saved_argv
+
+def run_command(command, args):
+    """Run a registered subcommand with its arguments."""
+    script_name, entry_point, leading_args = COMMANDS[command]
+    # Commands with leading arguments are subcommands of the script's own parser
+    prog = "feedbackflow" if leading_args else f"feedbackflow {command}"
+    return run_script(script_name, leading_args + list(args), entry_point, prog=prog)
 
 def handle_mcp_command(args):
     """Handle MCP-related commands."""
@@ -44,14 +114,8 @@ def handle_mcp_command(args):
     mcp_command = args[0]
     mcp_args = args[1:]
     
-    if mcp_command == "start":
-        run_script("ff-mcp", ["start"] + mcp_args)
-    elif mcp_command == "stop":
-        run_script("ff-mcp", ["stop"] + mcp_args)
-    elif mcp_command == "install":
-        run_script("ff-mcp", ["install"] + mcp_args)
-    elif mcp_command == "cursor":
-        run_script("ff-mcp", ["cursor"] + mcp_args)
+    if mcp_command in MCP_SUBCOMMANDS:
+        run_script("mcp/ff-mcp", [mcp_command] + mcp_args, prog="feedbackflow mcp")
     else:
         print(f"Error: Unknown MCP subcommand: {mcp_command}")
         show_mcp_help()
@@ -100,9 +164,9 @@ Options:
   --cursor              Run in Cursor mode
 """)
 
-def main():
+def main(argv=None):
     """Main entry point for the CLI."""
-    args = sys.argv[1:]
+    args = sys.argv[1:] if argv is None else list(argv)
     
     if len(args) == 0 or args[0] in ["--help", "-h"]:
         show_help()
@@ -111,25 +175,13 @@ def main():
     command = args[0]
     command_args = args[1:]
     
-    if command == "add-to-composer":
-        run_script("add_feedback_to_composer.py", command_args)
-    elif command == "start-mcp":
-        run_script("mcp_server.py", command_args)
-    elif command == "setup-cursor-mcp":
-        run_script("ff-mcp", ["cursor"] + command_args)
-    elif command == "install-mcp":
-        run_script("install_mcp.py", command_args)
-    elif command == "read":
-        run_script("read_feedback.py", command_args)
-    elif command == "clear":
-        run_script("clear_feedback.py", command_args)
-    elif command == "check-extension":
-        run_script("check_extension.py", command_args)
+    if command in COMMANDS:
+        run_command(command, command_args)
     elif command == "mcp":
         handle_mcp_command(command_args)
     else:
         # Pass all arguments to ff.py for any other commands
-        run_script("ff.py", args)
+        run_script(FALLBACK_SCRIPT, args, prog="feedbackflow")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,248 @@
+"""
+Offline grouping of feedback into themes with TF-IDF and k-means.
+
+Each record becomes a TF-IDF vector over the most common terms of its
+feedback and title, L2-normalized so a dot product is the cosine similarity.
+Themes are found with mini-batch spherical k-means (a fixed number of themes)
+or with single-pass leader clustering (a similarity threshold). Everything
+runs on the CPU with NumPy, which is an optional dependency
+(pip install feedbackflow[cluster]).
+
+The fitted model is kept in records/themes.npz. Records added after a fit are
+assigned to their nearest theme, nudging its centroid, without refitting.
+"""
+
+import os
+import json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from feedbackflow.search import tokenize
+
+# Size of the term vocabulary (the most common terms across the records)
+MAX_FEATURES = 2000
+
+# Most recent records a fit looks at
+MAX_RECORDS = 5000
+
+BATCH_SIZE = 256
+ITERATIONS = 60
+
+# Words too common in feedback to tell themes apart
+STOP_WORDS = frozenset("""
+a an and are as at be but by can do does for from has have i if in is it its
+not of on or so that the this to was were when where which will with would you
+your we our they there their then than too very just also it's don't doesn't
+""".split())
+
+
+def require_numpy():
+    """Raise a helpful error when NumPy is not installed."""
+    if np is None:
+        raise RuntimeError("Clustering needs NumPy: pip install feedbackflow[cluster]")
+
+
+def _terms(record):
+    text = f"{record.get('feedback') or ''} {record.get('title') or ''}"
+    return [t for t in tokenize(text) if len(t) > 2 and not t.isdigit() and t not in STOP_WORDS]
+
+
+class ThemeModel:
+    """TF-IDF vocabulary, theme centroids and the records assigned to each theme."""
+
+    def __init__(self, vocabulary, idf, centroids, counts, member_ids, assignments, position,
+                 k=None, threshold=None):
+        self.vocabulary = vocabulary
+        self.columns = {term: column for column, term in enumerate(vocabulary)}
+        self.idf = idf
+        self.centroids = centroids
+        self.counts = counts
+        self.member_ids = member_ids
+        self.assignments = assignments
+        self.position = position
+        self.k = k
+        self.threshold = threshold
+
+    def vectorize(self, records):
+        """L2-normalized TF-IDF matrix of `records` over the model's vocabulary."""
+        matrix = np.zeros((len(records), len(self.vocabulary)), dtype=np.float32)
+        for row, record in enumerate(records):
+            for term in _terms(record):
+                column = self.columns.get(term)
+                if column is not None:
+                    matrix[row, column] += 1
+        matrix *= self.idf
+        return _normalize(matrix)
+
+    @classmethod
+    def fit(cls, records, position, k=None, threshold=None, seed=0):
+        """
+        Fit themes to `records`.
+
+        Args:
+            records: Records to cluster, oldest first.
+            position: Store position just past the last record, for later updates.
+            k: Number of themes for k-means.
+            threshold: Cosine similarity for leader clustering (used when k is None).
+            seed: Random seed, so the same records give the same themes.
+        """
+        require_numpy()
+        documents = [_terms(record) for record in records]
+        frequencies = {}
+        for terms in documents:
+            for term in set(terms):
+                frequencies[term] = frequencies.get(term, 0) + 1
+        vocabulary = sorted(frequencies, key=lambda term: (-frequencies[term], term))[:MAX_FEATURES]
+        df = np.array([frequencies[term] for term in vocabulary], dtype=np.float32)
+        idf = np.log((1 + len(records)) / (1 + df)) + 1
+
+        model = cls(vocabulary, idf, np.zeros((0, len(vocabulary)), np.float32), np.zeros(0, np.int64),
+                    np.array([int(r['id']) for r in records], dtype=np.int64),
+                    np.zeros(len(records), np.int32), position, k, None if k is not None else threshold or 0.3)
+        matrix = model.vectorize(records)
+        if len(records) == 0:
+            return model
+
+        rng = np.random.default_rng(seed)
+        if k is not None:
+            centroids = _minibatch_kmeans(matrix, min(k, len(records)), rng)
+            assignments = np.argmax(matrix @ centroids.T, axis=1).astype(np.int32)
+        else:
+            centroids, assignments = _leader_clusters(matrix, model.threshold)
+
+        # Recompute centroids from the final assignments and drop empty themes
+        used = np.unique(assignments)
+        remap = np.full(len(centroids), -1, dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        model.assignments = remap[assignments]
+        model.counts = np.bincount(model.assignments, minlength=len(used)).astype(np.int64)
+        sums = np.zeros((len(used), matrix.shape[1]), dtype=np.float32)
+        np.add.at(sums, model.assignments, matrix)
+        model.centroids = _normalize(sums)
+        return model
+
+    def assign(self, records, position):
+        """
+        Add new records to their nearest themes without refitting.
+
+        In threshold mode a record less similar than the threshold to every
+        theme starts a theme of its own.
+        """
+        if not records:
+            self.position = position
+            return
+        matrix = self.vectorize(records)
+        for row, vector in enumerate(matrix):
+            similarities = self.centroids @ vector if len(self.centroids) else np.zeros(0)
+            best = int(np.argmax(similarities)) if len(similarities) else -1
+            if best < 0 or (self.threshold is not None and similarities[best] < self.threshold):
+                self.centroids = np.vstack([self.centroids, vector[None, :]])
+                self.counts = np.append(self.counts, 0)
+                best = len(self.centroids) - 1
+            # Running mean of the member vectors, renormalized
+            self.counts[best] += 1
+            centroid = self.centroids[best] + (vector - self.centroids[best]) / self.counts[best]
+            self.centroids[best] = _normalize(centroid[None, :])[0]
+            self.member_ids = np.append(self.member_ids, int(records[row]['id']))
+            self.assignments = np.append(self.assignments, np.int32(best))
+        self.position = position
+
+    def themes(self, top_terms=3):
+        """
+        Summarize each theme, largest first.
+
+        Returns:
+            Dicts with cluster index, label (top terms), size and member ids.
+        """
+        themes = []
+        for cluster in np.argsort(-self.counts, kind='stable'):
+            if self.counts[cluster] == 0:
+                continue
+            top = np.argsort(-self.centroids[cluster], kind='stable')[:top_terms]
+            label = ', '.join(self.vocabulary[column] for column in top if self.centroids[cluster][column] > 0)
+            members = self.member_ids[self.assignments == cluster]
+            themes.append({
+                'cluster': int(cluster),
+                'label': label or '(no distinctive terms)',
+                'size': int(self.counts[cluster]),
+                'member_ids': [str(member) for member in members],
+            })
+        return themes
+
+    def save(self, path):
+        """Write the model to an .npz file."""
+        temp_path = path + '.tmp.npz'
+        np.savez(temp_path, vocabulary=np.array(self.vocabulary, dtype=str), idf=self.idf,
+                 centroids=self.centroids, counts=self.counts, member_ids=self.member_ids,
+                 assignments=self.assignments,
+                 settings=np.array(json.dumps({'position': self.position, 'k': self.k,
+                                               'threshold': self.threshold})))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a model written by save(), or return None if there is none."""
+        require_numpy()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                settings = json.loads(str(data['settings']))
+                return cls(list(data['vocabulary']), data['idf'], data['centroids'], data['counts'],
+                           data['member_ids'], data['assignments'], settings['position'],
+                           settings['k'], settings['threshold'])
+        except FileNotFoundError:
+            return None
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def _minibatch_kmeans(matrix, k, rng):
+    """Spherical mini-batch k-means with k-means++ seeding; returns the centroids."""
+    # k-means++: spread the initial centroids out by cosine distance
+    centroids = [matrix[rng.integers(len(matrix))]]
+    distances = 1 - matrix @ centroids[0]
+    for _ in range(1, k):
+        weights = np.clip(distances, 0, None).astype(np.float64) ** 2
+        total = weights.sum()
+        index = rng.choice(len(matrix), p=weights / total) if total > 0 else rng.integers(len(matrix))
+        centroids.append(matrix[index])
+        distances = np.minimum(distances, 1 - matrix @ matrix[index])
+    centroids = np.array(centroids, dtype=np.float32)
+
+    counts = np.zeros(k, dtype=np.float32)
+    batch_size = min(BATCH_SIZE, len(matrix))
+    for _ in range(ITERATIONS):
+        batch = matrix[rng.choice(len(matrix), batch_size, replace=False)]
+        nearest = np.argmax(batch @ centroids.T, axis=1)
+        for cluster in np.unique(nearest):
+            members = batch[nearest == cluster]
+            counts[cluster] += len(members)
+            rate = len(members) / counts[cluster]
+            centroids[cluster] += rate * (members.mean(axis=0) - centroids[cluster])
+        centroids = _normalize(centroids)
+    return centroids
+
+
+def _leader_clusters(matrix, threshold):
+    """Single-pass clustering: join the most similar theme, or start a new one."""
+    centroids = np.zeros((0, matrix.shape[1]), dtype=np.float32)
+    sums = []
+    assignments = np.zeros(len(matrix), dtype=np.int32)
+    for row, vector in enumerate(matrix):
+        similarities = centroids @ vector
+        best = int(np.argmax(similarities)) if len(similarities) else -1
+        if best < 0 or similarities[best] < threshold:
+            sums.append(vector.copy())
+            centroids = np.vstack([centroids, vector[None, :]])
+            best = len(sums) - 1
+        else:
+            sums[best] += vector
+            centroids[best] = _normalize(sums[best][None, :])[0]
+        assignments[row] = best
+    return centroids, assignments
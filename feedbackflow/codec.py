@@ -0,0 +1,154 @@
+"""
+Frame and JSON codec for the native messaging host.
+
+Chrome frames every native message as a 4-byte native-endian length followed
+by that many bytes of UTF-8 JSON. FrameReader reads each body into one reusable
+buffer with readinto() and parses it straight from a memoryview. Frames over
+the size limit are skipped in chunks, without allocating their full size.
+
+JSON goes through orjson or msgspec when one of them is installed, and falls
+back to the standard library json module. Set FEEDBACKFLOW_JSON=json to force
+the fallback.
+"""
+
+import os
+import io
+import json
+import struct
+
+HEADER = struct.Struct('=I')
+
+# Largest frame the host will accept (Chrome allows up to 64 MiB)
+MAX_FRAME_BYTES = int(os.environ.get('FEEDBACKFLOW_MAX_FRAME_BYTES', str(16 * 1024 * 1024)))
+
+# Size of the read buffer before it has to grow for a bigger frame
+INITIAL_BUFFER_BYTES = 64 * 1024
+
+
+def _select_json():
+    """Pick the fastest available JSON implementation."""
+    preferred = os.environ.get('FEEDBACKFLOW_JSON', '')
+    if preferred in ('', 'orjson'):
+        try:
+            import orjson
+            return 'orjson', orjson.loads, orjson.dumps
+        except ImportError:
+            pass
+    if preferred in ('', 'msgspec'):
+        try:
+            import msgspec
+            encoder = msgspec.json.Encoder()
+            return 'msgspec', msgspec.json.decode, encoder.encode
+        except ImportError:
+            pass
+
+    def loads(data):
+        # json.loads takes bytes but not a memoryview
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+    def dumps(value):
+        return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+    return 'json', loads, dumps
+
+
+# loads() accepts bytes or a memoryview, dumps() returns UTF-8 bytes
+JSON_BACKEND, loads, dumps = _select_json()
+
+
+class FrameTooLarge(ValueError):
+    """Raised after an oversized frame has been skipped."""
+
+    def __init__(self, size, limit):
+        super().__init__(f"Message of {size} bytes exceeds the {limit} byte limit")
+        self.size = size
+        self.limit = limit
+
+
+class FrameReader:
+    """Read length-prefixed JSON frames from a file descriptor."""
+
+    def __init__(self, fd, max_frame_bytes=MAX_FRAME_BYTES):
+        self.stream = io.FileIO(fd, 'rb', closefd=False)
+        self.max_frame_bytes = max_frame_bytes
+        self.header = bytearray(HEADER.size)
+        self.buffer = bytearray(INITIAL_BUFFER_BYTES)
+
+    def _fill(self, view):
+        """Fill `view` completely; returns how many bytes were read."""
+        filled = 0
+        while filled < len(view):
+            read = self.stream.readinto(view[filled:])
+            if not read:
+                break
+            filled += read
+        return filled
+
+    def _skip(self, size):
+        """Discard `size` bytes using the existing buffer; False at end of stream."""
+        view = memoryview(self.buffer)
+        while size > 0:
+            chunk = min(size, len(view))
+            if self._fill(view[:chunk]) < chunk:
+                return False
+            size -= chunk
+        return True
+
+    def read(self):
+        """
+        Read and decode the next frame.
+
+        Returns:
+            A tuple of (message, frame size in bytes), or None at end of stream.
+
+        Raises:
+            FrameTooLarge: The frame exceeded the size limit and was skipped.
+        """
+        if self._fill(memoryview(self.header)) < HEADER.size:
+            return None
+        size = HEADER.unpack(self.header)[0]
+
+        if size > self.max_frame_bytes:
+            if not self._skip(size):
+                return None
+            raise FrameTooLarge(size, self.max_frame_bytes)
+
+        if size > len(self.buffer):
+            # Grow geometrically so a run of large frames reallocates rarely
+            new_size = len(self.buffer)
+            while new_size < size:
+                new_size *= 2
+            self.buffer = bytearray(min(new_size, self.max_frame_bytes))
+
+        view = memoryview(self.buffer)[:size]
+        if self._fill(view) < size:
+            return None
+        return loads(view), HEADER.size + size
+
+
+def write_frame(fd, message):
+    """
+    Encode `message` and write it as one frame.
+
+    The header and body go out in a single writev() where available, so the
+    encoded body is never copied into a combined buffer.
+
+    Returns:
+        The number of bytes written.
+    """
+    body = dumps(message)
+    chunks = [HEADER.pack(len(body)), body]
+    total = len(chunks[0]) + len(body)
+
+    if hasattr(os, 'writev'):
+        written = os.writev(fd, chunks)
+        # Pipes may accept a partial write; finish whatever is left
+        remaining = b''.join(chunks)[written:] if written < total else b''
+    else:
+        remaining = b''.join(chunks)
+    view = memoryview(remaining)
+    while view:
+        view = view[os.write(fd, view):]
+    return total
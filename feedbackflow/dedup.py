@@ -0,0 +1,145 @@
+"""
+Ingest-time collapsing of near-duplicate feedback.
+
+An error loop on a page can send the same feedback hundreds of times a minute.
+Each entry is fingerprinted from its normalized text plus URL. A repeat of a
+fingerprint seen within the dedup window only bumps that entry's occurrence
+count and last-seen time instead of writing a new entry.
+
+Configuration (environment variables):
+  FEEDBACKFLOW_DEDUP_WINDOW       seconds a fingerprint stays live (0 disables)
+  FEEDBACKFLOW_DEDUP_MAX_ENTRIES  fingerprints kept in memory
+  FEEDBACKFLOW_DEDUP_RULES        comma-separated normalization rules; `hex`
+                                  and `numbers` are off by default, since they
+                                  also merge feedback that differs in meaning
+                                  ("step 1" vs "step 2"), and are meant for
+                                  sources that loop on the same error
+"""
+
+import os
+import re
+import time
+import hashlib
+from collections import OrderedDict
+
+DEDUP_WINDOW_SECONDS = float(os.environ.get('FEEDBACKFLOW_DEDUP_WINDOW', '60'))
+DEDUP_MAX_ENTRIES = int(os.environ.get('FEEDBACKFLOW_DEDUP_MAX_ENTRIES', '10000'))
+
+# Normalization rules, applied in this order
+NORMALIZATION_RULES = {
+    # Ids and counters that change on every repeat of the same error
+    'uuids': (re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', re.I), '<uuid>'),
+    'hex': (re.compile(r'\b0x[0-9a-f]+\b|\b[0-9a-f]{12,}\b', re.I), '<hex>'),
+    'numbers': (re.compile(r'\d+(?:\.\d+)?'), '<n>'),
+    'whitespace': (re.compile(r'\s+'), ' '),
+}
+DEFAULT_RULES = ('case', 'uuids', 'whitespace', 'url-query')
+
+DEDUP_RULES = tuple(
+    rule.strip() for rule in os.environ.get('FEEDBACKFLOW_DEDUP_RULES', ','.join(DEFAULT_RULES)).split(',')
+    if rule.strip()
+)
+
+
+def normalize(text, rules=DEDUP_RULES):
+    """Normalize feedback text so trivially different repeats compare equal."""
+    text = text or ''
+    if 'case' in rules:
+        text = text.lower()
+    for name, (pattern, replacement) in NORMALIZATION_RULES.items():
+        if name in rules:
+            text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+def normalize_url(url, rules=DEDUP_RULES):
+    """Drop the query string and fragment of a URL if the url-query rule is on."""
+    url = url or ''
+    if 'url-query' in rules:
+        url = url.split('#', 1)[0].split('?', 1)[0]
+    return url
+
+
+def fingerprint(text, url=None, rules=DEDUP_RULES):
+    """Return a short hex fingerprint of the normalized text and URL."""
+    key = normalize(text, rules) + '\0' + normalize_url(url, rules)
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+
+
+class DedupIndex:
+    """
+    Bounded, time-windowed index of recently seen fingerprints.
+
+    Fingerprints are kept in first-seen order, so expiry and the size bound
+    both evict from the front. Occurrences that collected repeats are handed
+    back by pop_finished() once they leave the index, so their final counts
+    can be persisted.
+    """
+
+    def __init__(self, window=DEDUP_WINDOW_SECONDS, max_entries=DEDUP_MAX_ENTRIES, rules=DEDUP_RULES):
+        self.window = window
+        self.max_entries = max_entries
+        self.rules = rules
+        self._entries = OrderedDict()
+        self._finished = []
+
+    @property
+    def enabled(self):
+        return self.window > 0 and self.max_entries > 0
+
+    def _evict(self, now):
+        while self._entries:
+            key, occurrence = next(iter(self._entries.items()))
+            if now - occurrence['first_seen'] < self.window and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+            if occurrence['count'] > 1:
+                self._finished.append(occurrence)
+
+    def observe(self, text, url=None, now=None):
+        """
+        Record one sighting of an entry.
+
+        Returns:
+            A tuple (occurrence, is_new). For a new entry the caller should
+            write it and store its id in occurrence['record_id']; for a repeat
+            the occurrence's count and last_seen have already been updated.
+        """
+        now = time.time() if now is None else now
+        key = fingerprint(text, url, self.rules)
+        if not self.enabled:
+            return {'fingerprint': key, 'first_seen': now, 'last_seen': now, 'count': 1}, True
+
+        self._evict(now)
+        occurrence = self._entries.get(key)
+        if occurrence is not None:
+            occurrence['count'] += 1
+            occurrence['last_seen'] = now
+            return occurrence, False
+
+        occurrence = {'fingerprint': key, 'first_seen': now, 'last_seen': now, 'count': 1, 'record_id': None}
+        self._entries[key] = occurrence
+        self._evict(now)
+        return occurrence, True
+
+    def forget(self, occurrence):
+        """Drop an occurrence whose entry could not be written."""
+        self._entries.pop(occurrence['fingerprint'], None)
+
+    def pop_finished(self, now=None):
+        """Return the repeated occurrences whose window has closed."""
+        self._evict(time.time() if now is None else now)
+        finished, self._finished = self._finished, []
+        return finished
+
+    def pop_all(self):
+        """Close every window and return all repeated occurrences (e.g. at shutdown)."""
+        finished = self._finished + [o for o in self._entries.values() if o['count'] > 1]
+        self._entries.clear()
+        self._finished = []
+        return finished
+
+    def clear(self):
+        """Forget every fingerprint without reporting them."""
+        self._entries.clear()
+        self._finished = []
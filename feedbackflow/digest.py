@@ -0,0 +1,131 @@
+"""
+Token-budgeted digests of recent feedback.
+
+A digest packs as much useful feedback as fits into a token budget instead of
+the whole log: repeats of the same feedback are collapsed into one line with a
+count, long bodies are truncated, and entries are ordered by a score that
+favours recent and frequent feedback. Token counts are estimated locally from
+the text length, which is close enough for budgeting and costs nothing.
+"""
+
+import math
+import time
+from urllib.parse import urlsplit
+
+from feedbackflow.dedup import fingerprint
+from feedbackflow.store import parse_timestamp
+
+# Characters per token for the estimate (typical for English text)
+CHARS_PER_TOKEN = 4
+
+# Longest feedback body shown for one entry
+MAX_BODY_CHARS = 280
+
+# Recency half-life of the ranking score
+RECENCY_HALF_LIFE_HOURS = 24.0
+
+GROUP_BY = ('none', 'origin', 'path', 'day')
+
+
+def estimate_tokens(text):
+    """Cheap local estimate of how many tokens `text` takes."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _truncate(text, limit=MAX_BODY_CHARS):
+    text = ' '.join((text or '').split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+
+def _group_key(group_by, url, timestamp):
+    if group_by == 'day':
+        return time.strftime('%Y-%m-%d', time.localtime(timestamp))
+    parts = urlsplit(url or '')
+    if not parts.netloc:
+        return '(no URL)'
+    origin = f"{parts.scheme}://{parts.netloc}"
+    return origin if group_by == 'origin' else origin + (parts.path or '/')
+
+
+def build_digest(records, max_tokens=2000, group_by='none', occurrences=None, now=None):
+    """
+    Render a digest of feedback records within a token budget.
+
+    Args:
+        records: Feedback records (dicts with timestamp, url, feedback).
+        max_tokens: Token budget for the whole digest.
+        group_by: 'none', 'origin', 'path' or 'day'.
+        occurrences: Optional {record id: {'count': n}} of collapsed repeats.
+        now: Reference time for recency, in epoch seconds.
+
+    Returns:
+        The digest as a string.
+    """
+    if group_by not in GROUP_BY:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+    now = time.time() if now is None else now
+    occurrences = occurrences or {}
+
+    # Collapse entries with the same normalized text and URL
+    items = {}
+    for record in records:
+        timestamp = parse_timestamp(record.get('timestamp'))
+        if timestamp is None:
+            timestamp = int(record['id']) / 1e9 if str(record.get('id', '')).isdigit() else now
+        key = fingerprint(record.get('feedback'), record.get('url'))
+        count = occurrences.get(record.get('id'), {}).get('count', 1)
+        item = items.get(key)
+        if item is None:
+            items[key] = {'record': record, 'count': count, 'first': timestamp, 'last': timestamp}
+        else:
+            item['count'] += count
+            item['first'] = min(item['first'], timestamp)
+            if timestamp >= item['last']:
+                item['last'] = timestamp
+                item['record'] = record
+
+    for item in items.values():
+        age_hours = max(0.0, now - item['last']) / 3600
+        item['score'] = (1 + math.log(item['count'])) * 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS)
+    ranked = sorted(items.values(), key=lambda item: item['score'], reverse=True)
+
+    total = sum(item['count'] for item in ranked)
+    header = f"Feedback digest: {len(ranked)} distinct entries ({total} total)"
+    # Keep room for the header and the closing "omitted" line
+    budget = max_tokens - estimate_tokens(header) - 20
+
+    # Pick entries in rank order until the budget is spent
+    chosen = {}
+    used_groups = set()
+    shown = 0
+    for item in ranked:
+        record = item['record']
+        group = _group_key(group_by, record.get('url'), item['last']) if group_by != 'none' else None
+        line = "- "
+        if item['count'] > 1:
+            line += f"[x{item['count']}] "
+        line += time.strftime('%Y-%m-%d %H:%M', time.localtime(item['last']))
+        if record.get('url') and group_by not in ('origin', 'path'):
+            line += f" {record['url']}"
+        elif record.get('url') and group_by == 'origin':
+            line += f" {urlsplit(record['url']).path or '/'}"
+        line += f": {_truncate(record.get('feedback'))}"
+
+        cost = estimate_tokens(line) + 1
+        if group is not None and group not in used_groups:
+            cost += estimate_tokens(f"\n## {group}") + 1
+        if cost > budget:
+            continue
+        budget -= cost
+        used_groups.add(group)
+        chosen.setdefault(group, []).append(line)
+        shown += 1
+
+    lines = [header]
+    for group, group_lines in chosen.items():
+        if group is not None:
+            lines.append(f"\n## {group}")
+        lines.extend(group_lines)
+    if shown < len(ranked):
+        lines.append(f"({len(ranked) - shown} lower-ranked entries omitted to fit {max_tokens} tokens)")
+    return '\n'.join(lines)
@@ -0,0 +1,163 @@
+"""
+Streaming parser for feedback.log.
+
+The log holds two kinds of entries:
+
+  dashed blocks written by the Chrome extension (background.js)
+      -------------------------------
+      Timestamp: 2025-01-01T12:00:00.000Z
+      URL: https://example.com/
+      Title: Example
+      Feedback: The button is hard to see
+      -------------------------------
+
+  single entries written by the MCP server
+      [2025-01-01 12:00:00] The button is hard to see
+
+The file is memory-mapped and scanned line by line, and entries are yielded
+one at a time, so memory use does not grow with the size of the log. Every
+entry records the byte offsets it spans; passing an entry's end offset back
+as `start` resumes right after it.
+"""
+
+import os
+import re
+import mmap
+from typing import List, NamedTuple, Optional
+
+from feedbackflow.store import BLOCK_FIELDS
+
+MCP_ENTRY = re.compile(rb'^\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\] ?(.*)$')
+SEPARATOR = b'-----'
+
+
+class LogEntry(NamedTuple):
+    """One feedback entry parsed from the log."""
+    kind: str                   # 'block' (Chrome extension) or 'mcp'
+    start: int                  # byte offset of the entry's first line
+    end: int                    # byte offset just past the entry
+    timestamp: Optional[str]
+    url: Optional[str]
+    title: Optional[str]
+    feedback: str
+    attachments: List[str]
+
+    def to_dict(self):
+        """The entry's fields in the record store's layout."""
+        return {
+            'timestamp': self.timestamp,
+            'url': self.url,
+            'title': self.title,
+            'feedback': self.feedback,
+            'attachments': self.attachments,
+        }
+
+
+def _lines(buffer, start):
+    """Yield (line start, line end, line bytes without the newline) for complete lines."""
+    position = start
+    size = len(buffer)
+    while position < size:
+        newline = buffer.find(b'\n', position)
+        if newline < 0:
+            # A line still being written is left for the next read
+            return
+        line = buffer[position:newline]
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        yield position, newline + 1, line
+        position = newline + 1
+
+
+def _decode(value):
+    return value.decode('utf-8', errors='replace')
+
+
+def _parse(buffer, start):
+    block = None        # fields of the dashed block being read
+    block_start = None
+    mcp = None          # [start, timestamp, message lines] of the MCP entry being read
+    current = None      # block field that continuation lines belong to
+
+    def finish_mcp(end):
+        entry_start, timestamp, lines = mcp
+        return LogEntry('mcp', entry_start, end, _decode(timestamp), None, None,
+                        _decode(b'\n'.join(lines)).strip(), [])
+
+    last_end = start
+    for line_start, line_end, line in _lines(buffer, start):
+        if block is not None:
+            if line.startswith(SEPARATOR):
+                if block:
+                    attachments = block.pop('attachments', '')
+                    yield LogEntry('block', block_start, line_end, block.get('timestamp'), block.get('url'),
+                                   block.get('title'), block.get('feedback', ''),
+                                   [h.strip() for h in attachments.split(',') if h.strip()])
+                    block = None
+                else:
+                    # Back-to-back separators: the block starts here
+                    block_start = line_start
+                current = None
+                continue
+            key, sep, value = line.partition(b': ')
+            key = _decode(key)
+            if sep and key in BLOCK_FIELDS:
+                current = BLOCK_FIELDS[key]
+                block[current] = _decode(value)
+            elif current == 'feedback':
+                block[current] += '\n' + _decode(line)
+            continue
+
+        if mcp is not None:
+            if line.strip() and not line.startswith(SEPARATOR) and not MCP_ENTRY.match(line):
+                mcp[2].append(line)
+                last_end = line_end
+                continue
+            yield finish_mcp(last_end if not line.strip() else line_start)
+            mcp = None
+            if not line.strip():
+                continue
+
+        if line.startswith(SEPARATOR):
+            block = {}
+            block_start = line_start
+            current = None
+            continue
+        match = MCP_ENTRY.match(line)
+        if match:
+            mcp = [line_start, match.group(1), [match.group(2)]]
+            last_end = line_end
+
+    if mcp is not None:
+        yield finish_mcp(last_end)
+
+
+def iter_entries(path, start=0):
+    """
+    Lazily parse the entries of a feedback log.
+
+    Args:
+        path: The log file.
+        start: Byte offset to start at, e.g. the end offset of an entry
+               returned earlier. It must be the start of a line.
+
+    Yields:
+        LogEntry tuples in file order. A partly written entry at the end of
+        the file is not yielded; it is returned by a later read once complete.
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or start >= size:
+            return
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as buffer:
+            for entry in _parse(buffer, start):
+                yield entry
+
+
+def count_entries(path):
+    """Count the entries of a log without holding it in memory."""
+    return sum(1 for _ in iter_entries(path))
@@ -0,0 +1,478 @@
+"""
+Append-only journal for the MCP server's feedback metadata.
+
+Instead of rewriting the whole of ~/.feedbackflow/feedback_meta.json on every
+change, each add or update is appended as one JSON event line to
+feedback_meta.journal. The in-memory view is the last snapshot
+(feedback_meta.json) plus the events after it, and new events from other
+processes are picked up by reading only the journal's tail. Once enough events
+have collected, a background thread writes a fresh snapshot and trims the
+journal.
+
+Entries carry the unique id of their record. Alongside the view are an id ->
+position hash index, a timestamp column kept sorted for bisect, and posting
+lists of positions per source URL, per origin and per addressed state, so
+filtered queries only touch the entries they could return.
+
+Configuration (environment variables):
+  FEEDBACKFLOW_META_COMPACT_EVENTS  journal events that trigger compaction
+"""
+
+import os
+import json
+import bisect
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from feedbackflow.store import locked, parse_timestamp
+
+META_COMPACT_EVENTS = int(os.environ.get('FEEDBACKFLOW_META_COMPACT_EVENTS', '1000'))
+
+# Entries serialized at a time when compacting; between chunks other threads
+# get the interpreter, so adds are not held up by one long json.dumps call
+SNAPSHOT_CHUNK_ENTRIES = 1000
+
+
+def get_feedback_dir():
+    """Get the default FeedbackFlow data directory."""
+    return os.path.join(str(Path.home()), '.feedbackflow')
+
+
+def url_origin(url):
+    """The scheme://host part of a URL, or None if it has none."""
+    try:
+        parts = urlsplit(url or '')
+    except ValueError:
+        return None
+    if not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _file_key(path):
+    """Identify a file version by inode and modification time, or None if missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+class MetaJournal:
+    """Materialized feedback metadata backed by a snapshot and an event journal."""
+
+    def __init__(self, feedback_dir=None, compact_events=META_COMPACT_EVENTS):
+        self.feedback_dir = feedback_dir or get_feedback_dir()
+        self.snapshot_path = os.path.join(self.feedback_dir, 'feedback_meta.json')
+        self.journal_path = os.path.join(self.feedback_dir, 'feedback_meta.journal')
+        self.lock_path = os.path.join(self.feedback_dir, '.meta.lock')
+        self.compact_events = compact_events
+
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset_view()
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._snapshot_key = None
+        self._journal_ino = None
+        self._offset = 0
+        self._compacting = False
+
+    def _load(self):
+        """Rebuild the view from the snapshot and the whole journal."""
+        self._snapshot_key = _file_key(self.snapshot_path)
+        snapshot = {}
+        if self._snapshot_key is not None:
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except ValueError:
+                pass
+        self._reset_view()
+        for entry in snapshot.get('entries', []):
+            self._add_entry(entry)
+        self._seq = self._snapshot_seq = snapshot.get('seq', 0)
+        self._journal_ino = None
+        self._offset = 0
+        self._loaded = True
+        self._read_tail()
+
+    def _read_tail(self):
+        """Apply the journal events written since the last read."""
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            self._journal_ino = os.fstat(f.fileno()).st_ino
+            f.seek(self._offset)
+            data = f.read()
+        # A line still being written by another process is read next time
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._offset += end
+
+    def _refresh(self):
+        """Bring the view up to date with changes made by any process."""
+        if not self._loaded or _file_key(self.snapshot_path) != self._snapshot_key:
+            self._load()
+            return
+        try:
+            stat = os.stat(self.journal_path)
+        except FileNotFoundError:
+            if self._offset:
+                self._load()
+            return
+        if stat.st_ino != self._journal_ino or stat.st_size < self._offset:
+            # The journal was trimmed or replaced since we last read it
+            self._load()
+        elif stat.st_size > self._offset:
+            self._read_tail()
+
+    def _reset_view(self):
+        self._entries = []
+        self._by_id = {}
+        # Epoch timestamps in sorted order, with the position of each entry
+        self._timestamps = []
+        self._timestamp_positions = []
+        self._times = []
+        # Posting lists: sorted entry positions per key
+        self._by_source = {}
+        self._by_origin = {}
+        self._by_state = {True: [], False: []}
+        # Running total of time-to-address over the addressed entries that have one
+        self._address_seconds = 0.0
+        self._address_timed = 0
+
+    def _add_entry(self, entry):
+        """Append an entry to the view and its indexes."""
+        position = len(self._entries)
+        self._entries.append(entry)
+        if entry.get('id') is not None:
+            self._by_id[str(entry['id'])] = position
+
+        timestamp = parse_timestamp(entry.get('timestamp')) or 0.0
+        self._times.append(timestamp)
+        # Entries arrive in time order, so this is almost always an append
+        slot = bisect.bisect_right(self._timestamps, timestamp)
+        self._timestamps.insert(slot, timestamp)
+        self._timestamp_positions.insert(slot, position)
+
+        source = entry.get('source')
+        if source:
+            self._by_source.setdefault(source, []).append(position)
+            origin = url_origin(source)
+            if origin:
+                self._by_origin.setdefault(origin, []).append(position)
+        self._by_state[bool(entry.get('addressed'))].append(position)
+        if entry.get('addressed'):
+            self._count_address(entry, 1)
+
+    def _count_address(self, entry, sign):
+        """Add (sign=1) or remove (sign=-1) an entry's time-to-address."""
+        added = parse_timestamp(entry.get('timestamp'))
+        addressed = parse_timestamp(entry.get('addressed_at'))
+        if added is not None and addressed is not None:
+            self._address_seconds += sign * (addressed - added)
+            self._address_timed += sign
+
+    def _update_entry(self, position, fields):
+        """
+        Change fields of an entry, moving it between state posting lists.
+
+        The entry is replaced by an updated copy rather than changed in place,
+        so a copy of the entry list taken earlier stays a consistent snapshot.
+        """
+        old_entry = self._entries[position]
+        was_addressed = bool(old_entry.get('addressed'))
+        if was_addressed:
+            self._count_address(old_entry, -1)
+        entry = self._entries[position] = dict(old_entry, **fields)
+        if entry.get('addressed'):
+            self._count_address(entry, 1)
+        if bool(entry.get('addressed')) != was_addressed:
+            old_list = self._by_state[was_addressed]
+            del old_list[bisect.bisect_left(old_list, position)]
+            bisect.insort(self._by_state[not was_addressed], position)
+
+    def _apply(self, event):
+        """Apply one journal event to the view."""
+        if event['seq'] <= self._seq:
+            return
+        self._seq = event['seq']
+        if event['op'] == 'add':
+            self._add_entry(event['entry'])
+        elif event['op'] == 'update':
+            position = event['position']
+            if 0 <= position < len(self._entries):
+                self._update_entry(position, event['fields'])
+
+    def _append(self, events, fsync=False):
+        """
+        Write events to the journal with a single write and apply them in order.
+
+        Returns:
+            The position each event added or updated.
+        """
+        os.makedirs(self.feedback_dir, exist_ok=True)
+        positions = []
+        with self._lock:
+            with locked(self.lock_path):
+                self._refresh()
+                lines = []
+                for seq, event in enumerate(events, self._seq + 1):
+                    event['seq'] = seq
+                    lines.append((json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8'))
+                with open(self.journal_path, 'ab') as f:
+                    f.write(b''.join(lines))
+                    if fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                    self._journal_ino = os.fstat(f.fileno()).st_ino
+                    self._offset = f.tell()
+                for event in events:
+                    self._apply(event)
+                    positions.append(len(self._entries) - 1 if event['op'] == 'add' else event['position'])
+            self.maybe_compact()
+        return positions
+
+    def entries(self):
+        """Return the current metadata entries."""
+        with self._lock:
+            self._refresh()
+            return list(self._entries)
+
+    def version(self):
+        """Sequence number of the last change, for cache keys."""
+        with self._lock:
+            self._refresh()
+            return self._seq
+
+    def view(self):
+        """Return the metadata in the feedback_meta.json layout."""
+        return {'entries': self.entries()}
+
+    def get(self, entry_id):
+        """Return the entry with id `entry_id`, or None."""
+        with self._lock:
+            self._refresh()
+            position = self._by_id.get(str(entry_id))
+            return None if position is None else self._entries[position]
+
+    def entry_at(self, position):
+        """Return the entry at `position`."""
+        with self._lock:
+            self._refresh()
+            return self._entries[position]
+
+    def position_of(self, entry_id):
+        """Return the position of the entry with id `entry_id`, or None."""
+        with self._lock:
+            self._refresh()
+            return self._by_id.get(str(entry_id))
+
+    def positions_at(self, timestamp):
+        """Return the positions of the entries with exactly this timestamp, oldest first."""
+        value = parse_timestamp(timestamp)
+        if value is None:
+            return []
+        with self._lock:
+            self._refresh()
+            first = bisect.bisect_left(self._timestamps, value)
+            last = bisect.bisect_right(self._timestamps, value)
+            return sorted(self._timestamp_positions[first:last])
+
+    def address_stats(self):
+        """Return addressed/open entry counts and the mean time-to-address in seconds."""
+        with self._lock:
+            self._refresh()
+            return {
+                'addressed': len(self._by_state[True]),
+                'open': len(self._by_state[False]),
+                'mean_time_to_address_seconds': (
+                    self._address_seconds / self._address_timed if self._address_timed else None),
+            }
+
+    def query(self, source=None, since=None, until=None, addressed=None, limit=50, order='desc'):
+        """
+        Return entries matching every given filter.
+
+        Candidates come from the smallest of the matching posting lists or
+        the bisected time range; the other filters are checked per candidate.
+
+        Args:
+            source: A source URL, or an origin such as https://example.com.
+            since: Only entries at or after this timestamp.
+            until: Only entries at or before this timestamp.
+            addressed: True or False to filter on the addressed state.
+            limit: Maximum number of entries to return.
+            order: 'desc' for newest first, 'asc' for oldest first.
+
+        Returns:
+            The matching entries.
+        """
+        start = parse_timestamp(since) if since is not None else None
+        end = parse_timestamp(until) if until is not None else None
+        if (since is not None and start is None) or (until is not None and end is None):
+            raise ValueError(f"Invalid timestamp: {since if start is None else until}")
+
+        with self._lock:
+            self._refresh()
+            # Posting lists are in position order; a time range is in timestamp order
+            candidates = []
+            if source:
+                candidates.append(self._by_source.get(source) or self._by_origin.get(source) or [])
+            if addressed is not None:
+                candidates.append(self._by_state[bool(addressed)])
+            in_range = None
+            if start is not None or end is not None:
+                first = 0 if start is None else bisect.bisect_left(self._timestamps, start)
+                last = len(self._timestamps) if end is None else bisect.bisect_right(self._timestamps, end)
+                in_range = self._timestamp_positions[first:last]
+                candidates.append(in_range)
+            if not candidates:
+                candidates.append(range(len(self._entries)))
+            positions = min(candidates, key=len)
+            if positions is in_range:
+                positions = sorted(positions)
+
+            results = []
+            for position in (reversed(positions) if order == 'desc' else positions):
+                entry = self._entries[position]
+                if source and source != entry.get('source') and source != url_origin(entry.get('source')):
+                    continue
+                if addressed is not None and bool(entry.get('addressed')) != bool(addressed):
+                    continue
+                if start is not None or end is not None:
+                    timestamp = self._times[position]
+                    if (start is not None and timestamp < start) or (end is not None and timestamp > end):
+                        continue
+                results.append(entry)
+                if len(results) >= limit:
+                    break
+            return results
+
+    def add(self, entry):
+        """
+        Append a metadata entry.
+
+        Returns:
+            The position of the new entry.
+        """
+        return self._append([{'op': 'add', 'entry': entry}])[0]
+
+    def update(self, position, fields):
+        """Set `fields` on the entry at `position`."""
+        self._append([{'op': 'update', 'position': position, 'fields': fields}])
+
+    def add_many(self, entries, fsync=False):
+        """
+        Append several entries with one journal write.
+
+        Args:
+            entries: The metadata entries, in order.
+            fsync: Flush the journal to disk before returning.
+
+        Returns:
+            The positions of the new entries.
+        """
+        if not entries:
+            return []
+        return self._append([{'op': 'add', 'entry': entry} for entry in entries], fsync)
+
+    def update_many(self, updates, fsync=False):
+        """Apply (position, fields) updates with one journal write."""
+        if updates:
+            self._append([{'op': 'update', 'position': position, 'fields': fields}
+                          for position, fields in updates], fsync)
+
+    def clear(self):
+        """Remove every entry, leaving an empty snapshot and no journal."""
+        os.makedirs(self.feedback_dir, exist_ok=True)
+        with self._lock:
+            with locked(self.lock_path):
+                self._refresh()
+                self._write_snapshot([], self._seq)
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+                self._load()
+
+    def _write_snapshot(self, entries, seq):
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': entries, 'seq': seq}, f, ensure_ascii=False)
+        os.replace(temp_path, self.snapshot_path)
+
+    def compact(self):
+        """
+        Write a fresh snapshot and drop the journal events it includes.
+
+        The snapshot is serialized and written without holding either lock,
+        from a copy of the entry list, so adds are only blocked while the
+        journal is trimmed.
+
+        Returns:
+            True if a snapshot was written.
+        """
+        with self._lock:
+            self._refresh()
+            snapshot_key = self._snapshot_key
+            seq = self._seq
+            entries = list(self._entries)
+        if seq == self._snapshot_seq:
+            return False
+
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write('{"entries": [')
+            for start in range(0, len(entries), SNAPSHOT_CHUNK_ENTRIES):
+                chunk = json.dumps(entries[start:start + SNAPSHOT_CHUNK_ENTRIES], ensure_ascii=False)
+                f.write((', ' if start else '') + chunk[1:-1])
+            f.write(f'], "seq": {seq}}}')
+
+        with self._lock:
+            with locked(self.lock_path):
+                if _file_key(self.snapshot_path) != snapshot_key:
+                    # Another process compacted or cleared in the meantime
+                    os.remove(temp_path)
+                    return False
+                os.replace(temp_path, self.snapshot_path)
+
+                # Keep only the events newer than the snapshot
+                kept = []
+                try:
+                    with open(self.journal_path, 'rb') as f:
+                        kept = [line for line in f
+                                if line.endswith(b'\n') and json.loads(line)['seq'] > seq]
+                except FileNotFoundError:
+                    pass
+                journal_temp = self.journal_path + '.tmp'
+                with open(journal_temp, 'wb') as f:
+                    f.write(b''.join(kept))
+                os.replace(journal_temp, self.journal_path)
+
+                # Carry the view over without rereading the snapshot
+                self._snapshot_key = _file_key(self.snapshot_path)
+                self._snapshot_seq = seq
+                self._journal_ino = os.stat(self.journal_path).st_ino
+                self._offset = sum(len(line) for line in kept if json.loads(line)['seq'] <= self._seq)
+        return True
+
+    def maybe_compact(self):
+        """Compact in a background thread once enough events have collected."""
+        with self._lock:
+            if self._compacting or self._seq - self._snapshot_seq < self.compact_events:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+            finally:
+                with self._lock:
+                    self._compacting = False
+
+        threading.Thread(target=run, daemon=True).start()
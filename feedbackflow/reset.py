@@ -0,0 +1,65 @@
+"""
+Clearing all stored feedback.
+
+The feedback log is only one of the places feedback is kept: rotated log
+segments, the structured records with their repeat counts, the MCP metadata
+journal, the attachment blobs they reference and the indexes built over the
+records all hold it too. clear_all_feedback() empties every one of them, so
+no view keeps showing entries whose records or attachments are gone, and the
+CLI, the native host and the MCP server all mean the same by "clear".
+"""
+
+import os
+
+from feedbackflow.store import RecordStore
+from feedbackflow.segments import SegmentedLog, get_feedback_dir
+from feedbackflow.blobs import BlobStore
+from feedbackflow.meta import MetaJournal
+from feedbackflow.search import SearchIndex
+from feedbackflow.stats import FeedbackStats
+
+
+def clear_all_feedback(feedback_dir=None, record_store=None, segmented_log=None, blob_store=None,
+                       meta_journal=None, search_index=None, feedback_stats=None):
+    """
+    Remove every feedback entry from the log, its segments, the records,
+    the metadata and the indexes, and delete attachments nothing uses.
+
+    Callers that keep any of the stores open pass them in, so their
+    in-memory state is reset as well; the others are opened here.
+
+    Args:
+        feedback_dir: The FeedbackFlow data directory (~/.feedbackflow).
+
+    Returns:
+        The time of the clear, as written in the new log's header.
+    """
+    feedback_dir = feedback_dir or get_feedback_dir()
+    os.makedirs(feedback_dir, exist_ok=True)
+    if record_store is None:
+        record_store = RecordStore(os.path.join(feedback_dir, 'records'))
+    if segmented_log is None:
+        segmented_log = SegmentedLog(os.path.join(feedback_dir, 'feedback.log'))
+    if blob_store is None:
+        blob_store = BlobStore(os.path.join(feedback_dir, 'blobs'))
+    if meta_journal is None:
+        meta_journal = MetaJournal(feedback_dir)
+    if search_index is None:
+        search_index = SearchIndex(record_store)
+    if feedback_stats is None:
+        feedback_stats = FeedbackStats(record_store)
+
+    timestamp = segmented_log.clear()
+    meta_journal.clear()
+
+    # Drop the records' attachment references so unused blobs can be collected
+    blob_store.release_refs(
+        [h for record in record_store.iter_records() for h in record.get('attachments') or []])
+    record_store.clear()
+    search_index.clear()
+    feedback_stats.clear()
+    themes_path = os.path.join(record_store.root, 'themes.npz')
+    if os.path.exists(themes_path):
+        os.remove(themes_path)
+    blob_store.collect_garbage()
+    return timestamp
@@ -0,0 +1,470 @@
+"""
+Persistent inverted index over feedback records, ranked with BM25.
+
+Every record in the record store is a document made of its feedback text,
+title and URL. The index lives next to the records in search/, as segments
+that each cover a contiguous range of store positions:
+
+  magic, header length (u32), JSON header {first_doc, docs, total_length,
+                                           last_id, terms}
+  document table   one (timestamp f64, length u32) per record in the range
+  postings         one (store position u32, term frequency u32) per term
+                   occurrence
+
+search/manifest.json lists the segments in order with their document
+ranges. Each segment header maps a term to the offset and length of its
+posting list, so a cold start only parses the headers and memory-maps the
+rest; a query decodes just the posting lists of its own terms.
+
+Records added since the last segment was written are indexed in memory as
+they arrive and written out as a new small segment every
+FEEDBACKFLOW_SEARCH_FLUSH_DOCS documents, so a flush only costs as much as
+the documents it adds. Once FEEDBACKFLOW_SEARCH_MERGE_FACTOR neighbouring
+segments of the same size tier exist, a background thread merges them into
+one, leaving the segments being read untouched until it swaps the merged one
+in.
+"""
+
+import os
+import re
+import json
+import math
+import mmap
+import heapq
+import bisect
+import struct
+import threading
+from collections import Counter
+
+from feedbackflow.store import locked, parse_timestamp
+
+MAGIC = b'FFSEARCH2\n'
+HEADER_LENGTH = struct.Struct('<I')
+DOC_ENTRY = struct.Struct('<dI')
+POSTING = struct.Struct('<II')
+
+# Documents indexed in memory before they are written out as a segment
+SEARCH_FLUSH_DOCS = int(os.environ.get('FEEDBACKFLOW_SEARCH_FLUSH_DOCS', '200'))
+
+# Neighbouring segments of one size tier that are merged into one
+SEARCH_MERGE_FACTOR = int(os.environ.get('FEEDBACKFLOW_SEARCH_MERGE_FACTOR', '8'))
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    return TOKEN_PATTERN.findall((text or '').lower())
+
+
+def document_text(record):
+    """The searchable text of a record: feedback, title and URL."""
+    return ' '.join(str(record.get(field) or '') for field in ('feedback', 'title', 'url'))
+
+
+def write_segment(path, first_doc, docs, total_length, last_id, doc_table, postings):
+    """
+    Write one segment file atomically.
+
+    Args:
+        first_doc: Store position of the segment's first document.
+        docs: Number of documents in the segment.
+        doc_table: The packed document table.
+        postings: (term, packed posting list) pairs.
+    """
+    terms = {}
+    offset = 0
+    for term, packed in postings:
+        count = len(packed) // POSTING.size
+        terms[term] = [offset, count]
+        offset += count
+    header = json.dumps({
+        'first_doc': first_doc,
+        'docs': docs,
+        'total_length': total_length,
+        'last_id': last_id,
+        'terms': terms,
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        f.write(doc_table)
+        for _, packed in postings:
+            f.write(packed)
+    os.replace(temp_path, path)
+
+
+class Segment:
+    """A read-only, memory-mapped segment file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buffer[:len(MAGIC)] != MAGIC:
+            self._buffer.close()
+            raise ValueError(f"Not a search index segment: {path}")
+        header_length = HEADER_LENGTH.unpack_from(self._buffer, len(MAGIC))[0]
+        header_start = len(MAGIC) + HEADER_LENGTH.size
+        header = json.loads(self._buffer[header_start:header_start + header_length])
+        self.first_doc = header['first_doc']
+        self.docs = header['docs']
+        self.total_length = header['total_length']
+        self.last_id = header['last_id']
+        self.terms = header['terms']
+        self._docs_offset = header_start + header_length
+        self._postings_offset = self._docs_offset + self.docs * DOC_ENTRY.size
+
+    @property
+    def end_doc(self):
+        return self.first_doc + self.docs
+
+    def doc(self, doc):
+        """(timestamp, length) of the document at store position `doc`."""
+        return DOC_ENTRY.unpack_from(self._buffer, self._docs_offset + (doc - self.first_doc) * DOC_ENTRY.size)
+
+    def doc_table(self):
+        """The packed document table."""
+        return self._buffer[self._docs_offset:self._postings_offset]
+
+    def packed_postings(self, term):
+        """The packed posting list of a term, or b'' if the term is absent."""
+        location = self.terms.get(term)
+        if location is None:
+            return b''
+        offset, count = location
+        start = self._postings_offset + offset * POSTING.size
+        return self._buffer[start:start + count * POSTING.size]
+
+
+class SearchIndex:
+    """BM25 search over a RecordStore, kept on disk as segments of posting lists."""
+
+    def __init__(self, store, path=None, flush_docs=SEARCH_FLUSH_DOCS,
+                 merge_factor=SEARCH_MERGE_FACTOR, background_merge=True):
+        self.store = store
+        self.path = path or os.path.join(store.root, 'search')
+        self.manifest_path = os.path.join(self.path, 'manifest.json')
+        self.lock_path = os.path.join(self.path, 'index.lock')
+        self.flush_docs = flush_docs
+        self.merge_factor = merge_factor
+        self.background_merge = background_merge
+        # Guards the in-memory state; merges only take it to swap segments in
+        self._lock = threading.RLock()
+        self._merge_thread = None
+        self._reset()
+        # The segments are mapped on first use, so constructing is free
+        self._loaded = False
+
+    def _reset(self):
+        # Segments are not closed explicitly: a merge or query may still be
+        # reading them, and each mapping is released with its last reference
+        self._segments = []
+        self._starts = []
+        self._base_docs = 0
+        self._docs = 0
+        self._total_length = 0
+        self._last_id = None
+        # Documents indexed since the last segment was written
+        self._delta_docs = []
+        self._delta_postings = {}
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'segments': [], 'next_number': 1}
+
+    def _save_manifest(self, manifest):
+        """Atomically replace the manifest file."""
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def _open_segments(self, manifest):
+        """Map the segments listed in a manifest, reusing those already mapped."""
+        mapped = {segment.path: segment for segment in self._segments}
+        segments = []
+        for entry in manifest['segments']:
+            path = os.path.join(self.path, entry['file'])
+            segments.append(mapped.get(path) or Segment(path))
+        return segments
+
+    def _use_segments(self, segments):
+        """Serve queries from `segments`, which must cover the indexed documents."""
+        self._segments = segments
+        self._starts = [segment.first_doc for segment in segments]
+
+    def _load(self):
+        """Map the segments named in the manifest, dropping in-memory documents."""
+        segments = []
+        for _ in range(3):
+            try:
+                segments = self._open_segments(self._read_manifest())
+                break
+            except FileNotFoundError:
+                # Another process merged segments while the manifest was read
+                continue
+        self._reset()
+        self._loaded = True
+        self._use_segments(segments)
+        self._base_docs = self._docs = sum(segment.docs for segment in segments)
+        self._total_length = sum(segment.total_length for segment in segments)
+        self._last_id = segments[-1].last_id if segments else None
+
+    def _doc(self, doc):
+        """(timestamp, length) of a document."""
+        if doc < self._base_docs:
+            return self._segments[bisect.bisect_right(self._starts, doc) - 1].doc(doc)
+        return self._delta_docs[doc - self._base_docs]
+
+    def _postings(self, term):
+        """(document, term frequency) pairs of a term, oldest segment first."""
+        postings = []
+        for segment in self._segments:
+            postings.extend(POSTING.iter_unpack(segment.packed_postings(term)))
+        postings.extend(self._delta_postings.get(term, ()))
+        return postings
+
+    def update(self):
+        """
+        Index the records added to the store since the last update.
+
+        Returns:
+            The number of newly indexed records.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            total = self.store.count()
+            if total < self._docs or (self._docs and self.store.id_at(self._docs - 1) != self._last_id):
+                # The store was cleared since the index was built
+                self.clear()
+            if total == self._docs:
+                return 0
+
+            records = self.store.read_range(self._docs, total)
+            for record in records:
+                tokens = tokenize(document_text(record))
+                timestamp = parse_timestamp(record.get('timestamp'))
+                if timestamp is None:
+                    timestamp = int(record['id']) / 1e9
+                for term, frequency in Counter(tokens).items():
+                    self._delta_postings.setdefault(term, []).append((self._docs, frequency))
+                self._delta_docs.append((timestamp, len(tokens)))
+                self._total_length += len(tokens)
+                self._docs += 1
+                self._last_id = record['id']
+
+            if len(self._delta_docs) >= self.flush_docs:
+                self.flush()
+            return len(records)
+
+    def flush(self):
+        """Write the in-memory documents out as a new segment."""
+        with self._lock:
+            if not self._loaded or not self._delta_docs:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            with locked(self.lock_path):
+                manifest = self._read_manifest()
+                # Skip the write if another process already indexed these documents
+                if sum(entry['docs'] for entry in manifest['segments']) == self._base_docs:
+                    name = f"segment-{manifest['next_number']:06d}.idx"
+                    write_segment(
+                        os.path.join(self.path, name), self._base_docs, len(self._delta_docs),
+                        sum(length for _, length in self._delta_docs), self._last_id,
+                        b''.join(DOC_ENTRY.pack(*doc) for doc in self._delta_docs),
+                        [(term, b''.join(POSTING.pack(*posting) for posting in postings))
+                         for term, postings in self._delta_postings.items()])
+                    manifest['segments'].append(
+                        {'file': name, 'first_doc': self._base_docs, 'docs': len(self._delta_docs)})
+                    manifest['next_number'] += 1
+                    self._save_manifest(manifest)
+                    # The single-file index used before segments
+                    legacy_path = os.path.join(self.store.root, 'search.idx')
+                    if os.path.exists(legacy_path):
+                        os.remove(legacy_path)
+            self._load()
+            self._start_merge()
+
+    def _tier(self, segment):
+        """Size tier of a segment: 0 below flush_docs * merge_factor documents, and so on."""
+        tier = 0
+        size = max(self.flush_docs, 1) * self.merge_factor
+        while segment.docs >= size:
+            tier += 1
+            size *= self.merge_factor
+        return tier
+
+    def _pick_merge(self):
+        """The first run of merge_factor neighbouring segments in one tier, if any."""
+        if self.merge_factor < 2:
+            return None
+        run = []
+        for segment in self._segments:
+            if run and self._tier(run[-1]) != self._tier(segment):
+                run = []
+            run.append(segment)
+            if len(run) == self.merge_factor:
+                return run
+        return None
+
+    def _start_merge(self):
+        """Merge segments that are due, in a background thread unless disabled."""
+        if self._pick_merge() is None:
+            return
+        if not self.background_merge:
+            self._merge_due()
+        elif self._merge_thread is None or not self._merge_thread.is_alive():
+            self._merge_thread = threading.Thread(target=self._merge_due, name='feedbackflow-search-merge',
+                                                  daemon=True)
+            self._merge_thread.start()
+
+    def wait_for_merges(self, timeout=None):
+        """Wait until the background merge thread, if any, has finished."""
+        thread = self._merge_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _merge_due(self):
+        """Merge runs of segments until none is due."""
+        while True:
+            with self._lock:
+                run = self._pick_merge()
+            try:
+                if run is None or not self._merge(run):
+                    return
+            except OSError:
+                # The index was cleared under the merge; the next flush retries
+                return
+
+    def _merge(self, run):
+        """
+        Merge a run of neighbouring segments into one.
+
+        The merged file is built from the run's own mappings without holding
+        the index lock; only the manifest update and the swap take locks.
+
+        Returns:
+            Whether the merged segment replaced the run.
+        """
+        terms = set()
+        for segment in run:
+            terms.update(segment.terms)
+        temp_path = os.path.join(self.path, f"merge-{os.getpid()}-{threading.get_ident()}.idx")
+        write_segment(
+            temp_path, run[0].first_doc, sum(segment.docs for segment in run),
+            sum(segment.total_length for segment in run), run[-1].last_id,
+            b''.join(segment.doc_table() for segment in run),
+            [(term, b''.join(segment.packed_postings(term) for segment in run)) for term in sorted(terms)])
+
+        names = [os.path.basename(segment.path) for segment in run]
+        with locked(self.lock_path):
+            manifest = self._read_manifest()
+            files = [entry['file'] for entry in manifest['segments']]
+            at = files.index(names[0]) if names[0] in files else -1
+            if at < 0 or files[at:at + len(names)] != names:
+                # The index was cleared or merged by another process meanwhile
+                os.remove(temp_path)
+                return False
+            name = f"segment-{manifest['next_number']:06d}.idx"
+            os.replace(temp_path, os.path.join(self.path, name))
+            manifest['segments'][at:at + len(names)] = [{
+                'file': name,
+                'first_doc': run[0].first_doc,
+                'docs': sum(segment.docs for segment in run),
+            }]
+            manifest['next_number'] += 1
+            self._save_manifest(manifest)
+
+        with self._lock:
+            paths = [segment.path for segment in self._segments]
+            at = paths.index(run[0].path) if run[0].path in paths else -1
+            if at >= 0 and paths[at:at + len(run)] == [segment.path for segment in run]:
+                merged = Segment(os.path.join(self.path, name))
+                self._use_segments(self._segments[:at] + [merged] + self._segments[at + len(run):])
+        for segment in run:
+            try:
+                os.remove(segment.path)
+            except OSError:
+                # Still mapped by a reader on a platform that forbids removing it
+                pass
+        return True
+
+    def clear(self):
+        """Drop the whole index."""
+        with self._lock:
+            self._reset()
+            self._loaded = True
+            legacy_path = os.path.join(self.store.root, 'search.idx')
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+            if not os.path.isdir(self.path):
+                return
+            with locked(self.lock_path):
+                for name in os.listdir(self.path):
+                    if name.endswith('.idx') or name.endswith('.tmp') or name == 'manifest.json':
+                        try:
+                            os.remove(os.path.join(self.path, name))
+                        except OSError:
+                            pass
+
+    def search(self, query, limit=10, since=None, until=None, where=None):
+        """
+        Rank records against a free-text query with BM25.
+
+        Args:
+            query: Words to search for.
+            limit: Maximum number of results.
+            since: Only records at or after this timestamp.
+            until: Only records at or before this timestamp.
+            where: Optional predicate a record must satisfy.
+
+        Returns:
+            A list of (score, record) tuples, best match first.
+        """
+        with self._lock:
+            return self._search(query, limit, since, until, where)
+
+    def _search(self, query, limit, since, until, where):
+        self.update()
+        if not self._docs:
+            return []
+        start = parse_timestamp(since) if since is not None else None
+        end = parse_timestamp(until) if until is not None else None
+        average_length = self._total_length / self._docs
+
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (self._docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, frequency in postings:
+                timestamp, length = self._doc(doc)
+                if (start is not None and timestamp < start) or (end is not None and timestamp > end):
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        # Predicates need the record, so read candidates in rank order until enough match
+        ranked = heapq.nlargest(len(scores) if where else limit, scores.items(), key=lambda item: item[1])
+        results = []
+        for doc, score in ranked:
+            record = self.store.read_range(doc, doc + 1)
+            if not record or (where is not None and not where(record[0])):
+                continue
+            results.append((score, record[0]))
+            if len(results) >= limit:
+                break
+        return results
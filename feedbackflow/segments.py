@@ -0,0 +1,338 @@
+"""
+Size- and time-based rotation of feedback.log into segments.
+
+When the active log grows past a size limit, or has been active for longer
+than an age limit, it is moved to ~/.feedbackflow/segments/feedback-000001.log
+(then -000002, ...) and a fresh log is started. segments/manifest.json lists
+every segment with the time range it covers, so readers only open the
+segments that overlap the range they are asked for.
+
+Incremental readers page through the log with an opaque cursor naming a log
+file by its segment number (the active log has the number it will get when it
+is rotated) and a byte offset in it, so each read seeks straight to where the
+last one stopped.
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+
+from feedbackflow.store import locked, parse_timestamp
+
+# Rotate once the active log reaches this many bytes...
+MAX_LOG_BYTES = int(os.environ.get('FEEDBACKFLOW_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+
+# ...or once it has been the active log for this many seconds
+MAX_LOG_AGE_SECONDS = float(os.environ.get('FEEDBACKFLOW_LOG_MAX_AGE', str(7 * 24 * 3600)))
+
+
+# Default amount of log text returned by one paginated read
+READ_PAGE_BYTES = 64 * 1024
+
+
+def get_feedback_dir():
+    """Get the default FeedbackFlow data directory."""
+    return os.path.join(str(Path.home()), '.feedbackflow')
+
+
+def format_cursor(number, offset):
+    """Encode a log position as an opaque cursor string."""
+    return f"{number}-{offset}"
+
+
+def parse_cursor(cursor):
+    """
+    Decode a cursor from format_cursor().
+
+    Returns:
+        A (segment number, byte offset) tuple; an empty cursor or 'start'
+        means the beginning of the oldest segment.
+
+    Raises:
+        ValueError: The cursor is malformed.
+    """
+    if not cursor or cursor == 'start':
+        return 0, 0
+    number, sep, offset = str(cursor).partition('-')
+    if not sep or not number.isdigit() or not offset.isdigit():
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return int(number), int(offset)
+
+
+def _page_end(data, at_end_of_file):
+    """Where to cut a chunk of log text so the page ends on an entry boundary."""
+    if at_end_of_file:
+        # Everything up to the last complete line; a line still being
+        # written is returned by the next read
+        return data.rfind(b'\n') + 1
+    end = data.rfind(b'\n\n') + 2
+    if end < 2:
+        end = data.rfind(b'\n') + 1
+    return end
+
+
+class SegmentedLog:
+    """The active feedback.log plus its rotated, read-only segments."""
+
+    def __init__(self, log_path=None, segments_dir=None,
+                 max_bytes=MAX_LOG_BYTES, max_age=MAX_LOG_AGE_SECONDS):
+        self.log_path = log_path or os.path.join(get_feedback_dir(), 'feedback.log')
+        self.segments_dir = segments_dir or os.path.join(os.path.dirname(self.log_path), 'segments')
+        self.manifest_path = os.path.join(self.segments_dir, 'manifest.json')
+        self.lock_path = os.path.join(self.segments_dir, '.lock')
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._active_started = None
+
+    def load_manifest(self):
+        """Load the segment manifest, or an empty one if there is none yet."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'active_started': None, 'next_number': 1, 'segments': []}
+
+    def _save_manifest(self, manifest):
+        """Atomically replace the manifest file."""
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def _active_since(self):
+        """When the current active log was started, recording it if unknown."""
+        if self._active_started is None:
+            os.makedirs(self.segments_dir, exist_ok=True)
+            with locked(self.lock_path):
+                manifest = self.load_manifest()
+                if manifest.get('active_started') is None:
+                    manifest['active_started'] = time.time()
+                    self._save_manifest(manifest)
+                self._active_started = manifest['active_started']
+        return self._active_started
+
+    def _needs_rotation(self, size, active_started, now):
+        # An age-based rotation of a log holding nothing but its header line
+        # would only produce empty segments
+        if size >= self.max_bytes:
+            return True
+        return (self.max_age > 0 and now - active_started >= self.max_age
+                and size > 128)
+
+    def maybe_rotate(self):
+        """
+        Rotate the active log if it is over the size or age limit.
+
+        This is a single stat() in the common case, cheap enough to call
+        before every write.
+
+        Returns:
+            The manifest entry of the new segment, or None if nothing rotated.
+        """
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            return None
+        if not self._needs_rotation(size, self._active_since(), time.time()):
+            return None
+        return self.rotate(force=False)
+
+    def rotate(self, force=True):
+        """
+        Move the active log into a new numbered segment and start a fresh log.
+
+        Args:
+            force: Rotate even if the log is under its limits.
+
+        Returns:
+            The manifest entry of the new segment, or None if nothing rotated.
+        """
+        os.makedirs(self.segments_dir, exist_ok=True)
+        with locked(self.lock_path):
+            # Another process may have rotated since we last looked
+            manifest = self.load_manifest()
+            now = time.time()
+            active_started = manifest.get('active_started') or now
+            try:
+                size = os.path.getsize(self.log_path)
+            except OSError:
+                return None
+            if not force and not self._needs_rotation(size, active_started, now):
+                self._active_started = active_started
+                return None
+
+            number = manifest.get('next_number', 1)
+            name = f"feedback-{number:06d}.log"
+            try:
+                os.replace(self.log_path, os.path.join(self.segments_dir, name))
+            except OSError:
+                # e.g. the log is held open by another process on Windows
+                return None
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write("# Feedback Flow Log File - Rotated on " + time.strftime('%Y-%m-%d %H:%M:%S') + "\n")
+
+            segment = {
+                'number': number,
+                'file': name,
+                'started': active_started,
+                'ended': now,
+                'size_bytes': size,
+            }
+            manifest['segments'].append(segment)
+            manifest['next_number'] = number + 1
+            manifest['active_started'] = now
+            self._save_manifest(manifest)
+            self._active_started = now
+            return segment
+
+    def clear(self):
+        """
+        Delete every segment and start a fresh, empty active log.
+
+        Segment numbers keep counting up, so a cursor taken before the clear
+        never points into text written after it.
+
+        Returns:
+            The time of the clear, as written in the new log's header.
+        """
+        os.makedirs(self.segments_dir, exist_ok=True)
+        with locked(self.lock_path):
+            manifest = self.load_manifest()
+            for segment in manifest.get('segments', []):
+                try:
+                    os.remove(os.path.join(self.segments_dir, segment['file']))
+                except FileNotFoundError:
+                    pass
+            timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+            with open(self.log_path, 'w', encoding='utf-8') as f:
+                f.write(f"# Feedback Flow Log File - Cleared on {timestamp}\n")
+            now = time.time()
+            self._save_manifest({
+                'active_started': now,
+                'next_number': manifest.get('next_number', 1) + 1,
+                'segments': [],
+            })
+            self._active_started = now
+            return timestamp
+
+    def paths_for(self, since=None, until=None):
+        """
+        List the log files holding entries in a time range, oldest first.
+
+        Args:
+            since: Start of the range (epoch seconds or timestamp string).
+            until: End of the range (epoch seconds or timestamp string).
+
+        Returns:
+            Paths of the overlapping segments, followed by the active log.
+        """
+        start = parse_timestamp(since) if since is not None else None
+        end = parse_timestamp(until) if until is not None else None
+        manifest = self.load_manifest()
+
+        paths = []
+        for segment in manifest.get('segments', []):
+            if start is not None and segment['ended'] < start:
+                continue
+            if end is not None and segment['started'] > end:
+                continue
+            paths.append(os.path.join(self.segments_dir, segment['file']))
+
+        active_started = manifest.get('active_started')
+        if (end is None or active_started is None or active_started <= end) and os.path.exists(self.log_path):
+            paths.append(self.log_path)
+        return paths
+
+    def _files(self, manifest):
+        """(number, path) of every log file, oldest first, ending with the active log."""
+        files = [(segment['number'], os.path.join(self.segments_dir, segment['file']))
+                 for segment in manifest.get('segments', [])]
+        files.append((manifest.get('next_number', 1), self.log_path))
+        return files
+
+    def end_cursor(self):
+        """Cursor pointing just past the last complete line of the active log."""
+        number, path = self._files(self.load_manifest())[-1]
+        try:
+            with open(path, 'rb') as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(max(0, size - READ_PAGE_BYTES))
+                tail = f.read()
+            offset = size - len(tail) + tail.rfind(b'\n') + 1
+        except FileNotFoundError:
+            offset = 0
+        return format_cursor(number, offset)
+
+    def read_from(self, cursor=None, max_bytes=READ_PAGE_BYTES):
+        """
+        Read log text written after a cursor, across rotated segments.
+
+        Args:
+            cursor: A cursor from a previous read, 'start' (or None) for the
+                    oldest entry, or 'end' for only what is written from now on.
+            max_bytes: Roughly how much text to return. Pages end on an entry
+                       boundary, so a single entry longer than this is returned whole.
+
+        Returns:
+            A dict with the text, the cursor to pass to the next read and a
+            has_more flag telling whether more text was already waiting.
+        """
+        if cursor == 'end':
+            cursor = self.end_cursor()
+        number, offset = parse_cursor(cursor)
+        files = self._files(self.load_manifest())
+
+        chunks = []
+        budget = max_bytes
+        position = (number, offset)
+        has_more = False
+        for file_number, path in files:
+            if file_number < number:
+                continue
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            start = offset if file_number == number else 0
+            if start > size:
+                # The log was cleared since the cursor was handed out
+                start = 0
+            position = (file_number, start)
+            if start == size:
+                continue
+            if budget <= 0:
+                has_more = True
+                break
+
+            with open(path, 'rb') as f:
+                f.seek(start)
+                data = f.read(min(budget, size - start))
+                reached_end = start + len(data) == size
+                end = len(data) if reached_end and path != self.log_path else _page_end(data, reached_end)
+                while end == 0 and not chunks and not reached_end:
+                    # A single entry bigger than the page; keep reading to its end
+                    data += f.read(max(max_bytes, 4096))
+                    reached_end = start + len(data) == size
+                    end = len(data) if reached_end and path != self.log_path else _page_end(data, reached_end)
+
+            chunks.append(data[:end])
+            budget -= end
+            position = (file_number, start + end)
+            if not reached_end:
+                has_more = True
+                break
+
+        return {
+            'content': b''.join(chunks).decode('utf-8', errors='replace'),
+            'cursor': format_cursor(*position),
+            'has_more': has_more,
+        }
+
+    def read(self, since=None, until=None):
+        """Return the text of every log file overlapping the time range."""
+        chunks = []
+        for path in self.paths_for(since, until):
+            with open(path, 'r', encoding='utf-8') as f:
+                chunks.append(f.read())
+        return ''.join(chunks)
@@ -0,0 +1,175 @@
+"""
+Running feedback counters for the feedback://stats resource.
+
+Counts per origin, per page (origin + path), per day and per hour of day are
+kept in ~/.feedbackflow/records/stats.json together with the store position
+they cover. Every writer (the native host and the MCP server) folds the
+records it appends into the counters and saves them while holding the store
+lock, so reading the stats only loads that file. Records some other writer
+left uncounted are folded in on the next write or read, from the saved
+position onwards.
+"""
+
+import os
+import json
+import time
+from urllib.parse import urlsplit
+
+from feedbackflow.store import locked, parse_timestamp
+
+NO_ORIGIN = '(none)'
+
+
+def _empty_counters():
+    return {
+        'position': 0,
+        'last_id': None,
+        'total': 0,
+        'by_origin': {},
+        'by_path': {},
+        'by_day': {},
+        'by_hour': {},
+    }
+
+
+class FeedbackStats:
+    """Incrementally maintained aggregate counts over a RecordStore."""
+
+    def __init__(self, store, path=None):
+        self.store = store
+        self.path = path or os.path.join(store.root, 'stats.json')
+        # Read from disk on first use, so constructing is free
+        self._counters = None
+        self._file_key = None
+
+    def _stat_key(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _load(self):
+        """Load the saved counters if another process changed them."""
+        key = self._stat_key()
+        if self._counters is not None and key == self._file_key:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._counters = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._counters = _empty_counters()
+        self._file_key = key
+
+    def save(self):
+        """Write the counters to disk; callers hold the store lock."""
+        if self._counters is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._counters, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+        self._file_key = self._stat_key()
+
+    def _count(self, record):
+        counters = self._counters
+        counters['total'] += 1
+
+        parts = urlsplit(record.get('url') or '')
+        origin = f"{parts.scheme}://{parts.netloc}" if parts.netloc else NO_ORIGIN
+        page = origin + (parts.path or '/') if parts.netloc else NO_ORIGIN
+        counters['by_origin'][origin] = counters['by_origin'].get(origin, 0) + 1
+        counters['by_path'][page] = counters['by_path'].get(page, 0) + 1
+
+        timestamp = parse_timestamp(record.get('timestamp'))
+        if timestamp is None:
+            timestamp = int(record['id']) / 1e9
+        local = time.localtime(timestamp)
+        day = time.strftime('%Y-%m-%d', local)
+        hour = f"{local.tm_hour:02d}"
+        counters['by_day'][day] = counters['by_day'].get(day, 0) + 1
+        counters['by_hour'][hour] = counters['by_hour'].get(hour, 0) + 1
+
+    def _catch_up(self, appended=()):
+        """
+        Fold every record after the saved position into the counters.
+
+        Args:
+            appended: Records the caller has just appended, which are counted
+                      from memory when nothing else was appended before them.
+
+        Returns:
+            The number of records counted.
+        """
+        counters = self._counters
+        total = self.store.count()
+        position = counters['position']
+        if total < position or (position and self.store.id_at(position - 1) != counters['last_id']):
+            # The store was cleared since these counters were taken
+            self._counters = counters = _empty_counters()
+            position = 0
+        if total == position:
+            return 0
+
+        appended = list(appended)
+        if appended and position + len(appended) == total \
+                and appended[-1]['id'] == self.store.id_at(total - 1):
+            records = appended
+        else:
+            records = self.store.read_range(position, total)
+        for record in records:
+            self._count(record)
+            counters['last_id'] = record['id']
+        counters['position'] = position + len(records)
+        return len(records)
+
+    def record(self, records):
+        """
+        Count records just appended to the store and save the counters.
+
+        Part of the write path: the counters on disk are current once this
+        returns, so readers never have to scan for new records.
+        """
+        with locked(self.store.lock_path):
+            self._load()
+            if self._catch_up(records):
+                self.save()
+
+    def update(self):
+        """
+        Fold in any records a writer left uncounted and save the counters.
+
+        Returns:
+            The number of records counted; 0 when every writer kept them current.
+        """
+        self._load()
+        position = self._counters['position']
+        if position == self.store.count() and (not position or
+                                               self.store.id_at(position - 1) == self._counters['last_id']):
+            return 0
+        with locked(self.store.lock_path):
+            self._load()
+            counted = self._catch_up()
+            if counted:
+                self.save()
+            return counted
+
+    def clear(self):
+        """Reset every counter."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with locked(self.store.lock_path):
+            self._counters = _empty_counters()
+            self.save()
+
+    def summary(self):
+        """Return the current counters (without the store position)."""
+        self.update()
+        counters = self._counters
+        return {
+            'total': counters['total'],
+            'by_origin': dict(counters['by_origin']),
+            'by_path': dict(counters['by_path']),
+            'by_day': dict(sorted(counters['by_day'].items())),
+            'by_hour': dict(sorted(counters['by_hour'].items())),
+        }
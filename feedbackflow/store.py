@@ -0,0 +1,348 @@
+"""
+Structured record store for feedback entries.
+
+Alongside the human-readable feedback.log, every entry is appended as one JSON
+line to ~/.feedbackflow/records/feedback.jsonl. A fixed-width side index
+(feedback.idx) maps each record's id and timestamp to the byte offset of its
+line, so readers can seek straight to an entry instead of scanning the log.
+Repeat counts of collapsed duplicates go to feedback.occurrences.jsonl.
+"""
+
+import os
+import json
+import mmap
+import time
+import struct
+import bisect
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# One index entry per record: id (u64), timestamp (f64 epoch), byte offset (u64)
+INDEX_ENTRY = struct.Struct('<QdQ')
+
+# Field names of the dashed blocks written by background.js
+BLOCK_FIELDS = {
+    'Timestamp': 'timestamp',
+    'URL': 'url',
+    'Title': 'title',
+    'Feedback': 'feedback',
+    'Attachments': 'attachments',
+}
+
+
+def get_records_dir():
+    """Get the default directory of the record store."""
+    return os.path.join(str(Path.home()), '.feedbackflow', 'records')
+
+
+def parse_timestamp(value):
+    """
+    Convert a feedback timestamp to epoch seconds.
+
+    Accepts the ISO 8601 timestamps sent by the extension and the
+    'YYYY-MM-DD HH:MM:SS' timestamps written by the MCP server.
+
+    Returns:
+        The timestamp as a float, or None if it cannot be parsed.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value:
+        return None
+    text = str(value).strip()
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        pass
+    try:
+        return time.mktime(time.strptime(text, '%Y-%m-%d %H:%M:%S'))
+    except ValueError:
+        return None
+
+
+def parse_block(content):
+    """
+    Parse a dashed Timestamp:/URL:/Title:/Feedback: block into a dict.
+
+    Feedback text may span several lines; everything up to the closing
+    dashed line is kept.
+    """
+    entry = {}
+    current = None
+    for line in content.splitlines():
+        if line.startswith('-----'):
+            current = None
+            continue
+        key, sep, value = line.partition(': ')
+        if sep and key in BLOCK_FIELDS:
+            current = BLOCK_FIELDS[key]
+            entry[current] = value
+        elif current == 'feedback':
+            entry[current] += '\n' + line
+    if 'attachments' in entry:
+        entry['attachments'] = [h.strip() for h in entry['attachments'].split(',') if h.strip()]
+    return entry
+
+
+@contextmanager
+def locked(path):
+    """Hold an exclusive lock on `path` so separate processes append in turn."""
+    with open(path, 'a+b') as lock_file:
+        if os.name == 'nt':
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class _IndexColumn:
+    """Sequence view over one field of the memory-mapped index, for bisect."""
+
+    def __init__(self, buffer, field):
+        self.buffer = buffer
+        self.field = field
+
+    def __len__(self):
+        return len(self.buffer) // INDEX_ENTRY.size
+
+    def __getitem__(self, position):
+        return INDEX_ENTRY.unpack_from(self.buffer, position * INDEX_ENTRY.size)[self.field]
+
+
+class RecordStore:
+    """Append-only JSONL feedback records with an id/timestamp -> offset index."""
+
+    def __init__(self, root=None, name='feedback'):
+        self.root = root or get_records_dir()
+        self.data_path = os.path.join(self.root, name + '.jsonl')
+        self.index_path = os.path.join(self.root, name + '.idx')
+        self.occurrences_path = os.path.join(self.root, name + '.occurrences.jsonl')
+        self.lock_path = os.path.join(self.root, '.lock')
+
+    def _last_id(self):
+        """Read the id of the last indexed record, or 0 for an empty store."""
+        try:
+            with open(self.index_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell() - f.tell() % INDEX_ENTRY.size
+                if size == 0:
+                    return 0
+                f.seek(size - INDEX_ENTRY.size)
+                return INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))[0]
+        except FileNotFoundError:
+            return 0
+
+    def append(self, entries, fsync=False):
+        """
+        Append entries to the store with a single write to each file.
+
+        Args:
+            entries: Dicts with timestamp, url, title and feedback fields;
+                     any extra fields are stored as well.
+            fsync: Flush both files to disk before returning.
+
+        Returns:
+            The stored records, each with its newly assigned unique id.
+        """
+        if not entries:
+            return []
+        os.makedirs(self.root, exist_ok=True)
+
+        with locked(self.lock_path):
+            # Ids are epoch nanoseconds, bumped to stay strictly increasing
+            last_id = self._last_id()
+            with open(self.data_path, 'ab') as data_file:
+                offset = data_file.seek(0, os.SEEK_END)
+                lines = []
+                index = []
+                records = []
+                for entry in entries:
+                    last_id = max(time.time_ns(), last_id + 1)
+                    record = {'id': str(last_id)}
+                    record.update((k, v) for k, v in entry.items() if k != 'id')
+                    line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+                    timestamp = parse_timestamp(record.get('timestamp'))
+                    if timestamp is None:
+                        timestamp = last_id / 1e9
+                    index.append(INDEX_ENTRY.pack(last_id, timestamp, offset))
+
+                    lines.append(line)
+                    records.append(record)
+                    offset += len(line)
+
+                data_file.write(b''.join(lines))
+                if fsync:
+                    data_file.flush()
+                    os.fsync(data_file.fileno())
+            with open(self.index_path, 'ab') as index_file:
+                index_file.write(b''.join(index))
+                if fsync:
+                    index_file.flush()
+                    os.fsync(index_file.fileno())
+
+        return records
+
+    def clear(self):
+        """Remove every record from the store."""
+        if not os.path.exists(self.root):
+            return
+        with locked(self.lock_path):
+            for path in (self.data_path, self.index_path, self.occurrences_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def record_occurrences(self, occurrences):
+        """
+        Save the repeat counts of collapsed duplicate entries.
+
+        Args:
+            occurrences: Dicts with record_id, count, first_seen and last_seen.
+        """
+        lines = ''.join(json.dumps({
+            'id': o['record_id'],
+            'count': o['count'],
+            'first_seen': o['first_seen'],
+            'last_seen': o['last_seen'],
+        }) + '\n' for o in occurrences)
+        if not lines:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        with locked(self.lock_path):
+            with open(self.occurrences_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+
+    def occurrences(self):
+        """Return {record id: occurrence info} for entries that were repeated."""
+        result = {}
+        try:
+            with open(self.occurrences_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    occurrence = json.loads(line)
+                    result[occurrence['id']] = occurrence
+        except FileNotFoundError:
+            pass
+        return result
+
+    @contextmanager
+    def _index(self):
+        """Memory-map the index file (an empty buffer if there is none)."""
+        try:
+            f = open(self.index_path, 'rb')
+        except FileNotFoundError:
+            yield b''
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            size -= size % INDEX_ENTRY.size
+            if size == 0:
+                yield b''
+                return
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as buffer:
+                yield buffer
+
+    def count(self):
+        """Return the number of records in the store."""
+        try:
+            return os.path.getsize(self.index_path) // INDEX_ENTRY.size
+        except OSError:
+            return 0
+
+    def _read_at(self, data_file, offset):
+        """Read the record whose line starts at `offset`."""
+        data_file.seek(offset)
+        return json.loads(data_file.readline())
+
+    def get(self, record_id):
+        """
+        Look up a single record by id.
+
+        Returns:
+            The record as a dict, or None if there is no such record.
+        """
+        record_id = int(record_id)
+        with self._index() as buffer:
+            ids = _IndexColumn(buffer, 0)
+            position = bisect.bisect_left(ids, record_id)
+            if position == len(ids) or ids[position] != record_id:
+                return None
+            offset = INDEX_ENTRY.unpack_from(buffer, position * INDEX_ENTRY.size)[2]
+        with open(self.data_path, 'rb') as data_file:
+            return self._read_at(data_file, offset)
+
+    def _read_from(self, first, last):
+        """Read records at index positions [first, last)."""
+        with self._index() as buffer:
+            if first >= last:
+                return []
+            offset = INDEX_ENTRY.unpack_from(buffer, first * INDEX_ENTRY.size)[2]
+        records = []
+        with open(self.data_path, 'rb') as data_file:
+            data_file.seek(offset)
+            for _ in range(last - first):
+                line = data_file.readline()
+                if not line:
+                    break
+                records.append(json.loads(line))
+        return records
+
+    def read_range(self, first, last):
+        """Return the records at index positions [first, last), oldest first."""
+        return self._read_from(first, min(last, self.count()))
+
+    def id_at(self, position):
+        """Return the id of the record at index `position`, or None."""
+        with self._index() as buffer:
+            if not 0 <= position < len(buffer) // INDEX_ENTRY.size:
+                return None
+            return str(INDEX_ENTRY.unpack_from(buffer, position * INDEX_ENTRY.size)[0])
+
+    def since(self, timestamp, limit=None, newest=False):
+        """
+        Return records with a timestamp at or after `timestamp`, oldest first.
+
+        Args:
+            timestamp: Epoch seconds or a timestamp string.
+            limit: Maximum number of records to return.
+            newest: Keep the last `limit` matching records instead of the first.
+        """
+        start = parse_timestamp(timestamp)
+        if start is None:
+            raise ValueError(f"Invalid timestamp: {timestamp}")
+        with self._index() as buffer:
+            timestamps = _IndexColumn(buffer, 1)
+            first = bisect.bisect_left(timestamps, start)
+            last = len(timestamps)
+        if limit is not None and newest:
+            first = max(first, last - limit)
+        elif limit is not None:
+            last = min(last, first + limit)
+        return self._read_from(first, last)
+
+    def iter_records(self):
+        """Yield every record in the store, oldest first."""
+        try:
+            with open(self.data_path, 'rb') as data_file:
+                for line in data_file:
+                    yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def tail(self, count):
+        """Return the last `count` records, oldest first."""
+        total = self.count()
+        return self._read_from(max(0, total - count), total)
@@ -0,0 +1,182 @@
+"""
+Change notifications for the FeedbackFlow data directories.
+
+On Linux the directories are watched with inotify (through ctypes, so there is
+nothing to install), which reports writes from any process, including the
+native messaging host, within milliseconds. Elsewhere, or with
+FEEDBACKFLOW_WATCH=poll, the directories are polled instead: the interval
+starts short and backs off while nothing changes, and drops back as soon as
+something does.
+
+Changes are collected for a short debounce window and handed to the callback
+as one set of paths, so a burst of appends becomes a single notification.
+"""
+
+import os
+import sys
+import time
+import select
+import struct
+import threading
+
+WATCH_BACKEND = os.environ.get('FEEDBACKFLOW_WATCH', '')
+
+# inotify event flags (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def is_ignored(name):
+    """Lock files and temporary files are not changes to the data."""
+    return name.startswith('.') or name.endswith('.tmp')
+
+
+def _load_inotify():
+    """Return libc if inotify is usable, else None."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FileWatcher:
+    """Watch directories and call back with the paths that changed."""
+
+    def __init__(self, directories, callback, min_interval=0.05, max_interval=2.0, debounce=0.02):
+        """
+        Args:
+            directories: Directories to watch; ones that do not exist yet are
+                         picked up when they are created inside another one.
+            callback: Called from the watcher thread with a set of changed paths.
+            min_interval: Shortest polling interval in seconds.
+            max_interval: Longest polling interval in seconds.
+            debounce: How long to collect changes before calling back.
+        """
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.callback = callback
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.debounce = debounce
+        self.backend = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start watching in a daemon thread."""
+        libc = _load_inotify() if WATCH_BACKEND != 'poll' else None
+        inotify_fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC) if libc else -1
+        if inotify_fd >= 0:
+            self.backend = 'inotify'
+            target, args = self._run_inotify, (libc, inotify_fd)
+        else:
+            self.backend = 'polling'
+            target, args = self._run_polling, ()
+        self._thread = threading.Thread(target=target, args=args, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching and wait for the thread to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _notify(self, changed):
+        if changed:
+            try:
+                self.callback(changed)
+            except Exception:
+                # A failing subscriber must not stop the watcher
+                pass
+
+    def _run_inotify(self, libc, fd):
+        watches = {}
+
+        def add_watch(directory):
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+            if wd >= 0:
+                watches[wd] = directory
+
+        for directory in self.directories:
+            if os.path.isdir(directory):
+                add_watch(directory)
+
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([fd], [], [], 0.5)
+                if not ready:
+                    continue
+                # Let a burst of writes arrive before reading the events
+                time.sleep(self.debounce)
+                changed = set()
+                while True:
+                    try:
+                        data = os.read(fd, 64 * 1024)
+                    except BlockingIOError:
+                        break
+                    offset = 0
+                    while offset < len(data):
+                        wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                        start = offset + INOTIFY_EVENT.size
+                        name = data[start:start + length].rstrip(b'\0').decode('utf-8', 'replace')
+                        offset = start + length
+                        if wd not in watches or not name or is_ignored(name):
+                            continue
+                        path = os.path.join(watches[wd], name)
+                        if mask & IN_ISDIR:
+                            if mask & (IN_CREATE | IN_MOVED_TO) and path in self.directories:
+                                add_watch(path)
+                            continue
+                        changed.add(path)
+                self._notify(changed)
+        finally:
+            os.close(fd)
+
+    def _scan(self):
+        """Map every watched file to its (inode, size, mtime)."""
+        state = {}
+        for directory in self.directories:
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if is_ignored(entry.name):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if not entry.is_dir():
+                        state[entry.path] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        return state
+
+    def _run_polling(self):
+        interval = self.min_interval
+        state = self._scan()
+        while not self._stop.wait(interval):
+            current = self._scan()
+            changed = {path for path in set(state) | set(current) if state.get(path) != current.get(path)}
+            state = current
+            if changed:
+                interval = self.min_interval
+                self._notify(changed)
+            else:
+                # Back off while nothing is happening
+                interval = min(interval * 2, self.max_interval)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import os
 import sys
+import argparse
 import subprocess
 import platform
 from pathlib import Path
@@ -63,8 +64,10 @@ WantedBy=default.target
         print(f"❌ Error creating service file: {e}")
         print("You can manually run the MCP server with: python mcp/mcp_server.py")
 
-def main():
+def main(argv=None):
     """Main function to install MCP dependencies and set up the server."""
+    argparse.ArgumentParser(description='Install the FeedbackFlow MCP server dependencies.').parse_args(argv)
+    
     print("=== FeedbackFlow MCP Server Setup ===\n")
     
     # Install MCP dependencies
@@ -3,21 +3,31 @@ import os
 import time
 import json
 import argparse
+import asyncio
 import sys
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Union
 from mcp.server.fastmcp import FastMCP, Context
 
-def parse_args():
+# Make the feedbackflow package importable when run from a checkout
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feedbackflow.store import RecordStore
+from feedbackflow.segments import SegmentedLog
+from feedbackflow.blobs import BlobStore
+from feedbackflow.dedup import DedupIndex
+
+def parse_args(argv=None):
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description="FeedbackFlow MCP Server")
     parser.add_argument("--port", type=int, default=8080, help="Port to run the server on")
     parser.add_argument("--transport", type=str, default="sse", choices=["sse", "stdio"], 
                         help="Transport protocol to use (sse or stdio)")
     parser.add_argument("--cursor", action="store_true", help="Configure for Cursor IDE integration")
-    return parser.parse_args()
-
-# Parse command line arguments
-args = parse_args()
+    return parser.parse_args(argv)
 
 # Create an MCP server for FeedbackFlow
 mcp = FastMCP("FeedbackFlow", 
@@ -28,71 +38,675 @@ mcp = FastMCP("FeedbackFlow",
 home_dir = str(Path.home())
 feedback_dir = os.path.join(home_dir, '.feedbackflow')
 feedback_log_path = os.path.join(feedback_dir, 'feedback.log')
-feedback_meta_path = os.path.join(feedback_dir, 'feedback_meta.json')
+record_store = RecordStore(os.path.join(feedback_dir, 'records'))
+segmented_log = SegmentedLog(feedback_log_path)
+blob_store = BlobStore(os.path.join(feedback_dir, 'blobs'))
+dedup_index = DedupIndex()
+# The log size and record count after this server's last write; if either
+# has shrunk since, the feedback was cleared or rewritten elsewhere and the
+# fingerprints point at entries that are gone
+dedup_seen = (0, 0)
+
+# The metadata journal, search index, counters and response cache load files
+# or build in-memory state, so each is made the first time a handler uses it
+# rather than while the server starts
+lazy_lock = threading.Lock()
+
+def lazy(factory):
+    """
+    Turn a factory into an accessor that calls it once, on first use.
+
+    Args:
+        factory: A function taking no arguments that builds the object.
+
+    Returns:
+        A function returning the object, shared by every later call.
+    """
+    instance = []
+
+    @functools.wraps(factory)
+    def accessor():
+        if not instance:
+            with lazy_lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+    return accessor
+
+@lazy
+def meta_journal():
+    """The MCP metadata journal (addressed, priority, notes)."""
+    from feedbackflow.meta import MetaJournal
+    return MetaJournal(feedback_dir)
+
+@lazy
+def search_index():
+    """The full-text index over the records."""
+    from feedbackflow.search import SearchIndex
+    return SearchIndex(record_store)
+
+@lazy
+def feedback_stats():
+    """The running counters over the records."""
+    from feedbackflow.stats import FeedbackStats
+    return FeedbackStats(record_store)
+
+@lazy
+def response_cache():
+    """
+    Responses of file-backed resources, reused while their files are
+    unchanged; the tools below also drop it after every write they make.
+    """
+    from feedbackflow.cache import ResponseCache
+    return ResponseCache()
+
+# Handlers do their disk work in a bounded pool of threads, so one slow read
+# never holds up the event loop or the other connected agents. Reads give up
+# after FEEDBACKFLOW_MCP_DEADLINE seconds.
+HANDLER_THREADS = int(os.environ.get('FEEDBACKFLOW_MCP_THREADS', '4'))
+HANDLER_DEADLINE = float(os.environ.get('FEEDBACKFLOW_MCP_DEADLINE', '30'))
+handler_pool = ThreadPoolExecutor(max_workers=HANDLER_THREADS, thread_name_prefix='feedbackflow-handler')
+
+# Held by writes and by the handlers that update the in-memory search index,
+# counters, digest cache and themes; plain file reads run concurrently
+index_lock = threading.RLock()
+
+def offload(exclusive=False, deadline=HANDLER_DEADLINE):
+    """
+    Turn a blocking handler into an async one that runs in the handler pool.
+    
+    A handler still queued when its deadline passes is never started, and an
+    exclusive one only waits for index_lock until then. One that is already
+    running cannot be interrupted: it finishes in the background, holding
+    index_lock to the end if it is exclusive, and later exclusive calls wait
+    for it or time out themselves.
+    
+    Args:
+        exclusive: Hold index_lock while the handler runs.
+        deadline: Seconds to wait for a result, counting time spent queued,
+                  or None to wait as long as it takes (for writes, which must
+                  not be reported as failed while they complete).
+    """
+    def decorator(fn):
+        def run(expires, *args, **kwargs):
+            if not exclusive:
+                return fn(*args, **kwargs)
+            timeout = -1 if expires is None else max(expires - time.monotonic(), 0)
+            # Give up on the lock once the caller has stopped waiting, rather
+            # than taking it afterwards for a result nobody reads
+            if not index_lock.acquire(timeout=timeout):
+                raise TimeoutError(f"{fn.__name__} did not get the index lock within {deadline} seconds")
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                index_lock.release()
+        
+        @functools.wraps(fn)
+        async def handler(*args, **kwargs):
+            expires = None if deadline is None else time.monotonic() + deadline
+            future = asyncio.get_running_loop().run_in_executor(
+                handler_pool, functools.partial(run, expires, *args, **kwargs))
+            try:
+                return await asyncio.wait_for(future, deadline)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{fn.__name__} did not finish within {deadline} seconds")
+        return handler
+    return decorator
+
+# Resources affected by a change to each file under ~/.feedbackflow; a
+# subscription to any URI starting with one of these is notified
+RESOURCES_BY_FILE = {
+    "feedback.log": ("feedback://log", "feedback://status", "feedback://stats"),
+    "feedback.jsonl": ("feedback://stats", "feedback://entry/"),
+    "feedback_meta.json": ("feedback://meta", "feedback://stats", "feedback://entry/"),
+    "feedback_meta.journal": ("feedback://meta", "feedback://stats", "feedback://entry/"),
+    "manifest.json": ("feedback://segments", "feedback://log"),
+}
+
+# Subscribed resource URIs of each client session
+subscriptions = {}
+feedback_watcher = None
+
+def start_feedback_watcher(loop):
+    """
+    Start watching the feedback files, once, so subscribers hear about writes
+    from this server and from the native messaging host alike.
+    
+    Args:
+        loop: The server's event loop, where notifications are sent from.
+    """
+    global feedback_watcher
+    if feedback_watcher is not None:
+        return
+    
+    def on_change(paths):
+        prefixes = set()
+        for path in paths:
+            prefixes.update(RESOURCES_BY_FILE.get(os.path.basename(path), ()))
+        if prefixes:
+            asyncio.run_coroutine_threadsafe(notify_subscribers(prefixes), loop)
+    
+    # Imported here so servers nobody subscribes to never load it
+    from feedbackflow.watch import FileWatcher
+    
+    os.makedirs(feedback_dir, exist_ok=True)
+    feedback_watcher = FileWatcher(
+        [feedback_dir, record_store.root, segmented_log.segments_dir], on_change)
+    feedback_watcher.start()
+
+async def notify_subscribers(prefixes):
+    """Send resources/updated to every session subscribed to an affected resource."""
+    for session, uris in list(subscriptions.items()):
+        for uri in list(uris):
+            if any(uri.startswith(prefix) for prefix in prefixes):
+                try:
+                    await session.send_resource_updated(uri)
+                except Exception:
+                    # The client has gone away
+                    subscriptions.pop(session, None)
+                    break
+
+@mcp._mcp_server.subscribe_resource()
+async def subscribe_resource(uri) -> None:
+    """Subscribe the calling client to updates of a feedback resource."""
+    session = mcp._mcp_server.request_context.session
+    subscriptions.setdefault(session, set()).add(str(uri))
+    start_feedback_watcher(asyncio.get_running_loop())
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe_resource(uri) -> None:
+    """Stop sending the calling client updates of a feedback resource."""
+    session = mcp._mcp_server.request_context.session
+    subscriptions.get(session, set()).discard(str(uri))
+
+# FastMCP does not advertise subscription support on its own
+_get_capabilities = mcp._mcp_server.get_capabilities
+def get_capabilities(*args, **kwargs):
+    capabilities = _get_capabilities(*args, **kwargs)
+    if capabilities.resources is not None:
+        capabilities.resources.subscribe = True
+    return capabilities
+mcp._mcp_server.get_capabilities = get_capabilities
 
 @mcp.resource("feedback://log")
+@offload()
 def get_feedback_log() -> str:
     """
-    Get the contents of the feedback log file.
+    Get the contents of the feedback log, including its rotated segments.
     
     Returns:
-        The contents of the feedback log file as a string.
+        The rotated segments followed by the active log file, oldest first,
+        as one string.
     """
-    try:
-        if os.path.exists(feedback_log_path):
-            with open(feedback_log_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        else:
+    paths = segmented_log.paths_for()
+    
+    def read_log():
+        if not paths:
             return "Feedback log file does not exist."
+        parts = []
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    parts.append(f.read())
+            except FileNotFoundError:
+                # Rotated or cleared since the manifest was read
+                continue
+        return ''.join(parts)
+    
+    try:
+        # The manifest changes on every rotation, which moves text between files
+        return response_cache().get("feedback://log", [segmented_log.manifest_path] + paths, read_log)
     except Exception as e:
         return f"Error reading feedback log: {str(e)}"
 
+@mcp.resource("feedback://log/{cursor}")
+@offload()
+def get_feedback_log_page(cursor: str) -> dict:
+    """
+    Get the feedback log text written after a cursor, one page at a time.
+    
+    Args:
+        cursor: A cursor returned by a previous read, "start" for the oldest
+                entry, or "end" to only follow what is written from now on.
+        
+    Returns:
+        A dictionary with the page's content, the cursor for the next read
+        and whether more text is already waiting.
+    """
+    return segmented_log.read_from(cursor)
+
 @mcp.resource("feedback://status")
+@offload()
 def get_feedback_status() -> dict:
     """
     Get the status of the feedback log file.
     
     Returns:
-        A dictionary containing information about the feedback log file.
+        A dictionary containing information about the feedback log file,
+        the hit rate of the resource response cache and how many writes
+        the writer has committed in how many batches.
     """
-    try:
+    def read_status():
         if os.path.exists(feedback_log_path):
             stats = os.stat(feedback_log_path)
             return {
                 "exists": True,
                 "size_bytes": stats.st_size,
                 "last_modified": time.ctime(stats.st_mtime),
-                "path": feedback_log_path
+                "path": feedback_log_path,
+                "cursor": segmented_log.end_cursor()
             }
         else:
             return {
                 "exists": False,
                 "path": feedback_log_path
             }
+    
+    try:
+        status = response_cache().get("feedback://status", [feedback_log_path, segmented_log.manifest_path],
+                                    read_status)
+        return dict(status, response_cache=response_cache().stats(), writer=dict(writer_stats))
     except Exception as e:
         return {
             "error": str(e)
         }
 
+@mcp.resource("feedback://stats")
+@offload(exclusive=True)
+def get_feedback_stats() -> dict:
+    """
+    Get summary counts of the feedback: per origin, per page, per day and per
+    hour of day, open vs addressed totals and the mean time to address.
+    
+    Returns:
+        A dictionary of counters, kept up to date as feedback is written and
+        addressed so reading it never scans the history.
+    """
+    try:
+        stats = feedback_stats().summary()
+        address_stats = meta_journal().address_stats()
+        stats["addressed"] = address_stats["addressed"]
+        stats["open"] = stats["total"] - address_stats["addressed"]
+        stats["mean_time_to_address_seconds"] = address_stats["mean_time_to_address_seconds"]
+        return stats
+    except Exception as e:
+        return {"error": str(e)}
+
+@mcp.resource("feedback://segments")
+@offload()
+def get_feedback_segments() -> dict:
+    """
+    Get the manifest of rotated feedback log segments.
+    
+    Returns:
+        A dictionary listing each segment file with the time range it covers.
+    """
+    try:
+        return segmented_log.load_manifest()
+    except Exception as e:
+        return {"error": str(e)}
+
+@mcp.resource("feedback://attachment/{hash}", mime_type="application/octet-stream")
+@offload()
+def get_feedback_attachment(hash: str) -> bytes:
+    """
+    Get an attachment (screenshot, DOM snapshot, console or network capture)
+    by the SHA-256 hash stored with its feedback entry.
+    
+    Args:
+        hash: The attachment's SHA-256 hash.
+        
+    Returns:
+        The raw bytes of the attachment.
+    """
+    if not blob_store.exists(hash):
+        raise ValueError(f"No attachment found with hash {hash}")
+    return blob_store.read(hash)
+
 @mcp.resource("feedback://meta")
-def get_feedback_meta() -> dict:
+@offload()
+def get_feedback_meta() -> str:
     """
     Get metadata about feedback entries, including source websites and context.
     
     Returns:
-        A dictionary containing metadata about feedback entries.
+        The metadata about feedback entries as JSON text. It is rendered once
+        per version of the metadata files and cached, so repeated reads are
+        neither rebuilt nor serialized again.
     """
+    def render_meta():
+        return json.dumps(meta_journal().view(), default=str)
+    
     try:
-        if os.path.exists(feedback_meta_path):
-            with open(feedback_meta_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+        return response_cache().get("feedback://meta", [meta_journal().snapshot_path, meta_journal().journal_path],
+                                  render_meta)
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+@mcp.resource("feedback://entry/{id}")
+@offload()
+def get_feedback_entry(id: str) -> dict:
+    """
+    Get a single feedback entry by its unique id.
+    
+    Args:
+        id: The entry id returned when the feedback was added.
+        
+    Returns:
+        The entry's metadata, or its stored record for entries written by
+        the Chrome extension.
+    """
+    entry = meta_journal().get(id)
+    if entry is None and id.isdigit():
+        entry = record_store.get(id)
+    if entry is None:
+        raise ValueError(f"No feedback entry found with id {id}")
+    return entry
+
+# Mutating tools hand their work to a single writer task instead of writing
+# themselves. The writer takes everything queued while the previous batch was
+# being written (waiting up to FEEDBACKFLOW_MCP_BATCH_MS for more, at most
+# FEEDBACKFLOW_MCP_BATCH_MAX operations) and commits it together: one log
+# write, one record store append and one metadata journal write per batch.
+# Each caller is answered once its batch is committed.
+BATCH_WINDOW_SECONDS = float(os.environ.get('FEEDBACKFLOW_MCP_BATCH_MS', '0')) / 1000
+BATCH_MAX_OPERATIONS = int(os.environ.get('FEEDBACKFLOW_MCP_BATCH_MAX', '256'))
+# Whether each batch is fsync'ed before the callers are answered
+FSYNC_ON_COMMIT = os.environ.get('FEEDBACKFLOW_MCP_FSYNC', '0') == '1'
+
+# Batches are committed on a thread of their own, so writes never wait for a
+# free handler thread while slow reads occupy them all
+writer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='feedbackflow-writer')
+
+write_queue = None
+writer_task = None
+writer_stats = {"batches": 0, "operations": 0, "largest_batch": 0}
+
+async def submit_write(kind, **params):
+    """
+    Queue a write for the writer task and wait for its batch to be committed.
+    
+    Args:
+        kind: "add", "mark" or "clear".
+        params: The tool's arguments.
+        
+    Returns:
+        The tool's confirmation or error message.
+    """
+    global write_queue, writer_task
+    loop = asyncio.get_running_loop()
+    if writer_task is None or writer_task.done():
+        write_queue = asyncio.Queue()
+        writer_task = loop.create_task(run_writer())
+    future = loop.create_future()
+    await write_queue.put((kind, params, future))
+    return await future
+
+async def run_writer():
+    """Commit queued writes batch by batch, for as long as the server runs."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await write_queue.get()]
+        window_ends = loop.time() + BATCH_WINDOW_SECONDS
+        while len(batch) < BATCH_MAX_OPERATIONS:
+            if not write_queue.empty():
+                batch.append(write_queue.get_nowait())
+                continue
+            remaining = window_ends - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(write_queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        operations = [(kind, params) for kind, params, _ in batch]
+        try:
+            results = await loop.run_in_executor(writer_pool, commit_batch, operations)
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, _, future), result in zip(batch, results):
+            # A caller that went away no longer waits for its answer
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+def commit_batch(operations):
+    """
+    Commit a batch of queued writes in order.
+    
+    Adds and address updates are grouped into shared writes; a clear is
+    committed on its own, between the operations queued before and after it.
+    
+    Returns:
+        One result message per operation.
+    """
+    results = [None] * len(operations)
+    with index_lock:
+        try:
+            group = []
+            for index, (kind, params) in enumerate(operations):
+                if kind == "clear":
+                    commit_group(group, results)
+                    group = []
+                    results[index] = clear_all()
+                else:
+                    group.append((index, kind, params))
+            commit_group(group, results)
+        finally:
+            response_cache().invalidate()
+    writer_stats["batches"] += 1
+    writer_stats["operations"] += len(operations)
+    writer_stats["largest_batch"] = max(writer_stats["largest_batch"], len(operations))
+    return results
+
+def commit_group(group, results):
+    """
+    Write a group of adds and address updates: new entries first, with one
+    write to each file, then every metadata update in one journal write.
+    
+    Args:
+        group: (result index, kind, params) of each operation.
+        results: Result messages, filled in by index.
+    """
+    if not group:
+        return
+    global dedup_seen
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+    if any(now < seen for now, seen in zip(dedup_state(), dedup_seen)):
+        dedup_index.clear()
+    new_entries = []
+    repeats = {}
+    for index, kind, params in group:
+        if kind != "add":
+            continue
+        # Collapse repeats of recently added feedback into the first entry
+        occurrence, is_new = dedup_index.observe(params["message"], params.get("source"))
+        if not is_new and occurrence.get("record_id") and repeated_position(occurrence) is None:
+            # The entry it repeats was removed since, so this one is new
+            dedup_index.forget(occurrence)
+            occurrence, is_new = dedup_index.observe(params["message"], params.get("source"))
+        if is_new:
+            # Only reference attachments that are actually stored
+            attachments = [h for h in params.get("attachments") or [] if blob_store.claim(h)]
+            new_entries.append((index, params, occurrence, attachments))
         else:
-            return {"entries": []}
+            repeats[index] = (occurrence, occurrence["count"])
+    
+    if new_entries:
+        try:
+            # Ensure the directory exists
+            os.makedirs(feedback_dir, exist_ok=True)
+            
+            # Roll the log over into a segment once it is too big or old
+            segmented_log.maybe_rotate()
+            
+            # Write the whole batch to the log file at once
+            with open(feedback_log_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(f"[{timestamp}] {params['message']}\n\n" for _, params, _, _ in new_entries))
+                if FSYNC_ON_COMMIT:
+                    f.flush()
+                    os.fsync(f.fileno())
+            
+            # Store the structured records alongside the log
+            records = record_store.append([{
+                "timestamp": timestamp,
+                "url": params.get("source"),
+                "title": None,
+                "feedback": params["message"],
+                "context": params.get("context"),
+                "attachments": attachments
+            } for _, params, _, attachments in new_entries], fsync=FSYNC_ON_COMMIT)
+            blob_store.add_refs([h for _, _, _, attachments in new_entries for h in attachments])
+            for (_, _, occurrence, _), record in zip(new_entries, records):
+                occurrence["record_id"] = record["id"]
+            search_index().update()
+            feedback_stats().record(records)
+            
+            # Add the new entries' metadata
+            meta_journal().add_many([{
+                "id": record["id"],
+                "timestamp": timestamp,
+                "message": params["message"],
+                "source": params.get("source"),
+                "context": params.get("context"),
+                "attachments": attachments
+            } for (_, params, _, attachments), record in zip(new_entries, records)], fsync=FSYNC_ON_COMMIT)
+            for (index, _, _, _), record in zip(new_entries, records):
+                results[index] = f"Feedback added successfully at {timestamp} (id {record['id']})"
+        except Exception as e:
+            for index, _, occurrence, _ in new_entries:
+                # Nothing was stored, so the fingerprint must not swallow retries
+                if not occurrence.get("record_id"):
+                    dedup_index.forget(occurrence)
+                results[index] = f"Error adding feedback: {str(e)}"
+    
+    # Metadata updates for repeats and address marks, in queue order
+    updates = []
+    pending = []
+    addressed_now = set()
+    new_meta = {}
+    for index, kind, params in group:
+        try:
+            if kind == "add":
+                if index not in repeats:
+                    continue
+                occurrence, count = repeats[index]
+                position = repeated_position(occurrence)
+                first = meta_journal().entry_at(position) if position is not None else None
+                if first is None or first["id"] != occurrence["record_id"]:
+                    results[index] = "Error adding feedback: the entry it repeats was not stored"
+                    continue
+                # Update the occurrence count of the first entry's metadata
+                updates.append((position, {"occurrences": count, "last_seen": timestamp}))
+                pending.append((index, "Error adding feedback",
+                                f"Duplicate feedback collapsed into entry from {first['timestamp']} "
+                                f"(seen {count} times)"))
+            else:
+                position, message = find_entry_to_address(params.get("id"), params.get("timestamp"),
+                                                          addressed_now, new_meta)
+                if position is None:
+                    results[index] = message
+                    continue
+                addressed_now.add(position)
+                updates.append((position, {
+                    "addressed": True,
+                    "resolution": params.get("resolution"),
+                    "addressed_at": timestamp
+                }))
+                pending.append((index, "Error marking feedback as addressed", "Feedback entry marked as addressed"))
+        except Exception as e:
+            results[index] = (f"Error adding feedback: {str(e)}" if kind == "add"
+                              else f"Error marking feedback as addressed: {str(e)}")
+    
+    try:
+        record_store.record_occurrences([occurrence for occurrence, _ in repeats.values()
+                                         if occurrence.get("record_id")])
+        # Entries marked before they had metadata are added first; their
+        # updates name them by id until their positions are known
+        added = dict(zip(new_meta, meta_journal().add_many(list(new_meta.values()), fsync=FSYNC_ON_COMMIT)))
+        updates = [(added.get(position, position), fields) for position, fields in updates]
+        meta_journal().update_many(updates, fsync=FSYNC_ON_COMMIT)
+        for index, _, message in pending:
+            results[index] = message
     except Exception as e:
-        return {"error": str(e)}
+        for index, error, _ in pending:
+            results[index] = f"{error}: {str(e)}"
+    dedup_seen = dedup_state()
+
+def dedup_state():
+    """Return the current (log size, record count), compared with dedup_seen."""
+    try:
+        size = os.path.getsize(feedback_log_path)
+    except OSError:
+        size = 0
+    return size, record_store.count()
+
+def repeated_position(occurrence):
+    """
+    Find the metadata position of the entry a dedup occurrence collapses into.
+    
+    The occurrence only holds the entry's record id; the position is looked
+    up in the current journal, since another process may have cleared it.
+    
+    Returns:
+        The position, or None if the entry's record or metadata is gone.
+    """
+    record_id = occurrence.get("record_id")
+    if record_id is None or record_store.get(record_id) is None:
+        return None
+    return meta_journal().position_of(record_id)
+
+def find_entry_to_address(entry_id, timestamp, addressed_now=(), new_meta=None):
+    """
+    Find the metadata position of the entry a mark_feedback_addressed call means.
+    
+    Entries written by the Chrome extension only have a record until they
+    are first marked; they are given a metadata entry then, so the addressed
+    state is kept in one place for every entry.
+    
+    Args:
+        entry_id: The entry's id, which takes precedence.
+        timestamp: The entry's timestamp; the oldest entry with it that is
+                   not addressed yet (or about to be) is chosen.
+        addressed_now: Positions marked earlier in the same batch.
+        new_meta: Metadata entries to add in the batch's journal write, by
+                  id; an entry without metadata is added here and its id
+                  stands in for its position.
+        
+    Returns:
+        (position, None), or (None, message) if there is no such entry.
+    """
+    if entry_id is not None:
+        position = meta_journal().position_of(entry_id)
+        if position is None:
+            record = record_store.get(entry_id) if str(entry_id).isdigit() else None
+            if record is None:
+                return None, f"No feedback entry found with id {entry_id}"
+            position = record["id"]
+            new_meta.setdefault(position, {
+                "id": record["id"],
+                "timestamp": record.get("timestamp"),
+                "message": record.get("feedback"),
+                "source": record.get("url"),
+                "context": {"title": record["title"]} if record.get("title") else None,
+                "attachments": record.get("attachments") or []
+            })
+        return position, None
+    if timestamp is not None:
+        positions = meta_journal().positions_at(timestamp)
+        if not positions:
+            return None, f"No feedback entry found with timestamp {timestamp}"
+        return next((p for p in positions
+                     if p not in addressed_now and not meta_journal().entry_at(p).get("addressed")),
+                    positions[0]), None
+    return None, "Provide the id or timestamp of the feedback entry"
 
 @mcp.tool()
-def add_feedback(message: str, source: str = None, context: dict = None) -> str:
+async def add_feedback(message: str, source: str = None, context: dict = None, attachments: list = None) -> str:
     """
     Add a new feedback entry to the log file.
     
@@ -100,112 +714,255 @@ def add_feedback(message: str, source: str = None, context: dict = None) -> str:
         message: The feedback message to add.
         source: The source of the feedback (e.g., website URL).
         context: Additional context about the feedback (e.g., user info, related code).
+        attachments: SHA-256 hashes of stored attachments (see feedback://attachment/{hash}).
         
     Returns:
         A confirmation message.
     """
+    return await submit_write("add", message=message, source=source, context=context, attachments=attachments)
+
+@mcp.tool()
+@offload()
+def read_feedback(since_cursor: str = None, max_bytes: int = 65536) -> dict:
+    """
+    Read feedback written after a cursor, without re-reading older entries.
+    
+    Args:
+        since_cursor: The cursor returned by the previous call; omit it to start
+                      from the oldest entry, or pass "end" to skip the history.
+        max_bytes: Roughly how much log text to return in one page.
+        
+    Returns:
+        A dictionary with the new log text ("content"), the cursor to pass next
+        time ("cursor") and whether more text is already waiting ("has_more").
+    """
     try:
-        # Ensure the directory exists
-        os.makedirs(feedback_dir, exist_ok=True)
+        return segmented_log.read_from(since_cursor, max_bytes)
+    except Exception as e:
+        return {"error": str(e)}
+
+@mcp.tool()
+@offload(exclusive=True)
+def search_feedback(query: str, limit: int = 10, filters: dict = None) -> list:
+    """
+    Search feedback entries by relevance (BM25) over their message, title and URL.
+    
+    Args:
+        query: Words to search for, e.g. "checkout button".
+        limit: Maximum number of entries to return.
+        filters: Optional filters: "source" (text the URL must contain),
+                 "since" and "until" (timestamps), "addressed" (true/false).
         
-        # Format the feedback entry with timestamp
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-        entry = f"[{timestamp}] {message}\n\n"
+    Returns:
+        The best matching entries, best first, each with its relevance score.
+    """
+    try:
+        filters = filters or {}
+        source = filters.get("source")
+        addressed = filters.get("addressed")
         
-        # Write to the log file
-        with open(feedback_log_path, 'a', encoding='utf-8') as f:
-            f.write(entry)
+        def matches(record):
+            if source and source not in (record.get("url") or ""):
+                return False
+            if addressed is not None:
+                entry = meta_journal().get(record["id"]) or {}
+                if bool(entry.get("addressed")) != bool(addressed):
+                    return False
+            return True
         
-        # Update metadata
-        meta = {"entries": []}
-        if os.path.exists(feedback_meta_path):
-            try:
-                with open(feedback_meta_path, 'r', encoding='utf-8') as f:
-                    meta = json.load(f)
-            except:
-                pass
+        where = matches if source or addressed is not None else None
+        results = search_index().search(query, limit, filters.get("since"), filters.get("until"), where)
+        return [{
+            "id": record["id"],
+            "score": round(score, 4),
+            "timestamp": record.get("timestamp"),
+            "url": record.get("url"),
+            "title": record.get("title"),
+            "feedback": record.get("feedback")
+        } for score, record in results]
+    except Exception as e:
+        return [{"error": str(e)}]
+
+@mcp.tool()
+@offload()
+def query_feedback(source: str = None, since: str = None, until: str = None,
+                   addressed: bool = None, limit: int = 50, order: str = "desc") -> list:
+    """
+    List feedback entries matching filters, using the metadata indexes.
+    
+    Args:
+        source: Only entries from this URL or origin (e.g. https://example.com).
+        since: Only entries at or after this timestamp.
+        until: Only entries at or before this timestamp.
+        addressed: True for addressed entries, False for open ones.
+        limit: Maximum number of entries to return.
+        order: "desc" for newest first, "asc" for oldest first.
         
-        # Add new entry metadata
-        meta["entries"].append({
-            "timestamp": timestamp,
-            "message": message,
-            "source": source,
-            "context": context
-        })
+    Returns:
+        The matching feedback entries.
+    """
+    try:
+        return meta_journal().query(source, since, until, addressed, limit, order)
+    except Exception as e:
+        return [{"error": str(e)}]
+
+# Recent records a digest is built from
+DIGEST_RECORDS = 2000
+
+# Rendered digests by (store version, max_tokens, group_by); any write changes the version
+digest_cache = OrderedDict()
+DIGEST_CACHE_SIZE = 16
+
+@mcp.tool()
+@offload(exclusive=True)
+def get_feedback_digest(max_tokens: int = 2000, group_by: str = "none") -> str:
+    """
+    Get a compact digest of open feedback that fits in a token budget.
+    
+    Repeated feedback is collapsed into one line with a count, long bodies are
+    truncated, and entries are ordered by recency and frequency.
+    
+    Args:
+        max_tokens: Approximate token budget for the digest.
+        group_by: "none", "origin", "path" or "day".
         
-        # Write updated metadata
-        with open(feedback_meta_path, 'w', encoding='utf-8') as f:
-            json.dump(meta, f, indent=2)
+    Returns:
+        The digest text.
+    """
+    from feedbackflow.cache import file_identity
+    from feedbackflow.digest import build_digest
+    try:
+        count = record_store.count()
+        # Repeat counts are appended to the occurrences file by whichever
+        # process closes a dedup window, so its identity is part of the version
+        version = (count, record_store.id_at(count - 1), meta_journal().version(),
+                   file_identity([record_store.occurrences_path]))
+        key = (version, max_tokens, group_by)
+        if key in digest_cache:
+            digest_cache.move_to_end(key)
+            return digest_cache[key]
+        
+        # Addressed entries no longer need attention
+        records = [record for record in record_store.tail(DIGEST_RECORDS)
+                   if not (meta_journal().get(record["id"]) or {}).get("addressed")]
+        digest = build_digest(records, max_tokens, group_by, record_store.occurrences())
         
-        return f"Feedback added successfully at {timestamp}"
+        digest_cache[key] = digest
+        if len(digest_cache) > DIGEST_CACHE_SIZE:
+            digest_cache.popitem(last=False)
+        return digest
     except Exception as e:
-        return f"Error adding feedback: {str(e)}"
+        return f"Error building feedback digest: {str(e)}"
+
+themes_path = os.path.join(record_store.root, "themes.npz")
+theme_model = None
 
 @mcp.tool()
-def clear_feedback() -> str:
+@offload(exclusive=True)
+def cluster_feedback(k: int = None, threshold: float = None, representatives: int = 3) -> list:
     """
-    Clear the feedback log file.
+    Group feedback into themes locally (TF-IDF + k-means), without reading
+    every entry into the conversation.
     
+    Args:
+        k: Number of themes to find. Changing it refits the themes.
+        threshold: Instead of k, start a new theme for any entry whose cosine
+                   similarity to every existing theme is below this (0-1).
+        representatives: Entries to show per theme, those closest to its center.
+        
     Returns:
-        A confirmation message.
+        The themes, largest first, each with a label, size, representative
+        entries and the ids of all its members.
     """
+    global theme_model
     try:
-        # Ensure the directory exists
-        os.makedirs(feedback_dir, exist_ok=True)
+        # Imported on first use: it loads NumPy, which would dominate startup
+        from feedbackflow.cluster import ThemeModel, MAX_RECORDS as CLUSTER_RECORDS
+        
+        if theme_model is None:
+            theme_model = ThemeModel.load(themes_path)
+        count = record_store.count()
         
-        # Clear the log file by opening it in write mode
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-        with open(feedback_log_path, 'w', encoding='utf-8') as f:
-            f.write(f"# Feedback Flow Log File - Cleared on {timestamp}\n")
+        # Refit for new settings or a cleared store; otherwise only assign new entries
+        refit = (theme_model is None or count < theme_model.position
+                 or (k is not None and k != theme_model.k)
+                 or (threshold is not None and threshold != theme_model.threshold))
+        if refit:
+            if k is None and threshold is None:
+                k = min(8, max(1, int((count / 2) ** 0.5)))
+            records = record_store.tail(CLUSTER_RECORDS)
+            theme_model = ThemeModel.fit(records, count, k=k, threshold=threshold)
+        elif count > theme_model.position:
+            theme_model.assign(record_store.read_range(theme_model.position, count), count)
+        else:
+            refit = None
+        if refit is not None:
+            theme_model.save(themes_path)
         
-        # Clear metadata
-        with open(feedback_meta_path, 'w', encoding='utf-8') as f:
-            json.dump({"entries": []}, f, indent=2)
+        themes = theme_model.themes()
+        for theme in themes:
+            # Rank the most recent members by similarity to the theme's center
+            members = [r for r in (record_store.get(i) for i in theme["member_ids"][-50:]) if r]
+            if members:
+                similarity = theme_model.vectorize(members) @ theme_model.centroids[theme["cluster"]]
+                best = sorted(range(len(members)), key=lambda i: -similarity[i])[:representatives]
+                theme["representatives"] = [{
+                    "id": members[i]["id"],
+                    "timestamp": members[i].get("timestamp"),
+                    "url": members[i].get("url"),
+                    "feedback": members[i].get("feedback")
+                } for i in best]
+            else:
+                theme["representatives"] = []
+            del theme["cluster"]
+        return themes
+    except Exception as e:
+        return [{"error": str(e)}]
+
+@mcp.tool()
+async def clear_feedback() -> str:
+    """
+    Clear the feedback log file.
+    
+    Returns:
+        A confirmation message.
+    """
+    return await submit_write("clear")
+
+def clear_all():
+    """Clear the log, records, metadata and indexes; runs in the writer."""
+    global theme_model
+    from feedbackflow.reset import clear_all_feedback
+    try:
+        timestamp = clear_all_feedback(feedback_dir, record_store=record_store, segmented_log=segmented_log,
+                                       blob_store=blob_store, meta_journal=meta_journal(),
+                                       search_index=search_index(), feedback_stats=feedback_stats())
+        theme_model = None
+        dedup_index.clear()
         
         return f"Feedback log cleared successfully at {timestamp}"
     except Exception as e:
         return f"Error clearing feedback log: {str(e)}"
 
 @mcp.tool()
-def mark_feedback_addressed(timestamp: str, resolution: str = None) -> str:
+async def mark_feedback_addressed(timestamp: str = None, resolution: str = None,
+                                  id: Union[str, int] = None) -> str:
     """
     Mark a feedback entry as addressed.
     
     Args:
         timestamp: The timestamp of the feedback entry to mark as addressed.
+                   If several entries share it, the oldest one not yet
+                   addressed is marked; use `id` to be exact.
         resolution: Optional description of how the feedback was addressed.
+        id: The unique id of the feedback entry (takes precedence over timestamp).
+            Ids are numeric strings; FastMCP decodes those to ints before
+            calling the tool, so both are accepted.
         
     Returns:
         A confirmation message.
     """
-    try:
-        if not os.path.exists(feedback_meta_path):
-            return "Feedback metadata file does not exist."
-        
-        # Load metadata
-        with open(feedback_meta_path, 'r', encoding='utf-8') as f:
-            meta = json.load(f)
-        
-        # Find and update the entry
-        found = False
-        for entry in meta.get("entries", []):
-            if entry.get("timestamp") == timestamp:
-                entry["addressed"] = True
-                entry["resolution"] = resolution
-                entry["addressed_at"] = time.strftime('%Y-%m-%d %H:%M:%S')
-                found = True
-                break
-        
-        if not found:
-            return f"No feedback entry found with timestamp {timestamp}"
-        
-        # Write updated metadata
-        with open(feedback_meta_path, 'w', encoding='utf-8') as f:
-            json.dump(meta, f, indent=2)
-        
-        return f"Feedback entry marked as addressed"
-    except Exception as e:
-        return f"Error marking feedback as addressed: {str(e)}"
+    return await submit_write("mark", timestamp=timestamp, resolution=resolution, id=id)
 
 @mcp.prompt()
 def analyze_feedback() -> str:
@@ -213,7 +970,8 @@ def analyze_feedback() -> str:
     Prompt for analyzing the feedback in the log file.
     """
     return """
-    Please analyze the feedback in the log file and provide insights on:
+    Please analyze the feedback in the log file (use the get_feedback_digest tool
+    to fit a large log into your context) and provide insights on:
     1. Common themes or patterns
     2. Sentiment analysis (positive, negative, neutral)
     3. Actionable suggestions based on the feedback
@@ -274,7 +1032,7 @@ def cursor_integration_guide() -> str:
     This workflow helps maintain a continuous feedback loop between your website users and your development process.
     """
 
-def print_cursor_instructions():
+def print_cursor_instructions(args):
     """Print instructions for adding the MCP server to Cursor."""
     print("\n=== Cursor Integration Instructions ===")
     print("\nTo add FeedbackFlow MCP to Cursor:")
@@ -291,21 +1049,31 @@ def print_cursor_instructions():
     print("\nThe MCP server is now running and ready for Cursor to connect.")
     print("You can use FeedbackFlow resources and tools in Cursor's Composer and Agent features.")
 
-if __name__ == "__main__":
+def main(argv=None):
+    """Parse the command line and run the MCP server."""
+    args = parse_args(argv)
+
     # Ensure the feedback directory exists
     os.makedirs(feedback_dir, exist_ok=True)
     
-    # Run the MCP server
+    # Run the MCP server; with the stdio transport, stdout carries the protocol
+    # so messages go to stderr
     if args.cursor:
-        print("Starting FeedbackFlow MCP server in Cursor mode...")
+        print("Starting FeedbackFlow MCP server in Cursor mode...", file=sys.stderr)
         # When run from Cursor, use stdio transport
         mcp.run(transport="stdio")
     else:
-        print(f"Starting FeedbackFlow MCP server on port {args.port} with {args.transport} transport...")
+        print(f"Starting FeedbackFlow MCP server on port {args.port} with {args.transport} transport...",
+              file=sys.stderr if args.transport == "stdio" else sys.stdout)
         if args.transport == "stdio":
             mcp.run(transport="stdio")
         else:
-            mcp.run(port=args.port)
+            # FastMCP takes the port from its settings, not from run()
+            mcp.settings.port = args.port
+            mcp.run(transport="sse")
             
         # Print Cursor integration instructions if not already in Cursor mode
-        print_cursor_instructions() 
\ No newline at end of file
+        print_cursor_instructions(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,16 @@
 #!/usr/bin/env python3
 import os
 import sys
+import runpy
 import subprocess
+import importlib.util
 import time
 import signal
 import platform
 
 def check_mcp_installed():
-    """Check if MCP is installed."""
-    try:
-        import mcp
-        return True
-    except ImportError:
-        return False
+    """Check if MCP is installed, without importing it."""
+    return importlib.util.find_spec("mcp") is not None
 
 def install_mcp():
     """Install MCP if not already installed."""
@@ -49,9 +47,11 @@ def run_server():
         current_dir = os.path.dirname(os.path.abspath(__file__))
         server_path = os.path.join(current_dir, "mcp_server.py")
         
-        # Run the server
-        subprocess.run([sys.executable, server_path], check=True)
-    except subprocess.CalledProcessError as e:
+        # Run the server in this process rather than starting another
+        # interpreter, which would import everything a second time
+        sys.argv = [server_path]
+        runpy.run_path(server_path, run_name="__main__")
+    except ImportError as e:
         print(f"❌ Error running MCP server: {e}")
         sys.exit(1)
 
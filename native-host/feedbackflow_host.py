@@ -1,84 +1,505 @@
 #!/usr/bin/env python3
 import sys
 import json
-import struct
 import os
 import time
+import base64
+import queue
+import threading
 from pathlib import Path
 
+# Make the feedbackflow package importable when run from a checkout
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feedbackflow.store import RecordStore, parse_block
+from feedbackflow.segments import SegmentedLog
+from feedbackflow.codec import FrameReader, write_frame, JSON_BACKEND
+from feedbackflow.blobs import BlobStore
+from feedbackflow.stats import FeedbackStats
+from feedbackflow.dedup import DedupIndex
+from feedbackflow.reset import clear_all_feedback
+
+# How long a persistent (connectNative) session may sit without any message
+# before the host exits. Chrome starts a fresh host on the next connect.
+IDLE_TIMEOUT_SECONDS = float(os.environ.get('FEEDBACKFLOW_HOST_IDLE_TIMEOUT', '300'))
+
+# writeFeedback messages arriving within this window of each other on a
+# persistent session are written together as one group commit (0 disables)
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get('FEEDBACKFLOW_GROUP_COMMIT_MS', '5'))
+
+# Whether each commit is fsync'ed before it is acknowledged
+FSYNC_ON_COMMIT = os.environ.get('FEEDBACKFLOW_HOST_FSYNC', '0') == '1'
+
+# Maximum number of decoded messages waiting for the writer thread. When it
+# is full the reader answers with a retryAfterMs hint instead of blocking.
+QUEUE_SIZE = int(os.environ.get('FEEDBACKFLOW_HOST_QUEUE_SIZE', '1024'))
+
+# How often the writer wakes up to check the idle timeout
+IDLE_POLL_SECONDS = 1.0
+
+DEFAULT_LOG_PATH = '.feedbackflow/feedback.log'
+
+# Queued after the last message once Chrome closes the port
+END_OF_INPUT = object()
+
+# Responses are sent from both the reader and the writer thread
+stdout_lock = threading.Lock()
+stats_lock = threading.Lock()
+
+# Per-session counters, reported to host_sessions.log when the session ends
+session_stats = {
+    'started_at': time.time(),
+    'messages_in': 0,
+    'messages_out': 0,
+    'bytes_in': 0,
+    'bytes_out': 0,
+    'entries_written': 0,
+    'entries_deduplicated': 0,
+    'commits': 0,
+    'fsyncs': 0,
+    'pings': 0,
+    'attachments_stored': 0,
+    'attachments_deduplicated': 0,
+    'backpressure_replies': 0,
+    'write_seconds': 0.0,
+    'errors': 0,
+}
+
+# Bump a session counter from either thread
+def count(name, amount=1):
+    with stats_lock:
+        session_stats[name] += amount
+
+# Suggest how long Chrome should wait before retrying when the queue is full,
+# based on how long the writer has been taking per entry
+def estimate_retry_after_ms(queue_size):
+    with stats_lock:
+        written = session_stats['entries_written']
+        seconds = session_stats['write_seconds']
+    per_entry_ms = (seconds * 1000.0 / written) if written else 1.0
+    return int(min(5000, max(10, per_entry_ms * queue_size / 2)))
+
+# Frames from Chrome are read into one reusable buffer
+frame_reader = None
+
 # Function to get message from Chrome
 def get_message():
-    # Read the message length (first 4 bytes)
-    text_length_bytes = sys.stdin.buffer.read(4)
-    if len(text_length_bytes) == 0:
-        sys.exit(0)
-    
-    # Unpack message length as 4-byte little-endian unsigned int
-    text_length = struct.unpack('=I', text_length_bytes)[0]
-    
-    # Read the JSON message
-    text = sys.stdin.buffer.read(text_length).decode('utf-8')
-    return json.loads(text)
+    global frame_reader
+    if frame_reader is None:
+        frame_reader = FrameReader(sys.stdin.fileno())
+
+    # Read the 4-byte length and the JSON body; None means Chrome closed the port
+    frame = frame_reader.read()
+    if frame is None:
+        return None
+
+    message, size = frame
+    count('messages_in')
+    count('bytes_in', size)
+    return message
 
 # Function to send a message to Chrome
 def send_message(message):
-    # Encode the message as JSON
-    encoded_message = json.dumps(message).encode('utf-8')
-    
-    # Write the message size as a 4-byte little-endian unsigned int
-    sys.stdout.buffer.write(struct.pack('=I', len(encoded_message)))
-    
-    # Write the message itself
-    sys.stdout.buffer.write(encoded_message)
-    sys.stdout.buffer.flush()
+    # Write the 4-byte length and the JSON body in one go
+    with stdout_lock:
+        size = write_frame(sys.stdout.fileno(), message)
 
-# Main function
-def main():
-    # Get the home directory
-    home_dir = str(Path.home())
-    
-    # Create the .feedbackflow directory if it doesn't exist
-    feedback_dir = os.path.join(home_dir, '.feedbackflow')
-    os.makedirs(feedback_dir, exist_ok=True)
-    
-    # Process messages from Chrome
-    while True:
+    count('messages_out')
+    count('bytes_out', size)
+
+# Send a response, echoing the request id so port clients can match it up
+def reply(message, response):
+    if isinstance(message, dict) and 'id' in message:
+        response['id'] = message['id']
+    send_message(response)
+
+# Append an error to the host's error log
+def log_error(feedback_dir, error):
+    count('errors')
+    with open(os.path.join(feedback_dir, 'error.log'), 'a') as f:
+        f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - Error: {str(error)}\n")
+
+# Record the counters for a finished session
+def log_session_end(feedback_dir, reason):
+    with stats_lock:
+        stats = dict(session_stats)
+    stats['write_seconds'] = round(stats['write_seconds'], 6)
+    stats['duration_seconds'] = round(time.time() - stats.pop('started_at'), 3)
+    stats['reason'] = reason
+    stats['json_backend'] = JSON_BACKEND
+    with open(os.path.join(feedback_dir, 'host_sessions.log'), 'a') as f:
+        f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - Session ended: {json.dumps(stats)}\n")
+
+# Append a list of (path, content, entry) entries with one open and one write
+# per log file, optionally followed by a single fsync. Entries for the main
+# feedback log are also stored as structured records, and repeats of recently
+# seen feedback are collapsed into their first entry. Returns one result per entry.
+def write_entries(home_dir, entries, fsync=False):
+    results = [None] * len(entries)
+    default_log_path = os.path.join(home_dir, DEFAULT_LOG_PATH)
+
+    # Group the entries by target file, keeping their original order
+    by_path = {}
+    for index, (path, content, entry) in enumerate(entries):
+        log_path = os.path.join(home_dir, path or DEFAULT_LOG_PATH)
+        by_path.setdefault(log_path, []).append((index, content, entry))
+
+    for log_path, items in by_path.items():
+        is_main_log = log_path == default_log_path
+        occurrences = {}
+        duplicates = []
+        if is_main_log:
+            items, occurrences, duplicates = collapse_duplicates(home_dir, items)
+
+        started = time.time()
         try:
-            message = get_message()
-            
-            if message.get('action') == 'writeFeedback':
-                # Get the log file path
-                log_path = os.path.join(home_dir, message.get('path', '.feedbackflow/feedback.log'))
-                
+            if items:
                 # Ensure the directory exists
                 os.makedirs(os.path.dirname(log_path), exist_ok=True)
-                
-                # Write to the log file
+
+                # Roll the main log over into a segment once it is too big or old
+                if is_main_log:
+                    get_segmented_log(home_dir).maybe_rotate()
+
+                # Write the whole group to the log file at once
                 with open(log_path, 'a', encoding='utf-8') as f:
-                    f.write(message.get('content', ''))
-                
-                # Send success response
-                send_message({'success': True})
-            elif message.get('action') == 'clearFeedback':
-                # Get the log file path
-                log_path = os.path.join(home_dir, message.get('path', '.feedbackflow/feedback.log'))
-                
-                # Clear the log file by opening it in write mode
-                with open(log_path, 'w', encoding='utf-8') as f:
-                    f.write("# Feedback Flow Log File - Cleared on " + time.strftime('%Y-%m-%d %H:%M:%S') + "\n")
-                
-                # Send success response
-                send_message({'success': True})
+                    f.write(''.join(content for _, content, _ in items))
+                    if fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                        count('fsyncs')
+
+                count('commits')
+                count('entries_written', len(items))
+                count('write_seconds', time.time() - started)
+            for index, _, _ in items:
+                results[index] = {'index': index, 'success': True}
+        except Exception as e:
+            for index, _, _ in items:
+                results[index] = {'index': index, 'success': False, 'error': str(e)}
+            for index, _ in duplicates:
+                results[index] = {'index': index, 'success': False, 'error': str(e)}
+            # Nothing was written, so these fingerprints must not swallow retries
+            dedup_index = get_dedup_index(home_dir)
+            for occurrence in occurrences.values():
+                dedup_index.forget(occurrence)
+            continue
+
+        if is_main_log:
+            # The log is the source of truth; a failed record write is only logged
+            try:
+                records = get_record_store(home_dir).append([entry for _, _, entry in items])
+                for (index, _, _), record in zip(items, records):
+                    results[index]['recordId'] = record['id']
+                    occurrences[index]['record_id'] = record['id']
+
+                # Entries only carry attachment hashes; count the references
+                get_blob_store(home_dir).add_refs(
+                    [h for record in records for h in record.get('attachments') or []])
+
+                # Keep the feedback://stats counters current with every write
+                get_feedback_stats(home_dir).record(records)
+            except Exception as e:
+                log_error(os.path.join(home_dir, '.feedbackflow'), e)
+
+            for index, occurrence in duplicates:
+                results[index] = {
+                    'index': index,
+                    'success': True,
+                    'deduplicated': True,
+                    'recordId': occurrence.get('record_id'),
+                    'occurrences': occurrence['count'],
+                }
+
+            # Persist the counts of repeat windows that have closed
+            flush_occurrences(home_dir, get_dedup_index(home_dir).pop_finished())
+
+    return results
+
+# Split main-log items into new entries and repeats of recently seen feedback.
+# Returns (new items with structured entries, {index: occurrence} for the new
+# items, [(index, occurrence)] for the repeats).
+def collapse_duplicates(home_dir, items):
+    dedup_index = get_dedup_index(home_dir)
+    new_items = []
+    occurrences = {}
+    duplicates = []
+    for index, content, entry in items:
+        entry = structured_entry(content, entry)
+        occurrence, is_new = dedup_index.observe(entry.get('feedback') or content, entry.get('url'))
+        if is_new:
+            new_items.append((index, content, entry))
+            occurrences[index] = occurrence
+        else:
+            count('entries_deduplicated')
+            duplicates.append((index, occurrence))
+    return new_items, occurrences, duplicates
+
+# Save the final occurrence counts of collapsed repeats with their records
+def flush_occurrences(home_dir, finished):
+    finished = [o for o in finished if o.get('record_id')]
+    if finished:
+        try:
+            get_record_store(home_dir).record_occurrences(finished)
+        except Exception as e:
+            log_error(os.path.join(home_dir, '.feedbackflow'), e)
+
+# Structured fields for an entry: sent by the extension, or parsed from the block
+def structured_entry(content, entry):
+    if isinstance(entry, dict):
+        return entry
+    parsed = parse_block(content)
+    if not parsed:
+        parsed = {'feedback': content.strip()}
+    return parsed
+
+# Record store for the user's feedback directory
+def get_record_store(home_dir):
+    return RecordStore(os.path.join(home_dir, '.feedbackflow', 'records'))
+
+# Attachment store, kept for the whole session so chunked uploads can be
+# hashed as they arrive
+blob_stores = {}
+def get_blob_store(home_dir):
+    if home_dir not in blob_stores:
+        blob_stores[home_dir] = BlobStore(os.path.join(home_dir, '.feedbackflow', 'blobs'))
+    return blob_stores[home_dir]
+
+# Store one chunk of an attachment upload. Chunks carry base64 `data` and are
+# numbered from 0; the chunk with `final` set completes the upload.
+def write_attachment(message, home_dir):
+    blob_store = get_blob_store(home_dir)
+    upload_id = message.get('uploadId')
+    index = int(message.get('chunkIndex', 0))
+    expected_hash = message.get('sha256')
+    if not upload_id:
+        raise ValueError('writeAttachment requires an uploadId')
+
+    # A client that knows the hash up front can skip uploading a known blob
+    if index == 0 and expected_hash and blob_store.claim(expected_hash):
+        count('attachments_deduplicated')
+        return {'success': True, 'hash': expected_hash, 'deduplicated': True, 'skipUpload': True}
+
+    received = blob_store.write_chunk(upload_id, index, base64.b64decode(message.get('data', '')))
+    if not message.get('final'):
+        return {'success': True, 'received': received}
+
+    blob_hash, size, deduplicated = blob_store.finish(upload_id, expected_hash)
+    count('attachments_deduplicated' if deduplicated else 'attachments_stored')
+    return {'success': True, 'hash': blob_hash, 'size': size, 'deduplicated': deduplicated}
+
+# Recently seen fingerprints, kept for the whole session
+dedup_indexes = {}
+def get_dedup_index(home_dir):
+    if home_dir not in dedup_indexes:
+        dedup_indexes[home_dir] = DedupIndex()
+    return dedup_indexes[home_dir]
+
+# Counters behind feedback://stats, kept for the whole session so they are
+# only reread from disk when another process changed them
+feedback_stats = {}
+def get_feedback_stats(home_dir):
+    if home_dir not in feedback_stats:
+        feedback_stats[home_dir] = FeedbackStats(get_record_store(home_dir))
+    return feedback_stats[home_dir]
+
+# Rotating view of the main feedback log, kept for the whole session so the
+# rotation check stays a single stat() per commit
+segmented_logs = {}
+def get_segmented_log(home_dir):
+    if home_dir not in segmented_logs:
+        segmented_logs[home_dir] = SegmentedLog(os.path.join(home_dir, DEFAULT_LOG_PATH))
+    return segmented_logs[home_dir]
+
+# Response to a successful writeFeedback; repeats say which entry they joined
+def write_response(result):
+    response = {'success': True, 'recordId': result.get('recordId')}
+    if result.get('deduplicated'):
+        response['deduplicated'] = True
+        response['occurrences'] = result['occurrences']
+    return response
+
+# Write a group of writeFeedback messages as one commit and answer each one
+def commit_writes(messages, home_dir, feedback_dir):
+    entries = [(m.get('path'), m.get('content', ''), m.get('entry')) for m in messages]
+    results = write_entries(home_dir, entries, FSYNC_ON_COMMIT)
+    for message, result in zip(messages, results):
+        if result['success']:
+            reply(message, write_response(result))
+        else:
+            reply(message, {'success': False, 'error': result['error']})
+            log_error(feedback_dir, result['error'])
+
+# Handle a single decoded message and return the response to send
+def handle_message(message, home_dir):
+    action = message.get('action')
+
+    if action == 'writeFeedback':
+        results = write_entries(home_dir, [(message.get('path'), message.get('content', ''),
+                                            message.get('entry'))], FSYNC_ON_COMMIT)
+        if not results[0]['success']:
+            raise IOError(results[0]['error'])
+        return write_response(results[0])
+    elif action == 'writeFeedbackBatch':
+        # Entries are either plain strings or {content, path, entry} objects
+        default_path = message.get('path')
+        entries = []
+        for entry in message.get('entries', []):
+            if isinstance(entry, dict):
+                entries.append((entry.get('path', default_path), entry.get('content', ''),
+                                entry.get('entry')))
             else:
-                # Send error for unknown action
-                send_message({'success': False, 'error': 'Unknown action'})
-                
+                entries.append((default_path, str(entry), None))
+
+        results = write_entries(home_dir, entries, message.get('fsync', FSYNC_ON_COMMIT))
+        return {
+            'success': all(result['success'] for result in results),
+            'written': sum(1 for result in results if result['success']),
+            'results': results,
+        }
+    elif action == 'clearFeedback':
+        # Get the log file path
+        log_path = os.path.join(home_dir, message.get('path', DEFAULT_LOG_PATH))
+
+        if log_path == os.path.join(home_dir, DEFAULT_LOG_PATH):
+            # Clear the records, metadata, indexes and attachments along with
+            # the log, the same as `feedbackflow clear` and the MCP server do
+            clear_all_feedback(os.path.dirname(log_path), record_store=get_record_store(home_dir),
+                               segmented_log=get_segmented_log(home_dir), blob_store=get_blob_store(home_dir),
+                               feedback_stats=get_feedback_stats(home_dir))
+            get_dedup_index(home_dir).clear()
+        else:
+            # Clear the log file by opening it in write mode
+            with open(log_path, 'w', encoding='utf-8') as f:
+                f.write("# Feedback Flow Log File - Cleared on " + time.strftime('%Y-%m-%d %H:%M:%S') + "\n")
+
+        return {'success': True}
+    elif action == 'writeAttachment':
+        return write_attachment(message, home_dir)
+    elif action == 'collectAttachments':
+        removed = get_blob_store(home_dir).collect_garbage(message.get('graceSeconds', 3600))
+        return {'success': True, 'removed': removed}
+    elif action == 'ping':
+        # Keep-alive from a persistent connectNative port
+        count('pings')
+        return {'success': True, 'action': 'pong', 'time': time.time()}
+    elif action == 'getSessionStats':
+        with stats_lock:
+            stats = dict(session_stats)
+        stats['uptime_seconds'] = round(time.time() - stats.pop('started_at'), 3)
+        return {'success': True, 'stats': stats}
+    else:
+        # Send error for unknown action
+        return {'success': False, 'error': 'Unknown action'}
+
+# Reader thread: decode frames from Chrome and hand them to the writer.
+# Pings and stats are answered right here so they never wait behind disk I/O,
+# and when the writer falls behind, Chrome is told to retry instead of blocked.
+def read_frames(work_queue, activity, feedback_dir):
+    while True:
+        message = None
+        try:
+            message = get_message()
+            if message is None:
+                break
+            activity['last'] = time.time()
+
+            action = message.get('action')
+            if action in ('ping', 'getSessionStats'):
+                reply(message, handle_message(message, None))
+                continue
+
+            try:
+                work_queue.put_nowait(message)
+            except queue.Full:
+                count('backpressure_replies')
+                reply(message, {
+                    'success': False,
+                    'error': 'Host is busy, retry later',
+                    'retryAfterMs': estimate_retry_after_ms(work_queue.maxsize),
+                })
+        except Exception as e:
+            # Send error message
+            reply(message, {'success': False, 'error': str(e)})
+            # Log the error
+            log_error(feedback_dir, e)
+
+    # Tell the writer that no more messages are coming
+    work_queue.put(END_OF_INPUT)
+
+# Writer loop: drain the queue and persist, coalescing back-to-back writes.
+# Returns the reason the session ended.
+def write_frames(work_queue, activity, home_dir, feedback_dir):
+    window = GROUP_COMMIT_WINDOW_MS / 1000.0
+    while True:
+        # Wait for work, ending the session once it has been idle long enough
+        try:
+            message = work_queue.get(timeout=IDLE_POLL_SECONDS)
+        except queue.Empty:
+            if IDLE_TIMEOUT_SECONDS > 0 and time.time() - activity['last'] >= IDLE_TIMEOUT_SECONDS:
+                return 'idle'
+            continue
+
+        if message is END_OF_INPUT:
+            # Everything queued before EOF has been written
+            return 'eof'
+
+        try:
+            if message.get('action') == 'writeFeedback' and window > 0:
+                # Coalesce writes that arrive back to back into one commit
+                pending = [message]
+                message = None
+                deadline = time.time() + window
+                while True:
+                    try:
+                        message = work_queue.get(timeout=max(0, deadline - time.time()))
+                    except queue.Empty:
+                        message = None
+                        break
+                    if message is END_OF_INPUT or message.get('action') != 'writeFeedback':
+                        break
+                    pending.append(message)
+                    message = None
+                commit_writes(pending, home_dir, feedback_dir)
+
+                # The message that ended the group still needs handling
+                if message is END_OF_INPUT:
+                    return 'eof'
+                if message is None:
+                    continue
+
+            reply(message, handle_message(message, home_dir))
         except Exception as e:
             # Send error message
-            send_message({'success': False, 'error': str(e)})
+            reply(message, {'success': False, 'error': str(e)})
             # Log the error
-            with open(os.path.join(feedback_dir, 'error.log'), 'a') as f:
-                f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - Error: {str(e)}\n")
+            log_error(feedback_dir, e)
+
+# Main function
+def main():
+    # Get the home directory
+    home_dir = str(Path.home())
+
+    # Create the .feedbackflow directory if it doesn't exist
+    feedback_dir = os.path.join(home_dir, '.feedbackflow')
+    os.makedirs(feedback_dir, exist_ok=True)
+
+    # Process messages from Chrome until the port is closed. A one-off
+    # sendNativeMessage call sends one message and closes stdin; a
+    # connectNative port keeps the session serving messages until it goes idle.
+    work_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    activity = {'last': time.time()}
+    reader = threading.Thread(target=read_frames, args=(work_queue, activity, feedback_dir),
+                              name='feedbackflow-reader', daemon=True)
+    reader.start()
+
+    end_reason = write_frames(work_queue, activity, home_dir, feedback_dir)
+
+    # Everything read before the port closed has been written and answered
+    # (responses go straight to the file descriptor, so there is nothing to flush).
+    # Save the counts of repeats still inside their dedup window.
+    for dedup_home, dedup_index in dedup_indexes.items():
+        flush_occurrences(dedup_home, dedup_index.pop_all())
+    log_session_end(feedback_dir, end_reason)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
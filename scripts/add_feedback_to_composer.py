@@ -273,13 +273,13 @@ def add_feedback_to_composer(editor=None):
         print(f"File location: {log_path}")
         print("Please open it manually.")
 
-def main():
+def main(argv=None):
     """Parse command-line arguments and run the script."""
     parser = argparse.ArgumentParser(description='Add feedback to composer.')
     parser.add_argument('--editor', '-e', choices=['cursor', 'vscode', 'system'], 
                         help='Explicitly specify which editor to use')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     add_feedback_to_composer(editor=args.editor)
 
 if __name__ == '__main__':
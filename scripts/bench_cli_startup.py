@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Wall-clock startup benchmark for the feedbackflow CLI.
+
+Times a command (by default `feedbackflow read --help`) from process start to
+exit, in two ways:
+
+  in-process  feedbackflow.cli dispatches the command in its own interpreter
+  subprocess  the CLI starts a second interpreter for the script, the way it
+              used to for every command
+
+Pass a different command after --, e.g. `bench_cli_startup.py -- read --last 5`.
+Every run uses a throwaway HOME, so your real feedback log is never touched.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+sys.path.append(PROJECT_DIR)
+from feedbackflow.cli import COMMANDS
+
+# Start a second interpreter for the script, like the old run_script()
+SUBPROCESS_LAUNCHER = (
+    "import subprocess, sys; "
+    "sys.exit(subprocess.run([sys.executable] + sys.argv[1:]).returncode)"
+)
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[rank]
+
+def command_line(mode, command, command_args):
+    """The command line that runs `command` in the given mode."""
+    if mode == 'in-process':
+        return [sys.executable, '-m', 'feedbackflow.cli', command] + command_args
+    script_name, _, leading_args = COMMANDS[command]
+    script_path = os.path.join(PROJECT_DIR, script_name)
+    return [sys.executable, '-c', SUBPROCESS_LAUNCHER, script_path] + leading_args + command_args
+
+def run_benchmark(mode, command, command_args, runs):
+    """Run the command `runs` times and summarise the wall-clock times."""
+    home_dir = tempfile.mkdtemp(prefix='feedbackflow-bench-')
+    env = dict(os.environ, HOME=home_dir, PYTHONPATH=PROJECT_DIR)
+    argv = command_line(mode, command, command_args)
+    try:
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run(argv, env=env, cwd=home_dir, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - started)
+        to_ms = lambda value: round(value * 1000, 2)
+        return {
+            'mode': mode,
+            'command': ' '.join([command] + command_args),
+            'runs': runs,
+            'wall_ms': {
+                'min': to_ms(min(timings)),
+                'p50': to_ms(percentile(timings, 0.50)),
+                'p95': to_ms(percentile(timings, 0.95)),
+            },
+        }
+    finally:
+        shutil.rmtree(home_dir, ignore_errors=True)
+
+def print_result(result):
+    """Print one benchmark result as a summary line."""
+    wall = result['wall_ms']
+    print(f"{result['mode']:>10}  {result['command']:<20}  {result['runs']:>4} runs  "
+          f"min {wall['min']} ms  p50 {wall['p50']} ms  p95 {wall['p95']} ms")
+
+def main(argv=None):
+    """Parse command-line arguments and run the benchmarks."""
+    parser = argparse.ArgumentParser(description='Benchmark feedbackflow CLI startup.')
+    parser.add_argument('command', nargs='*', default=['read', '--help'],
+                        help='CLI command to time (default: read --help)')
+    parser.add_argument('--runs', '-n', type=int, default=20, help='Runs per mode (default: 20)')
+    parser.add_argument('--output', '-o', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    command, command_args = args.command[0], args.command[1:]
+    if command not in COMMANDS:
+        parser.error(f"unknown command {command}; choose from {', '.join(COMMANDS)}")
+
+    results = []
+    for mode in ('subprocess', 'in-process'):
+        result = run_benchmark(mode, command, command_args, args.runs)
+        print_result(result)
+        results.append(result)
+
+    if args.output:
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Multi-agent load test for the FeedbackFlow MCP server over SSE.
+
+Builds a synthetic corpus of feedback (1k to 1M entries) in a throwaway HOME,
+starts mcp/mcp_server.py with the SSE transport on a free local port, and
+runs N concurrent agents against it. Each agent is its own MCP client
+session and picks operations from a weighted mix:
+
+  log   read feedback://log
+  meta  read feedback://meta
+  add   call add_feedback with a new message
+  mark  call mark_feedback_addressed on a random entry
+
+The report gives throughput, latency percentiles and error rates per
+operation. Everything runs locally. To use the test as a regression gate,
+pass --max-error-rate, --max-p95 and/or --baseline: the script exits with
+status 1 when a threshold is exceeded.
+
+Needs the MCP SDK (pip install mcp).
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from pydantic import AnyUrl
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SERVER_PATH = os.path.join(PROJECT_DIR, 'mcp', 'mcp_server.py')
+
+sys.path.append(PROJECT_DIR)
+from feedbackflow.store import RecordStore
+
+OPERATIONS = ('log', 'meta', 'add', 'mark')
+
+# Words for synthetic feedback; random sentences from them do not collapse as duplicates
+WORDS = """
+button form page header footer menu link image layout color contrast font text
+label input field modal dialog scroll slow fast broken missing wrong confusing
+hidden overlapping checkout cart login signup search filter sort price banner
+mobile desktop tablet spacing alignment icon tooltip error message loading
+""".split()
+
+# Records written to the store per append while building a corpus
+CORPUS_BATCH = 10000
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[rank]
+
+def parse_weights(text):
+    """Parse an operation mix such as 'log=1,meta=1,add=2,mark=1'."""
+    weights = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name}; choose from {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def random_sentence(rng, words=8):
+    """A random feedback message."""
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+def build_corpus(home_dir, entries, seed=0):
+    """
+    Write a synthetic feedback log, record store and metadata snapshot.
+
+    Args:
+        home_dir: The throwaway HOME to write ~/.feedbackflow into.
+        entries: Number of feedback entries.
+        seed: Random seed, so every run gets the same corpus.
+
+    Returns:
+        The ids of the entries.
+    """
+    rng = random.Random(seed)
+    feedback_dir = os.path.join(home_dir, '.feedbackflow')
+    os.makedirs(feedback_dir, exist_ok=True)
+    store = RecordStore(os.path.join(feedback_dir, 'records'))
+    now = time.time()
+    ids = []
+    meta_entries = []
+    with open(os.path.join(feedback_dir, 'feedback.log'), 'w', encoding='utf-8') as log:
+        for start in range(0, entries, CORPUS_BATCH):
+            batch = []
+            for _ in range(min(CORPUS_BATCH, entries - start)):
+                # Spread the entries over the last 30 days
+                timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now - rng.random() * 30 * 86400))
+                batch.append({
+                    'timestamp': timestamp,
+                    'url': f"https://site{rng.randrange(20)}.example/page{rng.randrange(200)}",
+                    'title': None,
+                    'feedback': random_sentence(rng),
+                    'context': None,
+                    'attachments': [],
+                })
+            records = store.append(batch)
+            log.write(''.join(f"[{r['timestamp']}] {r['feedback']}\n\n" for r in records))
+            for record in records:
+                ids.append(record['id'])
+                meta_entries.append({
+                    'id': record['id'],
+                    'timestamp': record['timestamp'],
+                    'message': record['feedback'],
+                    'source': record['url'],
+                    'context': None,
+                    'attachments': [],
+                })
+    # Same layout MetaJournal writes for its snapshot
+    with open(os.path.join(feedback_dir, 'feedback_meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'entries': meta_entries, 'seq': 0}, f)
+    return ids
+
+def free_port():
+    """A local TCP port nothing is listening on."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(home_dir, port, timeout=60):
+    """Start the MCP server over SSE and wait until it accepts connections."""
+    env = dict(os.environ, HOME=home_dir)
+    # The server logs every request; keep that in a file rather than a pipe nobody drains
+    log_path = os.path.join(home_dir, 'server.log')
+    with open(log_path, 'wb') as log:
+        process = subprocess.Popen([sys.executable, SERVER_PATH, '--transport', 'sse', '--port', str(port)],
+                                   env=env, cwd=home_dir, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            with open(log_path, 'r', encoding='utf-8', errors='replace') as log:
+                raise RuntimeError(f"server exited: {log.read()}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('server did not start listening in time')
+
+def tool_failed(result):
+    """Tools report failures as error results or as an 'Error ...' message."""
+    if result.isError:
+        return True
+    text = result.content[0].text if result.content and hasattr(result.content[0], 'text') else ''
+    return text.startswith('Error')
+
+async def run_operation(session, operation, rng, ids):
+    """Run one operation; return True if it succeeded."""
+    if operation == 'log':
+        await session.read_resource(AnyUrl('feedback://log'))
+        return True
+    if operation == 'meta':
+        await session.read_resource(AnyUrl('feedback://meta'))
+        return True
+    if operation == 'add':
+        result = await session.call_tool('add_feedback', {
+            'message': random_sentence(rng, 10),
+            'source': f"https://site{rng.randrange(20)}.example/page{rng.randrange(200)}",
+        })
+        return not tool_failed(result)
+    result = await session.call_tool('mark_feedback_addressed', {
+        'id': rng.choice(ids),
+        'resolution': 'Addressed by the load test',
+    })
+    return not tool_failed(result)
+
+async def run_agent(url, agent, weights, ids, stop_at, seed, samples):
+    """One agent: its own MCP session running operations until `stop_at`."""
+    rng = random.Random(seed * 1000 + agent)
+    operations = list(weights)
+    operation_weights = list(weights.values())
+    async with sse_client(url, timeout=30, sse_read_timeout=300) as streams:
+        async with ClientSession(*streams) as session:
+            await session.initialize()
+            while time.perf_counter() < stop_at:
+                operation = rng.choices(operations, weights=operation_weights)[0]
+                started = time.perf_counter()
+                try:
+                    ok = await run_operation(session, operation, rng, ids)
+                except Exception:
+                    ok = False
+                samples.append((operation, time.perf_counter() - started, ok))
+
+async def warm_up(url):
+    """Let the server build its indexes before anything is timed."""
+    async with sse_client(url, timeout=30, sse_read_timeout=3600) as streams:
+        async with ClientSession(*streams) as session:
+            await session.initialize()
+            started = time.perf_counter()
+            await session.call_tool('add_feedback', {'message': 'Load test warm-up entry'})
+            await session.read_resource(AnyUrl('feedback://meta'))
+            return time.perf_counter() - started
+
+async def load_ids(url):
+    """Ids of the entries on a server this script did not populate."""
+    async with sse_client(url) as streams:
+        async with ClientSession(*streams) as session:
+            await session.initialize()
+            result = await session.read_resource(AnyUrl('feedback://meta'))
+            return [entry['id'] for entry in json.loads(result.contents[0].text).get('entries', [])]
+
+async def run_load(url, agents, weights, ids, duration, seed):
+    """Run every agent for `duration` seconds and collect the samples."""
+    samples = []
+    stop_at = time.perf_counter() + duration
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(run_agent(url, agent, weights, ids, stop_at, seed, samples) for agent in range(agents)),
+        return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    failed_agents = [repr(outcome) for outcome in outcomes if isinstance(outcome, BaseException)]
+    return samples, elapsed, failed_agents
+
+def summarise(samples, elapsed):
+    """Throughput, latency percentiles and error rate, per operation and overall."""
+    to_ms = lambda value: round(value * 1000, 2) if value is not None else None
+    summary = {}
+    for operation in OPERATIONS + ('all',):
+        selected = [s for s in samples if operation == 'all' or s[0] == operation]
+        if not selected:
+            continue
+        latencies = [latency for _, latency, _ in selected]
+        errors = sum(1 for _, _, ok in selected if not ok)
+        summary[operation] = {
+            'count': len(selected),
+            'ops_per_second': round(len(selected) / elapsed, 1) if elapsed else None,
+            'error_rate': round(errors / len(selected), 4),
+            'latency_ms': {
+                'p50': to_ms(percentile(latencies, 0.50)),
+                'p95': to_ms(percentile(latencies, 0.95)),
+                'p99': to_ms(percentile(latencies, 0.99)),
+                'max': to_ms(max(latencies)),
+            },
+        }
+    return summary
+
+def print_summary(summary):
+    """Print one line per operation."""
+    for operation, result in summary.items():
+        latency = result['latency_ms']
+        print(f"{operation:>5}  {result['count']:>7} ops  {result['ops_per_second']:>8} op/s  "
+              f"p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms  "
+              f"max {latency['max']} ms  errors {result['error_rate']:.2%}")
+
+def check_gates(summary, failed_agents, max_error_rate=None, max_p95=None, baseline=None, tolerance=0.25):
+    """
+    Compare the results with the regression thresholds.
+
+    Returns:
+        A list of failure messages, empty if every gate passed.
+    """
+    failures = [f"agent failed: {failure}" for failure in failed_agents]
+    for operation, result in summary.items():
+        if max_error_rate is not None and result['error_rate'] > max_error_rate:
+            failures.append(f"{operation}: error rate {result['error_rate']:.2%} above {max_error_rate:.2%}")
+        limit = (max_p95 or {}).get(operation)
+        if limit is not None and result['latency_ms']['p95'] > limit:
+            failures.append(f"{operation}: p95 {result['latency_ms']['p95']} ms above {limit} ms")
+    for operation, previous in (baseline or {}).items():
+        current = summary.get(operation)
+        if current is None:
+            continue
+        if current['latency_ms']['p95'] > previous['latency_ms']['p95'] * (1 + tolerance):
+            failures.append(f"{operation}: p95 {current['latency_ms']['p95']} ms regressed from "
+                            f"{previous['latency_ms']['p95']} ms")
+        if current['ops_per_second'] < previous['ops_per_second'] * (1 - tolerance):
+            failures.append(f"{operation}: {current['ops_per_second']} op/s regressed from "
+                            f"{previous['ops_per_second']} op/s")
+    return failures
+
+def main(argv=None):
+    """Parse command-line arguments and run the load test."""
+    parser = argparse.ArgumentParser(description='Load test the FeedbackFlow MCP server with concurrent agents.')
+    parser.add_argument('--agents', '-a', type=int, default=8, help='Concurrent agents (default: 8)')
+    parser.add_argument('--entries', '-e', type=int, default=1000,
+                        help='Entries in the synthetic corpus, e.g. 1000 to 1000000 (default: 1000)')
+    parser.add_argument('--duration', '-d', type=float, default=10, help='Seconds to run (default: 10)')
+    parser.add_argument('--mix', type=parse_weights, default=parse_weights('log=1,meta=1,add=2,mark=1'),
+                        help='Operation weights (default: log=1,meta=1,add=2,mark=1)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--url', help='Test a running server at this SSE URL instead of starting one')
+    parser.add_argument('--max-error-rate', type=float, help='Fail if any operation errors more often')
+    parser.add_argument('--max-p95', action='append', default=[], metavar='OP=MS',
+                        help='Fail if the p95 latency of OP (or "all") is higher')
+    parser.add_argument('--baseline', help='Fail on a regression against a report written with --output')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed regression against --baseline (default: 0.25)')
+    parser.add_argument('--output', '-o', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    max_p95 = {op: float(ms) for op, _, ms in (item.partition('=') for item in args.max_p95)}
+    home_dir = None
+    server = None
+    try:
+        if args.url:
+            url = args.url
+            ids = asyncio.run(load_ids(url))
+        else:
+            home_dir = tempfile.mkdtemp(prefix='feedbackflow-load-')
+            started = time.perf_counter()
+            ids = build_corpus(home_dir, args.entries, args.seed)
+            print(f"Built a corpus of {len(ids)} entries in {time.perf_counter() - started:.1f} s")
+            port = free_port()
+            server = start_server(home_dir, port)
+            url = f"http://127.0.0.1:{port}/sse"
+        if 'mark' in args.mix and not ids:
+            parser.error('the server has no entries to mark as addressed')
+
+        warm_up_seconds = asyncio.run(warm_up(url))
+        print(f"Warm-up took {warm_up_seconds:.2f} s")
+        samples, elapsed, failed_agents = asyncio.run(
+            run_load(url, args.agents, args.mix, ids, args.duration, args.seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if home_dir is not None:
+            shutil.rmtree(home_dir, ignore_errors=True)
+
+    summary = summarise(samples, elapsed)
+    print(f"{args.agents} agents for {elapsed:.1f} s against {args.entries if not args.url else len(ids)} entries")
+    print_summary(summary)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    failures = check_gates(summary, failed_agents, args.max_error_rate, max_p95, baseline, args.tolerance)
+
+    if args.output:
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'agents': args.agents,
+            'entries': args.entries,
+            'duration': args.duration,
+            'mix': args.mix,
+            'warm_up_seconds': round(warm_up_seconds, 3),
+            'results': summary,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the FeedbackFlow MCP server over stdio.
+
+Starts the server the way Cursor does, sends `initialize` and then reads
+feedback://status, and reports the time from process start to each response.
+A final run under `python -X importtime` lists the imports that cost the most.
+
+  server   python mcp/mcp_server.py --transport stdio
+  ff-mcp   python mcp/ff-mcp start --transport stdio
+
+Every run uses a throwaway HOME, so your real feedback log is never touched.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ENTRY_POINTS = {
+    'server': [os.path.join(PROJECT_DIR, 'mcp', 'mcp_server.py'), '--transport', 'stdio'],
+    'ff-mcp': [os.path.join(PROJECT_DIR, 'mcp', 'ff-mcp'), 'start', '--transport', 'stdio'],
+}
+
+INITIALIZE = {
+    'jsonrpc': '2.0', 'id': 1, 'method': 'initialize',
+    'params': {
+        'protocolVersion': '2024-11-05',
+        'capabilities': {},
+        'clientInfo': {'name': 'bench_mcp_startup', 'version': '1.0.0'},
+    },
+}
+INITIALIZED = {'jsonrpc': '2.0', 'method': 'notifications/initialized'}
+READ_STATUS = {'jsonrpc': '2.0', 'id': 2, 'method': 'resources/read', 'params': {'uri': 'feedback://status'}}
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[rank]
+
+def send(process, message):
+    """Write one newline-delimited JSON-RPC message."""
+    process.stdin.write(json.dumps(message).encode('utf-8') + b'\n')
+    process.stdin.flush()
+
+def wait_for(process, request_id):
+    """Read messages until the response to `request_id` arrives."""
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError('server exited before responding')
+        try:
+            message = json.loads(line)
+        except ValueError:
+            # Not protocol output; the server should not write this to stdout
+            continue
+        if message.get('id') == request_id:
+            if 'error' in message:
+                raise RuntimeError(message['error'])
+            return message
+
+def start_once(entry, home_dir, python_args=()):
+    """
+    Start the server, time its first two responses and shut it down.
+
+    Returns:
+        (seconds to the initialize response, seconds to the first resource
+        read, the server's stderr output).
+    """
+    env = dict(os.environ, HOME=home_dir)
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, *python_args] + ENTRY_POINTS[entry], env=env, cwd=home_dir,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        send(process, INITIALIZE)
+        wait_for(process, 1)
+        initialized = time.perf_counter() - started
+        send(process, INITIALIZED)
+        send(process, READ_STATUS)
+        wait_for(process, 2)
+        first_read = time.perf_counter() - started
+    finally:
+        process.stdin.close()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        stderr = process.stderr.read().decode('utf-8', 'replace')
+    return initialized, first_read, stderr
+
+def parse_importtime(stderr, depth=2):
+    """
+    Collect `-X importtime` lines down to `depth` levels of nesting.
+
+    Returns:
+        (module, cumulative microseconds, depth) tuples, most expensive first.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time:  <self us> | <cumulative us> | <indent><module>"
+        _, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        level = (len(name) - len(name.lstrip(' ')) + 1) // 2
+        if level <= depth:
+            imports.append((name.strip(), int(cumulative_us), level))
+    return sorted(imports, key=lambda item: item[1], reverse=True)
+
+def run_benchmark(entry, runs):
+    """Start the server `runs` times and summarise the response times."""
+    home_dir = tempfile.mkdtemp(prefix='feedbackflow-bench-')
+    try:
+        initialize_times, read_times = [], []
+        for _ in range(runs):
+            initialized, first_read, _ = start_once(entry, home_dir)
+            initialize_times.append(initialized)
+            read_times.append(first_read)
+        to_ms = lambda value: round(value * 1000, 1)
+        return {
+            'entry': entry,
+            'runs': runs,
+            'initialize_ms': {'min': to_ms(min(initialize_times)), 'p50': to_ms(percentile(initialize_times, 0.5))},
+            'first_read_ms': {'min': to_ms(min(read_times)), 'p50': to_ms(percentile(read_times, 0.5))},
+        }
+    finally:
+        shutil.rmtree(home_dir, ignore_errors=True)
+
+def profile_imports(entry, depth):
+    """Start the server once under -X importtime and return its costliest imports."""
+    home_dir = tempfile.mkdtemp(prefix='feedbackflow-bench-')
+    try:
+        _, _, stderr = start_once(entry, home_dir, python_args=('-X', 'importtime'))
+        return parse_importtime(stderr, depth)
+    finally:
+        shutil.rmtree(home_dir, ignore_errors=True)
+
+def print_result(result):
+    """Print one benchmark result as a summary line."""
+    initialize, first_read = result['initialize_ms'], result['first_read_ms']
+    print(f"{result['entry']:>8}  {result['runs']:>3} runs  initialize min {initialize['min']} ms "
+          f"p50 {initialize['p50']} ms  first read min {first_read['min']} ms p50 {first_read['p50']} ms")
+
+def main(argv=None):
+    """Parse command-line arguments and run the benchmarks."""
+    parser = argparse.ArgumentParser(description='Benchmark MCP server cold start over stdio.')
+    parser.add_argument('--entry', choices=['server', 'ff-mcp', 'both'], default='both',
+                        help='How the server is started (default: both)')
+    parser.add_argument('--runs', '-n', type=int, default=10, help='Starts per entry point (default: 10)')
+    parser.add_argument('--imports', type=int, default=15, metavar='N',
+                        help='Show the N most expensive imports, 0 to skip (default: 15)')
+    parser.add_argument('--depth', type=int, default=2, help='Import nesting depth to show (default: 2)')
+    parser.add_argument('--output', '-o', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    entries = list(ENTRY_POINTS) if args.entry == 'both' else [args.entry]
+    results = []
+    for entry in entries:
+        result = run_benchmark(entry, args.runs)
+        print_result(result)
+        results.append(result)
+
+    imports = []
+    if args.imports:
+        imports = profile_imports(entries[0], args.depth)[:args.imports]
+        print(f"\nMost expensive imports ({entries[0]}, cumulative):")
+        for name, cumulative_us, level in imports:
+            print(f"  {cumulative_us / 1000:>8.1f} ms  {'  ' * (level - 1)}{name}")
+
+    if args.output:
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+            'imports': [{'module': name, 'cumulative_us': us, 'depth': level} for name, us, level in imports],
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
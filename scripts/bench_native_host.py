@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency benchmark for the FeedbackFlow native messaging host.
+
+Spawns native-host/feedbackflow_host.py over pipes, the way Chrome does, and
+sends Chrome-style frames (4-byte native-endian length + JSON). Two modes:
+
+  per-message  a new host process for every message (sendNativeMessage)
+  session      one long-lived host process for all messages (connectNative)
+
+Every run uses a throwaway HOME, so your real feedback log is never touched.
+"""
+import os
+import sys
+import json
+import time
+import struct
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+HOST_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'native-host', 'feedbackflow_host.py'))
+
+def encode_frame(message):
+    """Encode a message the way Chrome frames native messages."""
+    body = json.dumps(message).encode('utf-8')
+    return struct.pack('=I', len(body)) + body
+
+def read_frame(stream):
+    """Read one framed response, or None at end of stream."""
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    length = struct.unpack('=I', header)[0]
+    return json.loads(stream.read(length))
+
+def make_message(index, payload_size):
+    """Build a writeFeedback message whose feedback text is `payload_size` bytes."""
+    timestamp = time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
+    feedback = ('x' * payload_size)
+    content = (
+        "\n-------------------------------\n"
+        f"Timestamp: {timestamp}\n"
+        f"URL: http://localhost:8000/bench/{index}\n"
+        "Title: FeedbackFlow benchmark\n"
+        f"Feedback: {feedback}\n"
+        "-------------------------------\n"
+    )
+    return {
+        'id': index,
+        'action': 'writeFeedback',
+        'path': '.feedbackflow/feedback.log',
+        'content': content,
+        'entry': {
+            'timestamp': timestamp,
+            'url': f"http://localhost:8000/bench/{index}",
+            'title': 'FeedbackFlow benchmark',
+            'feedback': feedback,
+        },
+    }
+
+def host_env(home_dir, extra_env=None):
+    """Environment for a host process writing into `home_dir`."""
+    env = dict(os.environ)
+    env['HOME'] = home_dir
+    env['USERPROFILE'] = home_dir
+    env.update(extra_env or {})
+    return env
+
+def pace(start, index, rate):
+    """Sleep until message `index` is due when sending at `rate` messages/second."""
+    if rate > 0:
+        delay = start + index / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+def run_per_message(count, payload_size, rate, home_dir, extra_env=None):
+    """
+    Start one host process per message, like chrome.runtime.sendNativeMessage.
+
+    Returns:
+        (latencies in seconds, number of failed messages)
+    """
+    env = host_env(home_dir, extra_env)
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+    for index in range(count):
+        pace(start, index, rate)
+        sent = time.perf_counter()
+        process = subprocess.Popen([sys.executable, HOST_PATH], stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, env=env)
+        process.stdin.write(encode_frame(make_message(index, payload_size)))
+        process.stdin.close()
+        response = read_frame(process.stdout)
+        latencies.append(time.perf_counter() - sent)
+        process.wait()
+        if not response or not response.get('success'):
+            failures += 1
+    return latencies, failures
+
+def run_session(count, payload_size, rate, home_dir, extra_env=None):
+    """
+    Send every message over one host process, like chrome.runtime.connectNative.
+
+    Responses are matched to requests by id, so round trips are measured even
+    when the host answers out of order.
+
+    Returns:
+        (latencies in seconds, number of failed messages)
+    """
+    process = subprocess.Popen([sys.executable, HOST_PATH], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, env=host_env(home_dir, extra_env))
+    sent_at = {}
+    latencies = []
+    failures = [0]
+
+    def collect():
+        while True:
+            response = read_frame(process.stdout)
+            if response is None:
+                return
+            received = time.perf_counter()
+            if response.get('id') in sent_at:
+                latencies.append(received - sent_at.pop(response['id']))
+                if not response.get('success'):
+                    failures[0] += 1
+
+    collector = threading.Thread(target=collect, daemon=True)
+    collector.start()
+
+    start = time.perf_counter()
+    for index in range(count):
+        pace(start, index, rate)
+        frame = encode_frame(make_message(index, payload_size))
+        sent_at[index] = time.perf_counter()
+        process.stdin.write(frame)
+        process.stdin.flush()
+    process.stdin.close()
+    collector.join()
+    process.wait()
+
+    # Anything never answered counts as a failure
+    return latencies, failures[0] + len(sent_at)
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[rank]
+
+def bytes_written(home_dir):
+    """Total size of everything the host wrote under ~/.feedbackflow."""
+    total = 0
+    for root, _, files in os.walk(os.path.join(home_dir, '.feedbackflow')):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def run_benchmark(mode, count, payload_size, rate, extra_env=None):
+    """Run one benchmark in a throwaway HOME and summarise the results."""
+    home_dir = tempfile.mkdtemp(prefix='feedbackflow-bench-')
+    try:
+        runner = run_per_message if mode == 'per-message' else run_session
+        started = time.perf_counter()
+        latencies, failures = runner(count, payload_size, rate, home_dir, extra_env)
+        elapsed = time.perf_counter() - started
+        to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+        return {
+            'mode': mode,
+            'messages': count,
+            'payload_bytes': payload_size,
+            'target_rate': rate,
+            'elapsed_seconds': round(elapsed, 4),
+            'messages_per_second': round(count / elapsed, 1) if elapsed else None,
+            'latency_ms': {
+                'p50': to_ms(percentile(latencies, 0.50)),
+                'p95': to_ms(percentile(latencies, 0.95)),
+                'p99': to_ms(percentile(latencies, 0.99)),
+                'max': to_ms(max(latencies) if latencies else None),
+            },
+            'failures': failures,
+            'bytes_written': bytes_written(home_dir),
+        }
+    finally:
+        shutil.rmtree(home_dir, ignore_errors=True)
+
+def git_revision():
+    """Short git revision of the checkout, to label results across versions."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(HOST_PATH),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_result(result):
+    """Print one benchmark result as a summary line."""
+    latency = result['latency_ms']
+    print(f"{result['mode']:>12}  {result['messages']:>6} msgs  {result['payload_bytes']:>7} B  "
+          f"{result['messages_per_second']:>9} msg/s  p50 {latency['p50']} ms  p95 {latency['p95']} ms  "
+          f"p99 {latency['p99']} ms  {result['bytes_written']} B written  {result['failures']} failed")
+
+def main(argv=None):
+    """Parse command-line arguments and run the benchmarks."""
+    parser = argparse.ArgumentParser(description='Benchmark the FeedbackFlow native messaging host.')
+    parser.add_argument('--mode', choices=['per-message', 'session', 'both'], default='both',
+                        help='Process model to benchmark (default: both)')
+    parser.add_argument('--messages', '-n', type=int, default=1000,
+                        help='Messages per session-mode run (default: 1000)')
+    parser.add_argument('--per-message-count', type=int, default=100,
+                        help='Messages per per-message-mode run, each starts a process (default: 100)')
+    parser.add_argument('--payload', type=int, nargs='+', default=[256],
+                        help='Feedback payload sizes in bytes (default: 256)')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Target send rate in messages/second, 0 for as fast as possible')
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help='Extra environment for the host, e.g. FEEDBACKFLOW_HOST_FSYNC=1')
+    parser.add_argument('--output', '-o', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    extra_env = dict(item.split('=', 1) for item in args.env)
+    modes = ['per-message', 'session'] if args.mode == 'both' else [args.mode]
+
+    results = []
+    for mode in modes:
+        count = args.per_message_count if mode == 'per-message' else args.messages
+        for payload_size in args.payload:
+            result = run_benchmark(mode, count, payload_size, args.rate, extra_env)
+            print_result(result)
+            results.append(result)
+
+    if args.output:
+        report = {
+            'revision': git_revision(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'host_env': extra_env,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 import os
 import sys
+import argparse
 import platform
 from pathlib import Path
 
+# Make the feedbackflow package importable when run from a checkout
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feedbackflow.logparse import count_entries
+
 def check_log_file():
     """Check if the feedback log file exists and is accessible."""
     # Get the home directory
@@ -18,11 +23,12 @@ def check_log_file():
         print("   Make sure the native host is installed correctly.")
         return False
     
-    # Check if the file is readable
+    # Check if the file is readable; entries are parsed one at a time, so
+    # a large log is not loaded into memory
     try:
-        with open(log_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        entries = count_entries(log_path)
         print(f"✅ Feedback log file found and readable at: {log_path}")
+        print(f"   It contains {entries} feedback entries.")
         return True
     except Exception as e:
         print(f"❌ Error reading feedback log file: {e}")
@@ -59,8 +65,10 @@ def check_native_host():
     print(f"✅ Native messaging host appears to be installed correctly.")
     return True
 
-def main():
+def main(argv=None):
     """Main function to check if the extension is working correctly."""
+    argparse.ArgumentParser(description='Check that the Feedback Flow extension is set up.').parse_args(argv)
+    
     print("=== Feedback Flow Extension Check ===\n")
     
     # Check if the native host is installed
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 import os
-import time
+import sys
+import argparse
 from pathlib import Path
 
+# Make the feedbackflow package importable when run from a checkout
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feedbackflow.reset import clear_all_feedback
+
 def clear_feedback_log():
-    """Clear the feedback log file and add a timestamp header."""
+    """Clear the feedback log, records, metadata, indexes and unused attachments."""
     # Get the home directory
     home_dir = str(Path.home())
     
@@ -18,14 +23,17 @@ def clear_feedback_log():
         return False
     
     try:
-        # Clear the log file by opening it in write mode
-        with open(log_path, 'w', encoding='utf-8') as f:
-            f.write("# Feedback Flow Log File - Cleared on " + time.strftime('%Y-%m-%d %H:%M:%S') + "\n")
+        clear_all_feedback(os.path.dirname(log_path))
         print(f"Feedback log cleared successfully at: {log_path}")
         return True
     except Exception as e:
         print(f"Error clearing feedback log: {e}")
         return False
 
+def main(argv=None):
+    """Parse command-line arguments and clear the feedback log."""
+    argparse.ArgumentParser(description='Clear the FeedbackFlow feedback log.').parse_args(argv)
+    return clear_feedback_log()
+
 if __name__ == '__main__':
-    clear_feedback_log() 
\ No newline at end of file
+    main() 
\ No newline at end of file
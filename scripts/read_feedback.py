@@ -2,8 +2,16 @@
 import os
 import sys
 import time
+import shutil
+import argparse
 from pathlib import Path
 
+# Make the feedbackflow package importable when run from a checkout
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feedbackflow.store import RecordStore
+from feedbackflow.segments import SegmentedLog
+from feedbackflow.logparse import iter_entries
+
 def read_feedback_log():
     """Read the feedback log file and print its contents."""
     # Get the home directory
@@ -18,10 +26,21 @@ def read_feedback_log():
         print("Make sure the Feedback Flow extension is installed and has been used.")
         return
     
-    # Read and print the contents of the log file
+    # Stream the log to stdout instead of reading it into memory
     with open(log_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-        print(content)
+        shutil.copyfileobj(f, sys.stdout)
+    print()
+
+def print_log_entries(entries):
+    """Print entries parsed from the log file, one dashed block each."""
+    for entry in entries:
+        print("-------------------------------")
+        print(f"Timestamp: {entry.timestamp}")
+        if entry.kind == 'block':
+            print(f"URL: {entry.url}")
+            print(f"Title: {entry.title}")
+        print(f"Feedback: {entry.feedback}")
+        print("-------------------------------")
 
 def watch_feedback_log():
     """Watch the feedback log file for changes and print new entries."""
@@ -37,8 +56,8 @@ def watch_feedback_log():
         print("Make sure the Feedback Flow extension is installed and has been used.")
         return
     
-    # Get the current size of the file
-    last_size = os.path.getsize(log_path)
+    # Offset just past the last complete entry printed
+    last_offset = os.path.getsize(log_path)
     
     print(f"Watching feedback log file at: {log_path}")
     print("Press Ctrl+C to stop watching.")
@@ -47,26 +66,88 @@ def watch_feedback_log():
         while True:
             # Check if the file size has changed
             current_size = os.path.getsize(log_path)
+            if current_size < last_offset:
+                # The log was cleared or rotated
+                last_offset = 0
             
-            if current_size > last_size:
-                # Read only the new content
-                with open(log_path, 'r', encoding='utf-8') as f:
-                    f.seek(last_size)
-                    new_content = f.read()
-                    print(new_content, end='')
-                
-                # Update the last size
-                last_size = current_size
+            if current_size > last_offset:
+                # Parse only the new entries; a half-written one waits for the next pass
+                entries = list(iter_entries(log_path, start=last_offset))
+                print_log_entries(entries)
+                if entries:
+                    last_offset = entries[-1].end
             
             # Sleep for a short time
             time.sleep(0.5)
     except KeyboardInterrupt:
         print("\nStopped watching the feedback log file.")
 
-if __name__ == '__main__':
-    # Check if the user wants to watch the log file
-    if len(sys.argv) > 1 and sys.argv[1] == '--watch':
+def read_feedback_history(since=None, until=None):
+    """
+    Print the rotated log segments and the active log, oldest first. Only
+    the segments whose time range overlaps [since, until] are opened.
+    """
+    paths = SegmentedLog().paths_for(since, until)
+    if not paths:
+        print("No feedback log files found for that range.")
+        return
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            print(f.read(), end='')
+
+def print_records(records, occurrences=None):
+    """Print structured feedback records in the same layout as the log file."""
+    if not records:
+        print("No matching feedback records found.")
+        return
+    occurrences = occurrences or {}
+    for record in records:
+        print("-------------------------------")
+        print(f"Id: {record.get('id')}")
+        print(f"Timestamp: {record.get('timestamp')}")
+        print(f"URL: {record.get('url')}")
+        print(f"Title: {record.get('title')}")
+        print(f"Feedback: {record.get('feedback')}")
+        if record.get('id') in occurrences:
+            print(f"Occurrences: {occurrences[record['id']]['count']}")
+    print("-------------------------------")
+
+def read_feedback_records(last=None, since=None, record_id=None):
+    """
+    Read entries from the structured record store using its index, so only
+    the requested records are read from disk.
+    """
+    store = RecordStore()
+    occurrences = store.occurrences()
+    if record_id is not None:
+        record = store.get(record_id)
+        print_records([record] if record else [], occurrences)
+    elif since is not None:
+        print_records(store.since(since, limit=last, newest=True), occurrences)
+    else:
+        print_records(store.tail(last), occurrences)
+
+def main(argv=None):
+    """Parse command-line arguments and read the feedback log."""
+    parser = argparse.ArgumentParser(description='Read the FeedbackFlow feedback log.')
+    parser.add_argument('--watch', action='store_true', help='Watch the log file for new entries')
+    parser.add_argument('--last', type=int, help='Show only the last N entries')
+    parser.add_argument('--since', help='Show entries at or after this timestamp')
+    parser.add_argument('--id', dest='record_id', help='Show the entry with this id')
+    parser.add_argument('--history', action='store_true',
+                        help='Include rotated log segments (limit with --since/--until)')
+    parser.add_argument('--until', help='With --history, stop at this timestamp')
+    args = parser.parse_args(argv)
+
+    if args.watch:
         watch_feedback_log()
+    elif args.history:
+        read_feedback_history(since=args.since, until=args.until)
+    elif args.last is not None or args.since is not None or args.record_id is not None:
+        read_feedback_records(last=args.last, since=args.since, record_id=args.record_id)
     else:
         read_feedback_log()
-        print("\nTo watch for new feedback entries, run: python read_feedback.py --watch") 
\ No newline at end of file
+        print("\nTo watch for new feedback entries, run: python read_feedback.py --watch")
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,10 @@ import subprocess
 import platform
 from pathlib import Path
 
+# Make the feedbackflow package importable when run from a checkout
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feedbackflow.logparse import iter_entries
+
 def copy_to_clipboard(text):
     """Copy text to clipboard using platform-specific methods"""
     try:
@@ -294,8 +298,8 @@ def watch_and_add_feedback(editor=None):
         print("Make sure the Feedback Flow extension is installed and has been used.")
         return
     
-    # Get the current size of the file
-    last_size = os.path.getsize(log_path)
+    # Offset just past the last complete entry seen
+    last_offset = os.path.getsize(log_path)
     
     print(f"Watching feedback log file at: {log_path}")
     print("When changes are detected, feedback will be automatically added to the composer.")
@@ -305,17 +309,18 @@ def watch_and_add_feedback(editor=None):
         while True:
             # Check if the file size has changed
             current_size = os.path.getsize(log_path)
+            if current_size < last_offset:
+                # The log was cleared or rotated
+                last_offset = 0
             
-            if current_size > last_size:
-                # Read only the new content
-                with open(log_path, 'r', encoding='utf-8') as f:
-                    f.seek(last_size)
-                    new_content = f.read()
-                    print("\nNew feedback detected:")
-                    print(new_content, end='')
-                
-                # Update the last size
-                last_size = current_size
+            # Parse only the new entries; a half-written one waits for the next pass
+            entries = list(iter_entries(log_path, start=last_offset)) if current_size > last_offset else []
+            if entries:
+                print("\nNew feedback detected:")
+                for entry in entries:
+                    print(f"[{entry.timestamp}] {entry.url or ''}".rstrip())
+                    print(f"  {entry.feedback}")
+                last_offset = entries[-1].end
                 
                 # Add the feedback to the composer
                 print("\nAdding feedback to composer...")
@@ -326,13 +331,13 @@ def watch_and_add_feedback(editor=None):
     except KeyboardInterrupt:
         print("\nStopped watching the feedback log file.")
 
-def main():
+def main(argv=None):
     """Parse command-line arguments and run the script."""
     parser = argparse.ArgumentParser(description='Watch for feedback and add to composer when detected.')
     parser.add_argument('--editor', '-e', choices=['cursor', 'vscode', 'system'], 
                         help='Explicitly specify which editor to use')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     watch_and_add_feedback(editor=args.editor)
 
 if __name__ == '__main__':
@@ -7,9 +7,9 @@ import json
 import shutil
 
 def check_python_version():
-    """Check if Python version is 3.6 or higher."""
-    if sys.version_info < (3, 6):
-        print("Error: Python 3.6 or higher is required.")
+    """Check if Python version is 3.7 or higher."""
+    if sys.version_info < (3, 7):
+        print("Error: Python 3.7 or higher is required.")
         sys.exit(1)
 
 def install_dependencies():